@@ -0,0 +1,68 @@
+"""
+Benchmarks report rendering time and peak Python memory against tree size.
+
+Synthetic file lists are rendered straight through `reporter.write_report`,
+so no files or probes are involved:
+
+    python benchmarks/bench_report.py --sizes 1000 10000 100000 --formats json csv html pdf
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from prores_tools import reporter  # noqa: E402
+from prores_tools.records import FileRecord  # noqa: E402
+from prores_tools.writers import REPORT_FORMATS  # noqa: E402
+
+
+def synthetic_files(root: Path, count: int, per_folder: int = 50):
+    """Builds ProRes and PSD FileRecords spread over shoots/day folders."""
+    prores_files = []
+    psd_files = []
+    for i in range(count):
+        folder = root / f"shoot_{i // (per_folder * 20):04d}" / f"day_{(i // per_folder) % 20:02d}"
+        if i % 10 == 9:
+            psd_files.append(FileRecord(folder / f"layout_{i:07d}.psd", 150 * 1024**2 + i, type=".psd"))
+        else:
+            prores_files.append(FileRecord(folder / f"clip_{i:07d}.mov", 2 * 1024**3 + i, alpha=i % 7 == 0))
+    return prores_files, psd_files
+
+
+def bench(root: Path, count: int, fmt: str, pdf_max_files: int):
+    prores_files, psd_files = synthetic_files(root, count)
+    tracemalloc.start()
+    start = time.perf_counter()
+    paths = reporter.write_report(root, prores_files, psd_files, fmt, pdf_max_files)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = sum(path.stat().st_size for path in paths)
+    for path in paths:
+        path.unlink()
+    return elapsed, peak, len(paths), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--formats", nargs="+", choices=REPORT_FORMATS, default=list(REPORT_FORMATS))
+    parser.add_argument("--pdf-max-files", type=int, default=reporter.DEFAULT_PDF_MAX_FILES)
+    args = parser.parse_args()
+
+    print(f"{'files':>9} {'format':>6} {'seconds':>9} {'peak MB':>9} {'parts':>5} {'output MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "project"
+        root.mkdir()
+        for count in args.sizes:
+            for fmt in args.formats:
+                elapsed, peak, parts, size = bench(root, count, fmt, args.pdf_max_files)
+                print(f"{count:>9} {fmt:>6} {elapsed:>9.2f} {peak / 1024**2:>9.1f} {parts:>5} {size / 1024**2:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
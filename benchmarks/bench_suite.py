@@ -0,0 +1,174 @@
+"""
+Times scanning, probing, hashing, conversion, reporting and cleanup on synthetic trees.
+
+Each scale builds a fixture tree (see fixtures.py) and times every benchmark
+`--repeat` times, keeping the fastest and the median run. Results are written
+as JSON; pass an earlier results file to `--compare` to print the change per
+benchmark and exit with status 1 if any got slower by more than `--threshold`:
+
+    python benchmarks/bench_suite.py --scales 100 400 1600 --output bench.json
+    python benchmarks/bench_suite.py --scales 100 400 1600 --compare bench.json
+
+Files are read from the page cache after the first repeat, so the I/O bound
+benchmarks measure CPU and syscall overhead rather than disk speed.
+"""
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import build_tree, encode_templates, ffmpeg_version  # noqa: E402
+from prores_tools import reporter, trasher  # noqa: E402
+from prores_tools.cache import ProbeCache  # noqa: E402
+from prores_tools.converter import convert_to_h264  # noqa: E402
+from prores_tools.utils import compute_sha256, find_prores_files_fast, walk_files  # noqa: E402
+
+FOLDERS_TO_SKIP = ['_PROCESSING', '_SOURCE', '_ALPHA']
+BENCHMARKS = ("scan", "scan_cached", "sha256", "report", "cleanup", "convert")
+
+
+def _timed(function, repeat: int, reset=None) -> dict:
+    times = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"seconds_min": min(times), "seconds_median": statistics.median(times)}
+
+
+def bench_scale(root: Path, work_dir: Path, repeat: int, convert_files: int, benchmarks: set) -> list[dict]:
+    """Runs the selected benchmarks against the tree at `root`; returns one result dict per benchmark."""
+    results = []
+    movies = [path for path, _ in walk_files(root, (".mov",))]
+    movie_bytes = sum(path.stat().st_size for path in movies)
+
+    if "scan" in benchmarks:
+        found = []
+        result = _timed(lambda: found.append(len(find_prores_files_fast(root, folders_to_ignore=FOLDERS_TO_SKIP))), repeat)
+        results.append({"benchmark": "scan", "items": found[-1], **result})
+
+    if "scan_cached" in benchmarks:
+        cache = ProbeCache(work_dir / "probe_cache.sqlite3", rebuild=True)
+        try:
+            find_prores_files_fast(root, folders_to_ignore=FOLDERS_TO_SKIP, cache=cache)
+            found = []
+            result = _timed(lambda: found.append(len(find_prores_files_fast(root, folders_to_ignore=FOLDERS_TO_SKIP, cache=cache))), repeat)
+        finally:
+            cache.close()
+        results.append({"benchmark": "scan_cached", "items": found[-1], **result})
+
+    if "sha256" in benchmarks:
+        result = _timed(lambda: [compute_sha256(path) for path in movies], repeat)
+        results.append({"benchmark": "sha256", "items": len(movies), "bytes": movie_bytes,
+                        "mb_per_second": movie_bytes / 1024**2 / result["seconds_min"], **result})
+
+    if "report" in benchmarks:
+        written = []
+        result = _timed(lambda: written.extend(reporter.generate_report(root, fmt="json")), repeat)
+        for path in set(written):
+            path.unlink(missing_ok=True)
+        results.append({"benchmark": "report", "items": len(movies), **result})
+
+    if "cleanup" in benchmarks:
+        found = []
+        result = _timed(lambda: found.append(len(trasher.find_files_to_cleanup(root)[0])), repeat)
+        results.append({"benchmark": "cleanup", "items": found[-1], **result})
+
+    if "convert" in benchmarks and convert_files:
+        # Converts copies of the first few convertible clips, so the tree itself is not modified.
+        clips = [f for f in find_prores_files_fast(root, folders_to_ignore=FOLDERS_TO_SKIP + ['_FAILED']) if not f.alpha][:convert_files]
+        convert_dir = work_dir / "convert"
+
+        def _copy_clips():
+            shutil.rmtree(convert_dir, ignore_errors=True)
+            convert_dir.mkdir()
+            for i, clip in enumerate(clips):
+                shutil.copyfile(clip.path, convert_dir / f"{i:03d}_{clip.path.name}")
+
+        def _convert():
+            for path in sorted(convert_dir.glob("*.mov")):
+                result = convert_to_h264(path)
+                if not result.succeeded:
+                    raise RuntimeError(str(result))
+
+        result = _timed(_convert, repeat, reset=_copy_clips)
+        shutil.rmtree(convert_dir, ignore_errors=True)
+        footage = sum(clip.info.duration or 0 for clip in clips)
+        results.append({"benchmark": "convert", "items": len(clips), "bytes": sum(clip.size for clip in clips),
+                        "footage_seconds": footage, "realtime_factor": footage / result["seconds_min"], **result})
+    return results
+
+
+def compare(results: list[dict], previous: dict, threshold: float) -> bool:
+    """Prints the change of every benchmark against `previous`; True if any regressed."""
+    before = {(r["scale"], r["benchmark"]): r for r in previous["results"]}
+    regressed = False
+    print(f"\nCompared with {previous['created']}:")
+    for result in results:
+        old = before.get((result["scale"], result["benchmark"]))
+        if old is None:
+            continue
+        change = result["seconds_min"] / old["seconds_min"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{result['scale']:>7} {result['benchmark']:>12} {old['seconds_min']:>9.3f}s -> {result['seconds_min']:>9.3f}s {change:>+7.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 400, 1600], help="Files per fixture tree.")
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--convert-files", type=int, default=4, help="Clips converted by the convert benchmark.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--templates", type=Path, default=Path(__file__).resolve().parent / ".templates")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file.")
+    parser.add_argument("--compare", type=Path, help="Earlier results JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown counted as a regression (0.10 = 10%%).")
+    args = parser.parse_args()
+
+    previous = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+    templates = encode_templates(args.templates)
+    run = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ffmpeg": ffmpeg_version(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": [],
+    }
+
+    print(f"{'scale':>7} {'benchmark':>12} {'items':>7} {'min s':>9} {'median s':>9}")
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix="prores-bench-") as tmp:
+            root = Path(tmp) / "project"
+            root.mkdir()
+            build_tree(root, scale, templates, args.seed)
+            for result in bench_scale(root, Path(tmp), args.repeat, args.convert_files, set(args.benchmarks)):
+                result = {"scale": scale, **result}
+                run["results"].append(result)
+                print(f"{scale:>7} {result['benchmark']:>12} {result['items']:>7} {result['seconds_min']:>9.3f} {result['seconds_median']:>9.3f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(run, indent=2), encoding="utf-8")
+        print(f"Results saved to {args.output}")
+    if previous is not None and compare(run["results"], previous, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Generates reproducible synthetic project trees for the benchmarks.
+
+A handful of short template clips are encoded once with ffmpeg's `testsrc2`
+source (ProRes 422 Proxy and HQ, 4444 with and without alpha, at two lengths)
+and copied into a tree of shoot/day folders of varied depth, together with
+`_SOURCE` and `.PRV` folders and sparse PSD stand-ins. The layout depends
+only on the file count and the seed, so two runs with the same arguments
+build the same tree:
+
+    python benchmarks/fixtures.py /tmp/fixture --files 400 --seed 1
+"""
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from prores_tools.utils import require_executable  # noqa: E402
+
+# name -> (prores_ks profile, pixel format)
+TEMPLATES = {
+    "422proxy": (0, "yuv422p10le"),
+    "422hq": (3, "yuv422p10le"),
+    "4444": (4, "yuv444p10le"),
+    "4444alpha": (4, "yuva444p10le"),
+}
+TEMPLATE_WEIGHTS = {"422proxy": 4, "422hq": 4, "4444": 1, "4444alpha": 1}
+DURATIONS = (1, 3)
+FRAME_SIZE = "320x180"
+PSD_SIZES = (40 * 1024**2, 150 * 1024**2, 400 * 1024**2)
+
+
+def ffmpeg_version() -> str:
+    result = subprocess.run([require_executable("ffmpeg"), "-version"], capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[0]
+
+
+def encode_templates(template_dir: Path) -> dict:
+    """Encodes (or reuses) the template clips; returns {(name, seconds): path}."""
+    template_dir.mkdir(parents=True, exist_ok=True)
+    templates = {}
+    for name, (profile, pix_fmt) in TEMPLATES.items():
+        for seconds in DURATIONS:
+            path = template_dir / f"{name}_{FRAME_SIZE}_{seconds}s.mov"
+            if not path.exists():
+                partial = path.with_suffix(".partial.mov")
+                source = f"testsrc2=size={FRAME_SIZE}:rate=25:duration={seconds}"
+                if pix_fmt.startswith("yuva"):
+                    # Give the alpha channel real content so it is not optimised away.
+                    source += ",format=yuva444p,geq=lum='lum(X,Y)':cb='cb(X,Y)':cr='cr(X,Y)':a='X/W*255'"
+                subprocess.run(
+                    [require_executable("ffmpeg"), "-v", "error", "-f", "lavfi", "-i", source,
+                     "-c:v", "prores_ks", "-profile:v", str(profile), "-pix_fmt", pix_fmt, "-y", str(partial)],
+                    check=True,
+                )
+                partial.rename(path)
+            templates[(name, seconds)] = path
+    return templates
+
+
+def _write_psd(path: Path, size: int):
+    """A PSD signature followed by a sparse hole, so large stand-ins cost no disk space."""
+    with open(path, "wb") as f:
+        f.write(b"8BPS\x00\x01")
+        f.truncate(size)
+
+
+def build_tree(root: Path, files: int, templates: dict, seed: int = 0) -> dict:
+    """
+    Fills `root` with `files` files: mostly ProRes clips in nested shoot/day
+    folders, plus clips in `_SOURCE` and `.PRV` folders and PSD stand-ins.
+    Returns a manifest with the counts and bytes of each kind.
+    """
+    rng = random.Random(seed)
+    names = list(TEMPLATE_WEIGHTS)
+    weights = [TEMPLATE_WEIGHTS[name] for name in names]
+    manifest = {"files": files, "seed": seed, "prores": 0, "alpha": 0, "source": 0, "prv": 0, "psd": 0, "bytes": 0}
+    shoots = max(1, files // 100)
+    for i in range(files):
+        folder = root / f"shoot_{rng.randrange(shoots):03d}"
+        for level in range(rng.randint(0, 3)):
+            folder = folder / f"{('day', 'cam', 'take')[level]}_{rng.randrange(4):02d}"
+        roll = rng.random()
+        if roll < 0.08:
+            folder.mkdir(parents=True, exist_ok=True)
+            size = rng.choice(PSD_SIZES)
+            _write_psd(folder / f"layout_{i:06d}.psd", size)
+            manifest["psd"] += 1
+            manifest["bytes"] += size
+            continue
+        if roll < 0.2:
+            folder = folder / "_SOURCE"
+            manifest["source"] += 1
+        elif roll < 0.28:
+            folder = folder / f"edit_{rng.randrange(3)}.PRV"
+            manifest["prv"] += 1
+        name = rng.choices(names, weights)[0]
+        template = templates[(name, rng.choice(DURATIONS))]
+        folder.mkdir(parents=True, exist_ok=True)
+        target = folder / f"clip_{i:06d}.mov"
+        shutil.copyfile(template, target)
+        manifest["prores"] += 1
+        manifest["alpha"] += name == "4444alpha"
+        manifest["bytes"] += target.stat().st_size
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("root", type=Path, help="Empty or missing directory to build the tree in.")
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--templates", type=Path, default=Path(__file__).resolve().parent / ".templates",
+                        help="Where template clips are encoded and reused from.")
+    args = parser.parse_args()
+
+    if args.root.exists() and any(args.root.iterdir()):
+        parser.error(f"{args.root} is not empty")
+    args.root.mkdir(parents=True, exist_ok=True)
+    manifest = build_tree(args.root, args.files, encode_templates(args.templates), args.seed)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
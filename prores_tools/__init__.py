@@ -1,3 +1,27 @@
-from .cli import app
+from .api import convert, scan
+from .converter import convert_to_h264
+from .records import ConversionResult, ErrorCategory, FileRecord, Status
+from .utils import MediaInfo, probe
+from .verifier import verify_output
 
-__all__ = ["app"] 
\ No newline at end of file
+__all__ = [
+    "app",
+    "convert",
+    "convert_to_h264",
+    "scan",
+    "probe",
+    "verify_output",
+    "ConversionResult",
+    "ErrorCategory",
+    "FileRecord",
+    "MediaInfo",
+    "Status",
+]
+
+
+def __getattr__(name):
+    # The CLI pulls in typer and the PDF renderer, so it is only imported when asked for.
+    if name == "app":
+        from .cli import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,63 @@
+"""
+Scanning and converting from Python, without going through the CLI.
+
+    import prores_tools
+
+    for record in prores_tools.scan("/mnt/share/project"):
+        print(record.path, record.size, record.info.profile)
+
+    for result in prores_tools.convert("/mnt/share/project", max_workers=4, dedup=True):
+        if not result.succeeded:
+            print(result.error.name, result.message)
+
+Both are generators: files are yielded as they are found or finished, and
+closing the generator early stops the scan or conversion cleanly.
+"""
+from pathlib import Path
+from typing import Callable, Iterator
+
+from .cache import open_probe_cache
+from .converter import run_conversion
+from .records import ConversionResult, FileRecord
+from .utils import iter_prores_files
+
+# The folders convert keeps originals and work in-progress in.
+CONVERSION_FOLDERS = ['_PROCESSING', '_SOURCE', '_ALPHA']
+
+
+def scan(root, use_cache: bool = True, scan_threads: int = 1,
+         folders_to_ignore: list[str] | None = CONVERSION_FOLDERS) -> Iterator[FileRecord]:
+    """
+    Yields a FileRecord, with its MediaInfo, for each ProRes .mov file under
+    `root`, skipping `folders_to_ignore`. With `use_cache`, files unchanged
+    since an earlier scan are not probed again (see cache.py).
+    """
+    cache = open_probe_cache(enabled=use_cache)
+    try:
+        yield from iter_prores_files(Path(root), folders_to_ignore=folders_to_ignore, cache=cache, scan_threads=scan_threads)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def convert(root, use_cache: bool = True, on_message: Callable[[str], None] | None = None,
+            **options) -> Iterator[ConversionResult]:
+    """
+    Converts the ProRes files under `root` like `prores-tool convert` and
+    yields a ConversionResult for each file as it finishes. `options` are
+    those of converter.run_conversion (max_workers, order, dedup, watch, ...).
+    Progress and status lines go to `on_message`, if given.
+    """
+    cache = open_probe_cache(enabled=use_cache)
+    results = run_conversion(Path(root), cache=cache, **options)
+    try:
+        for item in results:
+            if isinstance(item, ConversionResult):
+                yield item
+            elif on_message is not None:
+                on_message(item)
+    finally:
+        # Stop the discovery thread before closing the cache it uses.
+        results.close()
+        if cache is not None:
+            cache.close()
@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import fields
+from pathlib import Path
+from .utils import MediaInfo
+
+DEFAULT_MAX_ENTRIES = 250_000
+SCHEMA_VERSION = 2
+
+_INFO_FIELDS = [f.name for f in fields(MediaInfo) if f.name != "conclusive"]
+_INFO_COLUMNS = ", ".join(_INFO_FIELDS)
+
+
+def default_cache_path() -> Path:
+    """Returns the per-user location of the probe cache database."""
+    if sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / "prores-tools" / "probe_cache.sqlite3"
+
+
+class ProbeCache:
+    """
+    On-disk cache of probe results (MediaInfo records) for video files.
+
+    Entries are keyed on (device, inode) and are only considered valid while the
+    file's size and mtime still match, so edited or replaced files are reprobed.
+    The cache is bounded to `max_entries` rows; the least recently used rows are
+    evicted when it is closed.
+    """
+
+    def __init__(self, db_path: Path | None = None, max_entries: int = DEFAULT_MAX_ENTRIES, rebuild: bool = False):
+        self.db_path = Path(db_path) if db_path else default_cache_path()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched = []
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # The cache may be handed to a discovery thread; it is never used by two threads at once.
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if rebuild or version != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS probes")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS probes (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                valid INTEGER NOT NULL,
+                codec_name TEXT,
+                profile TEXT,
+                pix_fmt TEXT,
+                width INTEGER,
+                height INTEGER,
+                duration REAL,
+                nb_frames INTEGER,
+                bit_rate INTEGER,
+                audio_streams INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (dev, ino)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def get(self, st: os.stat_result) -> MediaInfo | None:
+        """Returns the cached probe for a file, or None if missing or stale."""
+        row = self._conn.execute(
+            f"SELECT size, mtime_ns, {_INFO_COLUMNS} FROM probes WHERE dev = ? AND ino = ?",
+            (st.st_dev, st.st_ino),
+        ).fetchone()
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append((st.st_dev, st.st_ino))
+        valid, *rest = row[2:]
+        return MediaInfo(bool(valid), *rest)
+
+    def put(self, path: Path, st: os.stat_result, info: MediaInfo):
+        """
+        Stores (or replaces) the probe result for a file. Inconclusive results
+        (a timed-out or failed read) are not stored, so the file is probed again
+        next time instead of staying "not ProRes" until it changes.
+        """
+        if not info.conclusive:
+            return
+        values = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, str(path),
+                  *(getattr(info, name) for name in _INFO_FIELDS), time.time())
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO probes (dev, ino, size, mtime_ns, path, {_INFO_COLUMNS}, last_used) "
+            f"VALUES ({', '.join('?' * len(values))})",
+            values,
+        )
+
+    def invalidate(self, st: os.stat_result):
+        """Drops the entry for a file, e.g. after it has been rewritten."""
+        self._conn.execute("DELETE FROM probes WHERE dev = ? AND ino = ?", (st.st_dev, st.st_ino))
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM probes WHERE rowid IN (SELECT rowid FROM probes ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def close(self):
+        """Records hit timestamps, evicts old entries and closes the database."""
+        if self._conn is None:
+            return
+        now = time.time()
+        self._conn.executemany(
+            "UPDATE probes SET last_used = ? WHERE dev = ? AND ino = ?",
+            [(now, dev, ino) for dev, ino in self._touched],
+        )
+        self._touched.clear()
+        self._evict()
+        self._conn.commit()
+        self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_probe_cache(enabled: bool = True, rebuild: bool = False) -> ProbeCache | None:
+    """
+    Opens the default probe cache, or returns None if caching is disabled or
+    the cache database cannot be opened (e.g. a read-only home directory).
+    """
+    if not enabled:
+        return None
+    try:
+        return ProbeCache(rebuild=rebuild)
+    except (OSError, sqlite3.Error):
+        return None
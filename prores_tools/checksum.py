@@ -0,0 +1,138 @@
+"""
+Checksums for conversion integrity checks and the sidecar files that record them.
+
+Files are hashed with large `readinto` reads into a per-thread buffer that is
+reused across calls, so hashing a multi-GB master does not allocate per chunk.
+hashlib releases the GIL while hashing, so several files hash in parallel.
+
+A sidecar (`clip.mov.sha256` or `clip.mov.b2`) is written next to each archived
+original. It is in the format `sha256sum -c` / `b2sum -c` understand, plus
+comment lines recording the size and mtime of every listed file, so later runs
+can tell that a file is unchanged since it was hashed without reading it again.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from . import metrics, volumes
+
+ALGORITHMS = {"sha256": ".sha256", "blake2b": ".b2"}
+DEFAULT_ALGORITHM = "sha256"
+DEFAULT_BUFFER_SIZE = 8 * 1024 * 1024
+
+_local = threading.local()
+
+
+def _buffer(size: int) -> bytearray:
+    buf = getattr(_local, "buffer", None)
+    if buf is None or len(buf) != size:
+        buf = _local.buffer = bytearray(size)
+    return buf
+
+
+def new_hash(algorithm: str = DEFAULT_ALGORITHM):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unsupported checksum algorithm '{algorithm}'. Choose one of: {', '.join(ALGORITHMS)}")
+    return hashlib.new(algorithm)
+
+
+@metrics.timed("hash")
+def hash_file(file_path, algorithm: str = DEFAULT_ALGORITHM, buffer_size: int = DEFAULT_BUFFER_SIZE) -> str:
+    """
+    Returns the hex digest of a file. The read holds an I/O slot on the file's
+    volume and leaves nothing in the page cache (see volumes.py).
+    """
+    digest = new_hash(algorithm)
+    buf = _buffer(buffer_size)
+    view = memoryview(buf)
+    total = 0
+    with open(file_path, "rb", buffering=0) as f:
+        fd = f.fileno()
+        with volumes.io_slots(os.fstat(fd).st_dev) as consume:
+            volumes.advise_sequential(fd)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                # Let the kernel fetch the next chunk while this one is hashed.
+                volumes.advise_willneed(fd, total + n, buffer_size)
+                consume(n)
+                digest.update(view[:n])
+                total += n
+        volumes.drop_cached(fd)
+    metrics.count("bytes_hashed", total)
+    return digest.hexdigest()
+
+
+def sidecar_path(file_path: Path, algorithm: str = DEFAULT_ALGORITHM) -> Path:
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + ALGORITHMS[algorithm])
+
+
+def is_sidecar(path: Path) -> bool:
+    """True if `path` is a checksum sidecar rather than a media file."""
+    return Path(path).suffix in ALGORITHMS.values()
+
+
+def find_sidecar(file_path: Path) -> Path | None:
+    """Returns the sidecar written for `file_path` with any supported algorithm."""
+    for algorithm in ALGORITHMS:
+        candidate = sidecar_path(file_path, algorithm)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def write_sidecar(file_path: Path, algorithm: str, entries: list[tuple[Path, str]]) -> Path:
+    """
+    Writes the sidecar for `file_path`, listing (path, digest) for each entry
+    relative to the sidecar's folder, together with each file's current size
+    and mtime.
+    """
+    path = sidecar_path(file_path, algorithm)
+    comments = [f"# prores-tools {algorithm}"]
+    lines = []
+    for entry_path, digest in entries:
+        name = os.path.relpath(entry_path, path.parent)
+        st = os.stat(entry_path)
+        comments.append(f"# {name} size={st.st_size} mtime_ns={st.st_mtime_ns}")
+        lines.append(f"{digest}  {name}")
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text("\n".join(comments + lines) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def read_sidecar(path: Path) -> list[dict]:
+    """
+    Parses a sidecar into a list of entries with the absolute `path`, `digest`
+    and the `size`/`mtime_ns` recorded when it was written (None if absent).
+    """
+    path = Path(path)
+    fingerprints = {}
+    entries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("# ") and " size=" in line:
+            name, _, rest = line[2:].rpartition(" size=")
+            size, _, mtime = rest.partition(" mtime_ns=")
+            fingerprints[name] = (int(size), int(mtime))
+        elif line and not line.startswith("#"):
+            digest, _, name = line.partition("  ")
+            size, mtime_ns = fingerprints.get(name, (None, None))
+            entries.append({
+                "path": (path.parent / name).resolve(),
+                "digest": digest,
+                "size": size,
+                "mtime_ns": mtime_ns,
+            })
+    return entries
+
+
+def unchanged_since_hashed(entry: dict) -> bool:
+    """True if the file in a sidecar entry still has the size and mtime it had when hashed."""
+    try:
+        st = os.stat(entry["path"])
+    except OSError:
+        return False
+    return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
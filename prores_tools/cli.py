@@ -1,38 +1,265 @@
+import threading
 import typer
+from typing import List, Optional
 from pathlib import Path
 from rich.console import Console
-from . import converter, utils, reporter, trasher
+from . import converter, metrics, planner, processes, utils, reporter, trasher, verifier, volumes
+from .cache import open_probe_cache
+from .checksum import ALGORITHMS, DEFAULT_ALGORITHM
+from .encoder import DEFAULT_SPLIT_SECONDS, DEFAULT_STALL_TIMEOUT, DEFAULT_TIMEOUT_FACTOR
+from .leases import DEFAULT_TTL
+from .planner import DEFAULT_FILES_PER_CLASS, DEFAULT_SAMPLES, DEFAULT_SEGMENT_SECONDS
+from .reporter import DEFAULT_PDF_MAX_FILES
+from .scheduler import SCHEDULING_POLICIES, plan_workers
+from .watcher import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE
+from .writers import REPORT_FORMATS
 
 app = typer.Typer(rich_markup_mode="markdown")
 console = Console()
 
+NO_CACHE_OPTION = typer.Option(False, "--no-cache", help="Probe every file with ffprobe instead of using the probe cache.")
+REBUILD_CACHE_OPTION = typer.Option(False, "--rebuild-cache", help="Discard the probe cache and rebuild it during this scan.")
+FORMAT_OPTION = typer.Option("pdf", "--format", help="Report format: pdf, html, json or csv.")
+PDF_MAX_FILES_OPTION = typer.Option(DEFAULT_PDF_MAX_FILES, "--pdf-max-files", help="Split PDF reports into parts of at most this many files.")
+SCAN_THREADS_OPTION = typer.Option(1, "--scan-threads", help="Directories to list in parallel while scanning (useful on network shares).")
+METRICS_OPTION = typer.Option(None, "--metrics", help="Write per-stage timings and counters to this file: JSON lines, or a node_exporter textfile if it ends in .prom. Can be repeated.")
+
+@app.callback()
+def main(
+    max_probes: int = typer.Option(processes.DEFAULT_LIMITS[processes.PROBE], "--max-probes", envvar="PRORES_TOOLS_MAX_PROBES",
+                                   help="Most ffprobe processes to run at once, across all scan threads (0 = unlimited)."),
+    max_encodes: int = typer.Option(processes.DEFAULT_LIMITS[processes.ENCODE], "--max-encodes", envvar="PRORES_TOOLS_MAX_ENCODES",
+                                    help="Most ffmpeg processes (encodes and verification decodes) to run at once, whatever --workers is (0 = unlimited)."),
+    io_per_volume: int = typer.Option(0, "--io-per-volume", envvar="PRORES_TOOLS_IO_PER_VOLUME",
+                                      help="Most files hashed or copied at once on each disk or share (0 = unlimited)."),
+    io_bandwidth: str = typer.Option("0", "--io-bandwidth", envvar="PRORES_TOOLS_IO_BANDWIDTH",
+                                     help="Cap hashing and copying to this many bytes per second per disk or share, e.g. 200MB (0 = unlimited)."),
+):
+    """
+    Converts, reports on and cleans up ProRes files.
+    """
+    for kind, limit, option in ((processes.PROBE, max_probes, "--max-probes"), (processes.ENCODE, max_encodes, "--max-encodes")):
+        try:
+            processes.set_limit(kind, limit)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint=option)
+    try:
+        bandwidth = utils.parse_size(io_bandwidth)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--io-bandwidth")
+    try:
+        volumes.set_limits(io_per_volume, bandwidth)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--io-per-volume")
+
+def _open_cache(no_cache: bool, rebuild_cache: bool):
+    cache = open_probe_cache(enabled=not no_cache, rebuild=rebuild_cache)
+    if cache is None and not no_cache:
+        console.print("[yellow]Probe cache unavailable; every file will be probed.[/yellow]")
+    return cache
+
+def _collect_metrics(ctx: typer.Context, paths: Optional[List[Path]]):
+    """Collects metrics for the rest of the command and writes them to `paths` when it ends."""
+    if not paths:
+        return
+    metrics.enable()
+
+    def _export():
+        metrics.export(metrics.disable(), ctx.info_name, paths)
+        console.print(f"Metrics written to: {', '.join(str(path) for path in paths)}")
+
+    ctx.call_on_close(_export)
+
+def _check_format(fmt: str):
+    if fmt not in REPORT_FORMATS:
+        raise typer.BadParameter(f"must be one of: {', '.join(REPORT_FORMATS)}", param_hint="--format")
+
+def _print_report_paths(label: str, paths: list[Path]):
+    if len(paths) == 1:
+        console.print(f"[bold green]✓ {label} successfully created at:[/bold green] [cyan]{paths[0]}[/cyan]")
+        return
+    console.print(f"[bold green]✓ {label} successfully created in {len(paths)} parts:[/bold green]")
+    for path in paths:
+        console.print(f"  [cyan]{path}[/cyan]")
+
+def _format_encode_status(active: dict) -> str:
+    """Summarises live ffmpeg progress of the files currently being encoded."""
+    if not active:
+        return "[bold green]Processing videos..."
+    parts = []
+    for path, snap in active.items():
+        if snap["fraction"] is not None:
+            position = f"{snap['fraction']:.0%}"
+        elif snap["out_time"] is not None:
+            position = f"{snap['out_time']:.0f}s"
+        else:
+            position = "starting"
+        speed = f" {snap['speed']:.2f}x" if snap["speed"] else ""
+        parts.append(f"{path.name} {position} {snap['fps']:.0f}fps{speed}")
+    return f"[bold green]Encoding {len(active)} file(s):[/bold green] " + " · ".join(parts)
+
 @app.command()
 def convert(
+    ctx: typer.Context,
     scan_dir: Path = typer.Argument(..., help="Directory to scan for ProRes files to convert.", exists=True, file_okay=False, dir_okay=True, readable=True),
-    workers: int = typer.Option(4, "--workers", "-w", help="Number of videos to process in parallel.")
+    workers: int = typer.Option(0, "--workers", "-w", help="Number of videos to process in parallel (0 = size from CPU cores)."),
+    threads: int = typer.Option(0, "--threads", help="ffmpeg encoder threads per video (0 = CPU cores divided by workers)."),
+    order: str = typer.Option("largest", "--order", help="Conversion order: largest, smallest or fifo."),
+    stall_timeout: float = typer.Option(DEFAULT_STALL_TIMEOUT, "--stall-timeout", help="Fail an encode if ffmpeg makes no progress for this many seconds."),
+    timeout_factor: float = typer.Option(DEFAULT_TIMEOUT_FACTOR, "--timeout-factor", help="Fail an encode that takes longer than this multiple of the clip's duration (0 = no limit)."),
+    max_copy_gb: float = typer.Option(1.0, "--max-copy-gb", help="Leave a file in place rather than copy more than this many GB across a mount boundary (negative = no limit)."),
+    resume: bool = typer.Option(False, "--resume", help="Recover and finish only the files an interrupted run left unfinished, without rescanning."),
+    shared: bool = typer.Option(False, "--shared", help="Coordinate through lease files with other convert --shared processes working on the same tree."),
+    lease_ttl: float = typer.Option(DEFAULT_TTL, "--lease-ttl", help="With --shared, take over leases of processes that stopped renewing them for this many seconds."),
+    checksum: str = typer.Option(DEFAULT_ALGORITHM, "--checksum", help="Checksum algorithm for integrity checks and sidecar files: sha256 or blake2b."),
+    watch: bool = typer.Option(False, "--watch", help="Keep running after the initial scan and convert ProRes files as they are dropped into the tree."),
+    settle: float = typer.Option(DEFAULT_SETTLE, "--settle", help="With --watch, convert a new file once its size and mtime have not changed for this many seconds."),
+    poll: bool = typer.Option(False, "--poll", help="With --watch, poll the tree instead of using inotify (needed for writes from other machines to a network share)."),
+    poll_interval: float = typer.Option(DEFAULT_POLL_INTERVAL, "--poll-interval", help="With --watch, seconds between polls when polling."),
+    dedup: bool = typer.Option(False, "--dedup", help="Encode byte-identical sources once and reflink or hardlink the output to the other copies."),
+    split_seconds: float = typer.Option(DEFAULT_SPLIT_SECONDS, "--split-seconds", help="Encode sources at least this long as parallel segments when workers would otherwise sit idle (0 = never split)."),
+    verify_samples: int = typer.Option(0, "--verify-samples", help="Decode this many short windows of each output before accepting it (0 = only compare source and output properties)."),
+    no_cache: bool = NO_CACHE_OPTION,
+    rebuild_cache: bool = REBUILD_CACHE_OPTION,
+    scan_threads: int = SCAN_THREADS_OPTION,
+    metrics_paths: Optional[List[Path]] = METRICS_OPTION,
 ):
     """
     Recursively converts ProRes files to H.264, managing originals in subfolders.
     """
-    console.print(f"Starting recursive conversion scan in [cyan]{scan_dir}[/cyan]...")
+    if resume:
+        console.print(f"Resuming interrupted conversion in [cyan]{scan_dir}[/cyan]...")
+    else:
+        console.print(f"Starting recursive conversion scan in [cyan]{scan_dir}[/cyan]...")
     console.print("Originals will be moved to a [bold]_SOURCE[/bold] subfolder in their respective directories.")
-    with console.status("[bold green]Processing videos...", spinner="dots") as status:
-        for result in converter.run_conversion(scan_dir, workers):
-            console.print(result)
+    if order not in SCHEDULING_POLICIES:
+        raise typer.BadParameter(f"must be one of: {', '.join(SCHEDULING_POLICIES)}", param_hint="--order")
+    if shared and resume:
+        raise typer.BadParameter("cannot be combined with --resume; shared runs recover unfinished files through expired leases", param_hint="--shared")
+    if watch and resume:
+        raise typer.BadParameter("cannot be combined with --resume", param_hint="--watch")
+    if checksum not in ALGORITHMS:
+        raise typer.BadParameter(f"must be one of: {', '.join(ALGORITHMS)}", param_hint="--checksum")
+    workers, threads = plan_workers(workers, threads)
+    _collect_metrics(ctx, metrics_paths)
+    console.print(f"Using [bold]{workers}[/bold] worker(s) with [bold]{threads}[/bold] ffmpeg thread(s) each, {order} files first.")
+    cache = _open_cache(no_cache, rebuild_cache)
+    results = None
+    try:
+        with console.status("[bold green]Processing videos...", spinner="dots") as status:
+            active = {}
+            lock = threading.Lock()
+
+            def _show_progress(path, snapshot):
+                with lock:
+                    if snapshot is None:
+                        active.pop(path, None)
+                    else:
+                        active[path] = snapshot
+                    status.update(_format_encode_status(active))
+
+            results = converter.run_conversion(
+                scan_dir,
+                workers,
+                cache=cache,
+                scan_threads=scan_threads,
+                order=order,
+                threads=threads,
+                on_progress=_show_progress,
+                stall_timeout=stall_timeout,
+                timeout_factor=timeout_factor,
+                resume=resume,
+                max_copy_bytes=None if max_copy_gb < 0 else int(max_copy_gb * 1024**3),
+                algorithm=checksum,
+                shared=shared,
+                lease_ttl=lease_ttl,
+                watch=watch,
+                settle=settle,
+                poll_interval=poll_interval,
+                use_inotify=not poll,
+                dedup=dedup,
+                verify_samples=verify_samples,
+                split_seconds=split_seconds,
+            )
+            for result in results:
+                console.print(str(result))
+    except KeyboardInterrupt:
+        if not watch:
+            raise
+        console.print("Stopped watching.")
+    finally:
+        # Stop the discovery thread before closing the cache it uses.
+        if results is not None:
+            results.close()
+        if cache is not None:
+            cache.close()
     console.print("[bold green]Conversion process complete![/bold green]")
 
+@app.command()
+def plan(
+    scan_dir: Path = typer.Argument(..., help="Directory to estimate a conversion for.", exists=True, file_okay=False, dir_okay=True, readable=True),
+    workers: int = typer.Option(0, "--workers", "-w", help="Number of videos convert would process in parallel (0 = size from CPU cores)."),
+    threads: int = typer.Option(0, "--threads", help="ffmpeg encoder threads per video (0 = CPU cores divided by workers)."),
+    samples: int = typer.Option(DEFAULT_SAMPLES, "--samples", help="Segments to encode from each sampled file."),
+    segment_seconds: float = typer.Option(DEFAULT_SEGMENT_SECONDS, "--segment-seconds", help="Length of each sampled segment in seconds."),
+    files_per_class: int = typer.Option(DEFAULT_FILES_PER_CLASS, "--files-per-class", help="Files sampled per class of identical profile and resolution."),
+    no_cache: bool = NO_CACHE_OPTION,
+    rebuild_cache: bool = REBUILD_CACHE_OPTION,
+    scan_threads: int = SCAN_THREADS_OPTION,
+):
+    """
+    Estimates the H.264 size, disk space saved and encode time of converting a
+    directory tree, by encoding short sampled segments. Nothing is moved or converted.
+    """
+    console.print(f"Planning conversion of [cyan]{scan_dir}[/cyan]...")
+    cache = _open_cache(no_cache, rebuild_cache)
+    try:
+        with console.status("[bold green]Scanning and sampling files...", spinner="dots"):
+            for line in planner.plan_conversion(
+                scan_dir,
+                workers,
+                threads,
+                cache=cache,
+                scan_threads=scan_threads,
+                samples=samples,
+                segment_seconds=segment_seconds,
+                files_per_class=files_per_class,
+            ):
+                console.print(line, markup=False, highlight=False)
+    finally:
+        if cache is not None:
+            cache.close()
+
 @app.command(help="Moves specified preview and converted files to the Trash.")
 def cleanup(
+    ctx: typer.Context,
     scan_dir: Path = typer.Argument(..., help="Directory to scan for files to clean up.", exists=True, file_okay=False, dir_okay=True, readable=True),
+    dry_run: bool = typer.Option(False, "--dry-run", help="List what would be moved to the Trash and the space reclaimed per folder, without moving anything."),
+    no_cache: bool = NO_CACHE_OPTION,
+    rebuild_cache: bool = REBUILD_CACHE_OPTION,
+    scan_threads: int = SCAN_THREADS_OPTION,
+    metrics_paths: Optional[List[Path]] = METRICS_OPTION,
 ):
     """
     Finds and moves two types of files to the Trash:
     - ProRes files in folders ending with .PRV
-    - All ProRes files inside any `_SOURCE` folder
+    - All ProRes files inside any `_SOURCE` folder, unless their checksum
+      sidecar shows the converted output is missing or was modified
     """
+    _collect_metrics(ctx, metrics_paths)
     console.print(f"Scanning [cyan]{scan_dir}[/cyan] for files to clean up...")
-    with console.status("[bold green]Scanning files...", spinner="dots"):
-        files_to_trash = trasher.find_files_to_cleanup(scan_dir)
+    cache = _open_cache(no_cache, rebuild_cache)
+    try:
+        with console.status("[bold green]Scanning files...", spinner="dots"):
+            files_to_trash, skipped = trasher.find_files_to_cleanup(scan_dir, cache=cache, scan_threads=scan_threads)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if skipped:
+        console.print(f"[bold red]Keeping {len(skipped)} original(s) whose converted output is missing or changed since it was checksummed:[/bold red]")
+        for f in sorted(skipped):
+            console.print(f"- {f.relative_to(scan_dir)}")
 
     if not files_to_trash:
         console.print("[bold green]No matching files found to move to Trash.[/bold green]")
@@ -41,7 +268,15 @@ def cleanup(
     console.print(f"[bold yellow]Found {len(files_to_trash)} file(s) to move to Trash:[/bold yellow]")
     for f in sorted(files_to_trash):
         console.print(f"- {f.relative_to(scan_dir)}")
-    
+
+    if dry_run:
+        folders = trasher.reclaimable_by_folder(files_to_trash)
+        console.print("\n[bold]Space that would be reclaimed per folder:[/bold]")
+        for folder, count, size in folders:
+            console.print(f"  {utils.format_size(size):>10}  {folder.relative_to(scan_dir)} ({count} file(s))")
+        console.print(f"[bold green]Dry run: {utils.format_size(sum(size for _, _, size in folders))} would be reclaimed. Nothing was moved.[/bold green]")
+        return
+
     console.print("\n[bold red]Moving files to Trash immediately...[/bold red]")
     for result in trasher.move_files_to_trash(files_to_trash):
         console.print(result)
@@ -50,49 +285,133 @@ def cleanup(
 
 @app.command()
 def report(
-    target_dir: Path = typer.Argument(..., help="Directory to scan for a ProRes report.", exists=True, file_okay=False, dir_okay=True, readable=True)
+    ctx: typer.Context,
+    target_dir: Path = typer.Argument(..., help="Directory to scan for a ProRes report.", exists=True, file_okay=False, dir_okay=True, readable=True),
+    since: Path = typer.Option(None, "--since", help="Snapshot from an earlier report; only changed folders are rescanned and a delta report is made.", exists=True, dir_okay=False, readable=True),
+    fmt: str = FORMAT_OPTION,
+    pdf_max_files: int = PDF_MAX_FILES_OPTION,
+    depth: int = typer.Option(0, "--depth", help="Collapse the tree below this many folder levels (0 = show everything)."),
+    min_size: str = typer.Option("0", "--min-size", help="Collapse folders and group files smaller than this size, e.g. 500MB or 2G."),
+    duplicates: bool = typer.Option(False, "--duplicates", help="Count byte-identical ProRes files (reads only files whose size matches another's)."),
+    no_cache: bool = NO_CACHE_OPTION,
+    rebuild_cache: bool = REBUILD_CACHE_OPTION,
+    scan_threads: int = SCAN_THREADS_OPTION,
+    metrics_paths: Optional[List[Path]] = METRICS_OPTION,
 ):
     """
-    Generates a PDF report of all ProRes files in a directory tree.
+    Generates a report of all ProRes files in a directory tree, or with
+    `--since` a report of what changed since an earlier snapshot.
     """
-    console.print(f"Generating ProRes PDF report for [cyan]{target_dir}[/cyan]...")
-    with console.status("[bold green]Scanning files and building report...", spinner="dots"):
-        report_path = reporter.generate_report(target_dir)
-    console.print(f"[bold green]✓ Report successfully created at:[/bold green] [cyan]{report_path}[/cyan]")
+    _check_format(fmt)
+    if duplicates and since is not None:
+        raise typer.BadParameter("cannot be combined with --since", param_hint="--duplicates")
+    try:
+        min_size_bytes = utils.parse_size(min_size)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--min-size")
+    _collect_metrics(ctx, metrics_paths)
+    if since is not None:
+        console.print(f"Generating delta report for [cyan]{target_dir}[/cyan] since [cyan]{since}[/cyan]...")
+    else:
+        console.print(f"Generating ProRes {fmt.upper()} report for [cyan]{target_dir}[/cyan]...")
+    cache = _open_cache(no_cache, rebuild_cache)
+    try:
+        with console.status("[bold green]Scanning files and building report...", spinner="dots"):
+            if since is not None:
+                try:
+                    report_path, diff, stats = reporter.generate_delta_report(target_dir, since, cache=cache, scan_threads=scan_threads, fmt=fmt)
+                except ValueError as e:
+                    raise typer.BadParameter(str(e), param_hint="--since")
+            else:
+                report_paths = reporter.generate_report(
+                    target_dir, cache=cache, scan_threads=scan_threads, fmt=fmt, pdf_max_files=pdf_max_files,
+                    depth=depth or None, min_size=min_size_bytes, find_duplicates=duplicates,
+                )
+    finally:
+        if cache is not None:
+            cache.close()
+    if since is not None:
+        console.print(f"Rescanned {stats['listed']} changed folder(s), reused {stats['reused']} unchanged folder(s).")
+        console.print(f"Added: {len(diff['added'])} | Removed: {len(diff['removed'])} | Converted: {len(diff['converted'])} | "
+                      f"Reclaimed: {utils.format_size(max(0, diff['bytes_before'] - diff['bytes_after']))}")
+        report_paths = [report_path]
+    _print_report_paths("Report", report_paths)
 
 @app.command()
 def verify(
-    video_path: Path = typer.Argument(..., help="Path to the video file to verify.", exists=True, file_okay=True, dir_okay=False, readable=True)
+    video_path: Path = typer.Argument(..., help="Path to the video file to verify.", exists=True, file_okay=True, dir_okay=False, readable=True),
+    source: Path = typer.Option(None, "--source", help="ProRes source to compare an H.264 output with (default: the original in _SOURCE next to it).", exists=True, dir_okay=False, readable=True),
+    deep: bool = typer.Option(False, "--deep", help="Also decode sampled windows of the file to catch corruption."),
+    samples: int = typer.Option(verifier.DEFAULT_SAMPLES, "--samples", help="With --deep, number of windows to decode."),
+    window_seconds: float = typer.Option(verifier.DEFAULT_WINDOW_SECONDS, "--window-seconds", help="With --deep, length of each decoded window in seconds."),
 ):
     """
-    Verifies if a single video file is a ProRes file and checks for an alpha channel.
+    Verifies if a single video file is a ProRes file and checks for an alpha
+    channel. For a converted H.264 output, checks it against its ProRes source.
     """
     console.print(f"Verifying file: [cyan]{video_path}[/cyan]")
-    is_prores_file = utils.is_prores(str(video_path))
-    
-    if not is_prores_file:
+    # ProRes streams always get a pixel format from the parser; other codecs need none here.
+    info = utils.probe(video_path)
+    if source is None and not info.is_prores:
+        archived = video_path.parent / "_SOURCE" / video_path.name
+        source = archived if archived.exists() else None
+    if source is not None:
+        console.print(f"Comparing with source: [cyan]{source}[/cyan]")
+        problems = verifier.verify_output(video_path, utils.probe(source), samples=samples if deep else 0,
+                                          window_seconds=window_seconds, output=info)
+        for problem in problems:
+            console.print(f"[bold red]✗ {problem}[/bold red]")
+        if problems:
+            raise typer.Exit(1)
+        checked = f", {samples} sampled window(s) decoded cleanly" if deep else ""
+        console.print(f"[bold green]✓ The output matches its source{checked}.[/bold green]")
+        return
+
+    if not info.is_prores:
         console.print("[bold red]✗ The file is not a ProRes video.[/bold red]")
         return
 
-    console.print("[bold green]✓ The file is a ProRes video.[/bold green]")
+    profile = f" ({info.profile})" if info.profile else ""
+    console.print(f"[bold green]✓ The file is a ProRes{profile} video.[/bold green]")
     
-    has_alpha = utils.has_alpha_channel(str(video_path))
-    if has_alpha:
+    if info.has_alpha:
         console.print("[bold yellow]  - It contains an alpha channel.[/bold yellow]")
     else:
         console.print("  - It does not contain an alpha channel.")
+    if info.width and info.height:
+        console.print(f"  - Resolution: {info.width}x{info.height} ({info.pix_fmt})")
+    if info.duration:
+        frames = f", {info.nb_frames} frames" if info.nb_frames else ""
+        console.print(f"  - Duration: {info.duration:.2f}s{frames}")
+    if info.bit_rate:
+        console.print(f"  - Bitrate: {info.bit_rate / 1_000_000:.1f} Mb/s")
+    console.print(f"  - Audio streams: {info.audio_streams}")
+    if deep and info.duration:
+        problems = verifier.decode_samples(video_path, info.duration, samples, window_seconds)
+        for problem in problems:
+            console.print(f"[bold red]✗ {problem}[/bold red]")
+        if problems:
+            raise typer.Exit(1)
+        console.print(f"[bold green]✓ {samples} sampled window(s) decoded cleanly.[/bold green]")
 
 @app.command()
 def conversion_report(
-    target_dir: Path = typer.Argument(..., help="Directory to scan for a conversion report.", exists=True, file_okay=False, dir_okay=True, readable=True)
+    ctx: typer.Context,
+    target_dir: Path = typer.Argument(..., help="Directory to scan for a conversion report.", exists=True, file_okay=False, dir_okay=True, readable=True),
+    fmt: str = FORMAT_OPTION,
+    pdf_max_files: int = PDF_MAX_FILES_OPTION,
+    scan_threads: int = SCAN_THREADS_OPTION,
+    metrics_paths: Optional[List[Path]] = METRICS_OPTION,
 ):
     """
-    Generates a PDF conversion report of all files in _SOURCE, _FAILED, _ALPHA, and _PROCESSING folders in a directory tree.
+    Generates a conversion report of all files in _SOURCE, _FAILED, _ALPHA, and _PROCESSING folders in a directory tree.
     """
-    console.print(f"Generating Conversion PDF report for [cyan]{target_dir}[/cyan]...")
+    _check_format(fmt)
+    _collect_metrics(ctx, metrics_paths)
+    console.print(f"Generating Conversion {fmt.upper()} report for [cyan]{target_dir}[/cyan]...")
     with console.status("[bold green]Scanning files and building conversion report...", spinner="dots"):
-        report_path = reporter.generate_conversion_report(target_dir)
-    console.print(f"[bold green]✓ Conversion report successfully created at:[/bold green] [cyan]{report_path}[/cyan]")
+        report_paths = reporter.generate_conversion_report(target_dir, scan_threads=scan_threads, fmt=fmt, pdf_max_files=pdf_max_files)
+    _print_report_paths("Conversion report", report_paths)
 
 if __name__ == "__main__":
     app() 
\ No newline at end of file
@@ -1,14 +1,63 @@
+import functools
+import queue
 import subprocess
-import shutil
+import threading
+import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from .utils import find_prores_files_fast, validate_video_file, compute_sha256
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . import metrics, volumes
+from .checksum import ALGORITHMS, DEFAULT_ALGORITHM, find_sidecar, hash_file, read_sidecar, unchanged_since_hashed, write_sidecar
+from .dedup import DEFER, DuplicateIndex, link_or_copy
+from .encoder import (DEFAULT_SPLIT_SECONDS, DEFAULT_STALL_TIMEOUT, DEFAULT_TIMEOUT_FACTOR, H264_OUTPUT_OPTIONS, EncodeTimeout,
+                      discard_segments, encode_segmented, run_ffmpeg, segment_count)
+from .journal import (ENCODING, FAILED, FINALIZED, HASHED, MOVED, QUEUED, RELEASED, VALIDATED, ConversionJournal, find_entry,
+                      pending_entries, journal_path, read_journal)
+from .leases import DEFAULT_TTL, LeaseLostError, LeaseManager
+from .records import ConversionResult, ErrorCategory, FileRecord, Status
+from .scheduler import JobQueue, ProgressEstimator, plan_workers
+from .transfer import CrossDeviceMoveError, is_cross_device, move_file
+from .utils import MediaInfo, _prores_entry, format_size, iter_prores_files, probe, require_executable
+from .verifier import verify_output
+from .watcher import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE, DropWatcher
 
-def convert_to_h264(video_path: Path, max_retries: int = 2):
+def convert_to_h264(
+    video_path: Path,
+    max_retries: int = 2,
+    info: MediaInfo | None = None,
+    threads: int | None = None,
+    on_progress=None,
+    stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+    timeout_factor: float = DEFAULT_TIMEOUT_FACTOR,
+    journal: ConversionJournal | None = None,
+    max_copy_bytes: int | None = None,
+    algorithm: str = DEFAULT_ALGORITHM,
+    input_checksum: str | None = None,
+    verify_samples: int = 0,
+    segments: int = 1,
+    leases: LeaseManager | None = None,
+) -> ConversionResult:
     """
     Moves a video to a processing folder within its own directory, converts it,
     and then moves the original to a converted folder. Retries on transient errors.
+    `info` is the source's MediaInfo from discovery; if omitted the file is probed.
+    `threads` caps the encoder threads of this ffmpeg (default: ffmpeg decides).
+    `on_progress` receives ffmpeg progress snapshots (see encoder.run_ffmpeg); the
+    encode fails if it stalls for `stall_timeout` seconds or runs longer than
+    `timeout_factor` times the source duration. If a `journal` is given, each
+    state transition is durably recorded before the next step starts.
+    Source and output are hashed with `algorithm` (pass `input_checksum` if the
+    source was already hashed) and the digests are written to a sidecar next
+    to the archived original in _SOURCE. The output must match the source's
+    duration, frame count, resolution and audio (see verifier.py); with
+    `verify_samples`, that many windows of it are also decoded.
+    With `segments` > 1, the source is encoded as that many parallel segments
+    (see encoder.encode_segmented), each with `threads` threads.
+    With `leases`, the file's lease is checked before every state transition
+    and while encoding, and LeaseLostError is raised, leaving the file as it
+    is, once another node has taken it over.
+    Returns a ConversionResult; other failures are reported in it, not raised.
     """
+    started = time.monotonic()
     original_path = video_path
     parent_dir = original_path.parent
     
@@ -23,196 +72,840 @@ def convert_to_h264(video_path: Path, max_retries: int = 2):
     processing_path = processing_dir / original_path.name
     output_path = original_path
 
+    size = original_path.stat().st_size
+    copied_bytes = 0
     attempt = 0
+
+    def _failed(error: ErrorCategory, message: str, suggestion: str | None = None) -> ConversionResult:
+        return ConversionResult(original_path, Status.FAILED, message, error, suggestion, bytes_in=size,
+                                bytes_copied=copied_bytes, attempts=attempt + 1, seconds=time.monotonic() - started)
+
+    cross_device = [d.name for d in (processing_dir, source_dir) if is_cross_device(original_path, d)]
+    if cross_device and max_copy_bytes is not None and size > max_copy_bytes:
+        return _failed(
+            ErrorCategory.TRANSFER,
+            f"{' and '.join(cross_device)} is on a different device than {original_path}; "
+            f"moving it would copy {format_size(size)} (left in place)",
+            f"Unmount or relocate {' and '.join(cross_device)}, or raise --max-copy-gb.",
+        )
+
+    def _move(src, dst, max_copy_bytes=None):
+        nonlocal copied_bytes
+        copied_bytes += move_file(src, dst, max_copy_bytes=max_copy_bytes).bytes_copied
+
+    def _check_lease():
+        if leases is not None and not leases.holds(original_path, check=True):
+            raise LeaseLostError(f"another node took over {original_path}")
+
+    def _to_failed(src: Path) -> str:
+        """Moves `src` into _FAILED and says where the source ended up, for the failure message."""
+        _check_lease()
+        try:
+            _move(src, failed_dir / original_path.name, max_copy_bytes)
+        except CrossDeviceMoveError:
+            if src != original_path:
+                # Put the source back in place of the partial output.
+                output_path.unlink(missing_ok=True)
+                _move(src, original_path)
+            return (f"left in place: _FAILED is on a different device; "
+                    f"moving it would copy {format_size(size)}")
+        return "moved to _FAILED"
+
+    def _record(state, **details):
+        # Every transition but the last precedes a file operation another node must not race.
+        if state != FINALIZED:
+            _check_lease()
+        if journal is not None:
+            journal.record(original_path, state, **details)
+
+    encode_progress = on_progress
+    if leases is not None:
+        def encode_progress(snapshot):
+            # Raising here kills ffmpeg (see encoder.run_ffmpeg).
+            if not leases.holds(original_path):
+                raise LeaseLostError(f"another node took over {original_path}")
+            if on_progress is not None:
+                on_progress(snapshot)
+
     while attempt <= max_retries:
         try:
-            # Compute input checksum before moving
+            # Compute input checksum before moving, unless it was prefetched
             try:
-                input_checksum = compute_sha256(str(original_path))
+                if input_checksum is None:
+                    input_checksum = hash_file(original_path, algorithm)
             except Exception as e:
-                failed_path = failed_dir / original_path.name
-                shutil.move(str(original_path), str(failed_path))
-                return (
-                    f"[INTEGRITY ERROR] Could not compute checksum for input file: {original_path} (moved to _FAILED)\n"
-                    f"Suggestion: Check if the file is accessible and not corrupted."
+                return _failed(
+                    ErrorCategory.INTEGRITY,
+                    f"Could not compute checksum for input file: {original_path} ({_to_failed(original_path)})",
+                    "Check if the file is accessible and not corrupted.",
                 )
-            shutil.move(str(original_path), str(processing_path))
-
-            # Validate input file before conversion
-            if not validate_video_file(str(processing_path)):
-                failed_path = failed_dir / original_path.name
-                shutil.move(str(processing_path), str(failed_path))
-                return (
-                    f"[VALIDATION ERROR] Input file validation failed: {processing_path} (moved to _FAILED)\n"
-                    f"Suggestion: Check if the input file is a valid video."
+            # Later states repeat the source digest: the journal keeps only each file's latest entry.
+            _record(HASHED, algorithm=algorithm, checksum=input_checksum)
+            _move(original_path, processing_path, max_copy_bytes)
+            _record(MOVED, algorithm=algorithm, checksum=input_checksum)
+
+            # Validate input file before conversion, reusing the discovery probe
+            if info is None:
+                info = probe(processing_path)
+            if not info.valid:
+                return _failed(
+                    ErrorCategory.VALIDATION,
+                    f"Input file validation failed: {processing_path} ({_to_failed(processing_path)})",
+                    "Check if the input file is a valid video.",
                 )
 
             command = [
-                "ffmpeg", "-i", str(processing_path),
-                "-c:v", "libx264", "-crf", "23", "-preset", "medium",
-                "-pix_fmt", "yuv420p", "-c:a", "copy",
-                "-movflags", "+faststart", "-y", str(output_path)
+                require_executable("ffmpeg"), "-i", str(processing_path),
+                *H264_OUTPUT_OPTIONS, "-y", str(output_path)
             ]
+            if threads:
+                command[-2:-2] = ["-threads", str(threads)]
+            _record(ENCODING, algorithm=algorithm, checksum=input_checksum)
             try:
-                subprocess.run(command, check=True, capture_output=True, text=True, timeout=300)
-            except subprocess.TimeoutExpired:
-                failed_path = failed_dir / original_path.name
-                shutil.move(str(processing_path), str(failed_path))
-                return (
-                    f"[TIMEOUT ERROR] Conversion timed out for {processing_path} (moved to _FAILED)\n"
-                    f"Suggestion: Try increasing the timeout or check for system performance issues."
+                if segments < 2 or not encode_segmented(
+                    processing_path, output_path, segments, processing_dir,
+                    threads=threads, on_progress=encode_progress, stall_timeout=stall_timeout, timeout_factor=timeout_factor,
+                ):
+                    run_ffmpeg(
+                        command,
+                        duration=info.duration,
+                        on_progress=encode_progress,
+                        stall_timeout=stall_timeout,
+                        timeout_factor=timeout_factor,
+                        output=output_path,
+                    )
+            except EncodeTimeout as e:
+                return _failed(
+                    ErrorCategory.TIMEOUT,
+                    f"Conversion {e.reason} for {processing_path} ({_to_failed(processing_path)})",
+                    "Raise --stall-timeout/--timeout-factor or check for system performance issues.",
                 )
             except subprocess.CalledProcessError as e:
                 # Retry on transient errors (e.g., IO error, file lock)
                 if attempt < max_retries and 'Resource temporarily unavailable' in (e.stderr or ''):
                     attempt += 1
+                    metrics.count("retries")
                     continue
-                failed_path = failed_dir / original_path.name
-                shutil.move(str(processing_path), str(failed_path))
-                return (
-                    f"[FFMPEG ERROR] Conversion failed for {processing_path}: {e.stderr.strip()} (moved to _FAILED)\n"
-                    f"Suggestion: Check ffmpeg logs and input file integrity."
+                return _failed(
+                    ErrorCategory.FFMPEG,
+                    f"Conversion failed for {processing_path}: {e.stderr.strip()} ({_to_failed(processing_path)})",
+                    "Check ffmpeg logs and input file integrity.",
                 )
+            except LeaseLostError:
+                raise
             except Exception as e:
                 # Retry on transient IO errors
                 if attempt < max_retries and 'temporarily unavailable' in str(e):
                     attempt += 1
+                    metrics.count("retries")
                     continue
-                failed_path = failed_dir / original_path.name
-                shutil.move(str(processing_path), str(failed_path))
-                return (
-                    f"[UNEXPECTED ERROR] Conversion failed for {processing_path}: {str(e)} (moved to _FAILED)\n"
-                    f"Suggestion: Investigate the error and check system resources."
+                return _failed(
+                    ErrorCategory.UNEXPECTED,
+                    f"Conversion failed for {processing_path}: {str(e)} ({_to_failed(processing_path)})",
+                    "Investigate the error and check system resources.",
                 )
 
-            # Validate output file after conversion
-            if output_path.exists() and output_path.stat().st_size > 0 and validate_video_file(str(output_path)):
+            # Compare the output with the source (and decode samples of it, if asked)
+            problems = ["zero size output"]
+            if output_path.exists() and output_path.stat().st_size > 0:
+                problems = verify_output(output_path, info, samples=verify_samples)
+            if not problems:
                 # Compute output checksum
                 try:
-                    output_checksum = compute_sha256(str(output_path))
+                    output_checksum = hash_file(output_path, algorithm)
                 except Exception as e:
-                    failed_path = failed_dir / original_path.name
-                    shutil.move(str(processing_path), str(failed_path))
-                    return (
-                        f"[INTEGRITY ERROR] Could not compute checksum for output file: {output_path} (moved to _FAILED)\n"
-                        f"Suggestion: Check disk space and file system integrity."
+                    return _failed(
+                        ErrorCategory.INTEGRITY,
+                        f"Could not compute checksum for output file: {output_path} ({_to_failed(processing_path)})",
+                        "Check disk space and file system integrity.",
                     )
+                _record(VALIDATED, algorithm=algorithm, checksum=input_checksum, output_checksum=output_checksum)
                 source_path = source_dir / original_path.name
-                shutil.move(str(processing_path), str(source_path))
-                if attempt > 0:
-                    return (f"Successfully converted after {attempt+1} attempts: {original_path.relative_to(original_path.parents[2])}\n"
-                            f"Input SHA256: {input_checksum}\nOutput SHA256: {output_checksum}")
-                return (f"Successfully converted: {original_path.relative_to(original_path.parents[2])}\n"
-                        f"Input SHA256: {input_checksum}\nOutput SHA256: {output_checksum}")
+                _move(processing_path, source_path)
+                # The archived original will not be read again soon; free its cached pages.
+                volumes.drop_cached_path(source_path)
+                write_sidecar(source_path, algorithm, [(source_path, input_checksum), (output_path, output_checksum)])
+                _record(FINALIZED)
+                attempts = f" after {attempt+1} attempts" if attempt > 0 else ""
+                return ConversionResult(
+                    original_path, Status.CONVERTED,
+                    f"Successfully converted{attempts}: {original_path.relative_to(original_path.parents[2])}",
+                    bytes_in=size, bytes_out=output_path.stat().st_size, bytes_copied=copied_bytes,
+                    algorithm=algorithm, input_checksum=input_checksum, output_checksum=output_checksum,
+                    attempts=attempt + 1, seconds=time.monotonic() - started,
+                )
             else:
-                failed_path = failed_dir / original_path.name
-                shutil.move(str(processing_path), str(failed_path))
-                if not output_path.exists() or output_path.stat().st_size == 0:
-                    msg = (
-                        f"[FFMPEG ERROR] Conversion failed (zero size output): {output_path} (moved to _FAILED)\n"
-                        f"Suggestion: Check ffmpeg command and input file."
-                    )
-                else:
-                    msg = (
-                        f"[VALIDATION ERROR] Output file validation failed: {output_path} (moved to _FAILED)\n"
-                        f"Suggestion: Check if the output file is playable."
-                    )
                 if attempt < max_retries:
+                    # Put the source back so the next attempt starts over from it.
+                    _check_lease()
+                    output_path.unlink(missing_ok=True)
+                    _move(processing_path, original_path)
                     attempt += 1
+                    metrics.count("retries")
                     continue
-                return msg
+                where = _to_failed(processing_path)
+                if problems == ["zero size output"]:
+                    return _failed(
+                        ErrorCategory.FFMPEG,
+                        f"Conversion failed (zero size output): {output_path} ({where})",
+                        "Check ffmpeg command and input file.",
+                    )
+                return _failed(
+                    ErrorCategory.VALIDATION,
+                    f"Output file validation failed ({'; '.join(problems)}): {output_path} ({where})",
+                    "Check if the output file is playable.",
+                )
+        except LeaseLostError:
+            raise
         except Exception as e:
             # Retry on transient IO errors
             if attempt < max_retries and 'temporarily unavailable' in str(e):
                 attempt += 1
+                metrics.count("retries")
                 continue
-            failed_path = failed_dir / original_path.name
-            if processing_path.exists():
-                shutil.move(str(processing_path), str(failed_path))
-            return (
-                f"[UNEXPECTED ERROR] Conversion failed for {processing_path}: {str(e)} (moved to _FAILED)\n"
-                f"Suggestion: Investigate the error and check system resources."
+            where = _to_failed(processing_path) if processing_path.exists() else "left in place"
+            if isinstance(e, CrossDeviceMoveError):
+                # A rename refused across bind mounts of one filesystem, which the up-front check cannot see.
+                return _failed(ErrorCategory.TRANSFER, f"{e} ({where})", "Raise --max-copy-gb or move the folders onto one mount.")
+            return _failed(
+                ErrorCategory.UNEXPECTED,
+                f"Conversion failed for {processing_path}: {str(e)} ({where})",
+                "Investigate the error and check system resources.",
             )
         break
     if attempt > max_retries:
-        return f"[RETRY ERROR] Conversion failed after {max_retries+1} attempts: {original_path.name} (moved to _FAILED)"
+        return _failed(ErrorCategory.RETRY, f"Conversion failed after {max_retries+1} attempts: {original_path.name} (moved to _FAILED)")
 
-def run_conversion(scan_dir: Path, max_workers: int = 4):
-    """Scans a directory tree and converts all valid ProRes .mov files, with progress tracking and live Markdown report."""
-    import time
-    import datetime
-    import os
-    if not shutil.which("ffmpeg"):
-        raise FileNotFoundError("ffmpeg not found. Please install ffmpeg.")
+def _output_checksum(leader_output: Path, algorithm: str) -> str:
+    """The leader's output digest from its sidecar, or hashed again if the sidecar does not list it."""
+    sidecar = find_sidecar(leader_output.parent / "_SOURCE" / leader_output.name)
+    if sidecar is not None and sidecar.suffix == ALGORITHMS[algorithm]:
+        for entry in read_sidecar(sidecar):
+            if entry['path'] == leader_output.resolve() and unchanged_since_hashed(entry):
+                return entry['digest']
+    return hash_file(leader_output, algorithm)
 
-    folders_to_skip = ['_PROCESSING', '_SOURCE', '_ALPHA']
-    all_prores_files = find_prores_files_fast(scan_dir, folders_to_ignore=folders_to_skip)
+def link_duplicate(
+    video_path: Path,
+    leader_output: Path,
+    input_checksum: str,
+    journal: ConversionJournal | None = None,
+    max_copy_bytes: int | None = None,
+    algorithm: str = DEFAULT_ALGORITHM,
+    leases: LeaseManager | None = None,
+) -> ConversionResult | None:
+    """
+    Finishes a source that is byte-identical to one already converted in this
+    run: instead of encoding it, `leader_output` (the other file's H.264) is
+    reflinked, hardlinked or copied to its original path (see
+    dedup.link_or_copy). The original is archived to _SOURCE with a sidecar
+    and journalled exactly as convert_to_h264 does, so resume and cleanup
+    treat both the same. Returns None if the output could not be linked, so
+    the caller can convert the file normally instead. Raises LeaseLostError
+    like convert_to_h264.
+    """
+    started = time.monotonic()
+    original_path = video_path
+    size = original_path.stat().st_size
+    processing_dir = original_path.parent / "_PROCESSING"
+    source_dir = original_path.parent / "_SOURCE"
+    processing_path = processing_dir / original_path.name
+    source_path = source_dir / original_path.name
 
-    if not all_prores_files:
-        yield "No new ProRes .mov files found to convert."
-        return
+    def _record(state, **details):
+        if state != FINALIZED and leases is not None and not leases.holds(original_path, check=True):
+            raise LeaseLostError(f"another node took over {original_path}")
+        if journal is not None:
+            journal.record(original_path, state, **details)
 
-    files_to_process = []
-    for file_info in all_prores_files:
-        f = file_info['path']
-        if file_info['alpha']:
-            alpha_dir = f.parent / "_ALPHA"
-            alpha_dir.mkdir(exist_ok=True)
-            try:
-                shutil.move(str(f), str(alpha_dir / f.name))
-                yield f"Moved to _ALPHA: {f.relative_to(scan_dir)}"
-            except Exception as e:
-                yield f"Error moving {f.name} to _ALPHA: {e}"
-        else:
-            files_to_process.append(f)
+    processing_dir.mkdir(exist_ok=True)
+    source_dir.mkdir(exist_ok=True)
+    try:
+        output_checksum = _output_checksum(leader_output, algorithm)
+        _record(HASHED, algorithm=algorithm, checksum=input_checksum)
+        move_file(original_path, processing_path, max_copy_bytes=max_copy_bytes)
+        _record(MOVED, algorithm=algorithm, checksum=input_checksum)
+    except LeaseLostError:
+        raise
+    except Exception:
+        return None
+    try:
+        method = link_or_copy(leader_output, original_path)
+    except Exception:
+        original_path.unlink(missing_ok=True)
+        move_file(processing_path, original_path)
+        return None
+    _record(VALIDATED, algorithm=algorithm, checksum=input_checksum, output_checksum=output_checksum)
+    move_file(processing_path, source_path)
+    volumes.drop_cached_path(source_path)
+    write_sidecar(source_path, algorithm, [(source_path, input_checksum), (original_path, output_checksum)])
+    _record(FINALIZED)
+    return ConversionResult(
+        original_path, Status.DUPLICATE,
+        f"Linked duplicate ({method}) of {leader_output.relative_to(leader_output.parents[2])}: "
+        f"{original_path.relative_to(original_path.parents[2])}",
+        bytes_in=size, bytes_out=original_path.stat().st_size, algorithm=algorithm,
+        input_checksum=input_checksum, output_checksum=output_checksum, seconds=time.monotonic() - started,
+    )
 
-    if not files_to_process:
-        yield "No new suitable ProRes files (without alpha) found to convert."
+_DISCOVERY_DONE = object()
+HASH_WORKERS = 2
+
+def _relative_name(path: Path, scan_dir: Path) -> Path:
+    """`path` relative to `scan_dir` for messages, or as it is if it lies elsewhere."""
+    return path.relative_to(scan_dir) if path.is_relative_to(scan_dir) else path
+
+def _put(out_queue: queue.Queue, stop_event: threading.Event, item) -> bool:
+    """Puts `item` on a producer's bounded queue, waiting for room; False once the consumer has stopped."""
+    while not stop_event.is_set():
+        try:
+            out_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _discover_files(scan_dir: Path, folders_to_skip, cache, scan_threads: int, out_queue: queue.Queue, stop_event: threading.Event):
+    """
+    Producer thread for run_conversion: streams probed ProRes files into a
+    bounded queue, blocking when the queue is full, until the scan is done or
+    the consumer sets `stop_event`.
+    """
+    try:
+        for file_info in iter_prores_files(scan_dir, folders_to_ignore=folders_to_skip, cache=cache, scan_threads=scan_threads):
+            if not _put(out_queue, stop_event, file_info):
+                return
+    except Exception as e:
+        _put(out_queue, stop_event, e)
+    finally:
+        _put(out_queue, stop_event, _DISCOVERY_DONE)
+
+def _write_recovered_sidecar(entry: dict, original_path: Path, source_path: Path):
+    """
+    Writes the sidecar of a conversion that was validated before a run was
+    interrupted, unless it was written already. Digests missing from the
+    journal entry are computed again.
+    """
+    if find_sidecar(source_path) is not None:
         return
+    algorithm = entry.get('algorithm', DEFAULT_ALGORITHM)
+    input_checksum = entry.get('checksum') or hash_file(source_path, algorithm)
+    output_checksum = entry.get('output_checksum') or hash_file(original_path, algorithm)
+    write_sidecar(source_path, algorithm, [(source_path, input_checksum), (original_path, output_checksum)])
 
-    total = len(files_to_process)
+def _recover_files(scan_dir: Path, journal: ConversionJournal, out_queue: queue.Queue, stop_event: threading.Event):
+    """
+    Producer thread for `run_conversion(resume=True)`: instead of scanning, replays
+    the journal and feeds back only the files an interrupted run left unfinished.
+
+    Files caught mid-encode, or mid-move into _PROCESSING, are moved back
+    (discarding any partial output and segments); files that were already validated are
+    finalized, with their checksum sidecar, without re-encoding. Status
+    messages are passed through the queue as strings.
+    """
+    try:
+        for entry in pending_entries(scan_dir):
+            original_path = Path(entry['path'])
+            processing_path = original_path.parent / "_PROCESSING" / original_path.name
+            source_path = original_path.parent / "_SOURCE" / original_path.name
+            failed_path = original_path.parent / "_FAILED" / original_path.name
+            state = entry['state']
+            # A crash during the move into _PROCESSING (a long copy across devices) leaves HASHED as the last state.
+            in_flight = state in (MOVED, ENCODING, VALIDATED) or (
+                state == HASHED and processing_path.exists() and not original_path.exists())
+            rel_name = _relative_name(original_path, scan_dir)
+            discard_segments(processing_path.parent, original_path)
+
+            if state == VALIDATED and processing_path.exists() and original_path.exists():
+                move_file(processing_path, source_path)
+                volumes.drop_cached_path(source_path)
+                _write_recovered_sidecar(entry, original_path, source_path)
+                journal.record(original_path, FINALIZED)
+                message = f"Finalized interrupted conversion: {rel_name}"
+            elif state == VALIDATED and not processing_path.exists() and source_path.exists() and original_path.exists():
+                _write_recovered_sidecar(entry, original_path, source_path)
+                journal.record(original_path, FINALIZED)
+                message = f"Already converted: {rel_name}"
+            elif in_flight and not processing_path.exists() and failed_path.exists():
+                journal.record(original_path, FAILED, message="moved to _FAILED before the interruption")
+                message = f"Already failed (see _FAILED): {rel_name}"
+            else:
+                if in_flight and processing_path.exists():
+                    # Whatever sits at the original path is a partial encode.
+                    original_path.unlink(missing_ok=True)
+                    move_file(processing_path, original_path)
+                    _put(out_queue, stop_event, f"Recovered from _PROCESSING: {rel_name}")
+                info = probe(original_path) if original_path.exists() else None
+                if info is None or not info.is_prores:
+                    journal.record(original_path, FAILED, message="missing or no longer ProRes on resume")
+                    message = f"Skipped (missing or no longer ProRes): {rel_name}"
+                else:
+                    message = _file_entry(original_path, info)
+            if not _put(out_queue, stop_event, message):
+                return
+    except Exception as e:
+        _put(out_queue, stop_event, e)
+    finally:
+        _put(out_queue, stop_event, _DISCOVERY_DONE)
+
+def _watch_files(scan_dir: Path, folders_to_skip, cache, scan_threads: int, out_queue: queue.Queue, stop_event: threading.Event,
+                 settle: float, poll_interval: float, use_inotify: bool):
+    """
+    Producer thread for `run_conversion(watch=True)`: converts what is already
+    in the tree, then keeps feeding ProRes files dropped into it once they have
+    settled (see watcher.py), until the consumer sets `stop_event`.
+    """
+    watcher = None
+    try:
+        # Start watching before the initial scan so nothing dropped during it is missed.
+        watcher = DropWatcher(scan_dir, folders_to_skip, settle=settle, poll_interval=poll_interval, use_inotify=use_inotify)
+        _put(out_queue, stop_event, f"Watching {scan_dir} for new ProRes files ({watcher.mode}, settle {settle:g}s).")
+        settled_before = time.time_ns() - int(settle * 1e9)
+        for file_info in iter_prores_files(scan_dir, folders_to_ignore=folders_to_skip, cache=cache, scan_threads=scan_threads):
+            if file_info.mtime_ns > settled_before:
+                continue  # Still being written; the watcher reports it once settled.
+            watcher.mark_seen(file_info.path, file_info.size, file_info.mtime_ns)
+            if not _put(out_queue, stop_event, file_info):
+                return
+        while not stop_event.is_set():
+            for path in watcher.poll(timeout=1.0):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                info = cache.get(st) if cache is not None else None
+                if info is None:
+                    try:
+                        info = probe(path)
+                    except Exception as e:
+                        _put(out_queue, stop_event, f"Could not probe {path.relative_to(scan_dir)}: {e}")
+                        continue
+                    if cache is not None:
+                        cache.put(path, st, info)
+                if info.is_prores and not _put(out_queue, stop_event, _prores_entry(path, st, info)):
+                    return
+    except Exception as e:
+        _put(out_queue, stop_event, e)
+    finally:
+        if watcher is not None:
+            watcher.close()
+        _put(out_queue, stop_event, _DISCOVERY_DONE)
+
+def _file_entry(path: Path, info: MediaInfo) -> FileRecord:
+    return _prores_entry(path, path.stat(), info)
+
+def _reclaim_file(scan_dir: Path, original_path: Path, entry: dict | None = None,
+                  journal: ConversionJournal | None = None) -> FileRecord | str:
+    """
+    Prepares a file whose lease was taken over from a dead node, given that
+    node's journal `entry` for it, if any. A conversion the dead node had
+    already validated is finalized, with its sidecar, without encoding it
+    again. Otherwise a file left in _PROCESSING is moved back, discarding the
+    partial output at its original path. Returns the FileRecord to convert,
+    or a status message if there is nothing left to do.
+    """
+    processing_path = original_path.parent / "_PROCESSING" / original_path.name
+    source_path = original_path.parent / "_SOURCE" / original_path.name
+    rel_name = _relative_name(original_path, scan_dir)
+    discard_segments(processing_path.parent, original_path)
+    validated = entry is not None and entry['state'] == VALIDATED and original_path.exists()
+    if validated and (processing_path.exists() or source_path.exists()):
+        if processing_path.exists():
+            source_path.parent.mkdir(exist_ok=True)
+            move_file(processing_path, source_path)
+            volumes.drop_cached_path(source_path)
+        _write_recovered_sidecar(entry, original_path, source_path)
+        if journal is not None:
+            journal.record(original_path, FINALIZED)
+        return f"Finalized conversion of expired lease: {rel_name}"
+    if processing_path.exists():
+        original_path.unlink(missing_ok=True)
+        move_file(processing_path, original_path)
+    elif source_path.exists() or not original_path.exists():
+        return f"Nothing to recover for expired lease: {rel_name}"
+    info = probe(original_path)
+    if not info.is_prores:
+        return f"Skipped (no longer ProRes): {rel_name}"
+    return _file_entry(original_path, info)
+
+def _claim(leases: LeaseManager, file_info: FileRecord) -> bool:
+    """Leases a discovered file, unless another node holds it or already converted it."""
+    path = file_info.path
+    if not leases.claim(path):
+        return False
+    try:
+        st = path.stat()
+    except OSError:
+        st = None
+    if st is None or st.st_size != file_info.size or st.st_mtime_ns != file_info.mtime_ns:
+        # Another node converted or moved it after our scan saw it.
+        leases.release(path)
+        return False
+    return True
+
+def _prefetch_checksum(path: Path, algorithm: str) -> str | None:
+    try:
+        return hash_file(path, algorithm)
+    except OSError:
+        # convert_to_h264 hashes the file again and reports the error.
+        return None
+
+
+def _convert_when_hashed(checksum_future, video_path: Path, duplicates: DuplicateIndex | None = None, **kwargs) -> ConversionResult:
+    """
+    Converts a file once its prefetched checksum is ready. With `duplicates`,
+    a file identical to one converted earlier in the run is linked instead,
+    and one identical to a file still being converted returns DEFER.
+    """
+    checksum = checksum_future.result()
+    if duplicates is not None and checksum is not None:
+        leader_output = duplicates.claim(checksum)
+        if leader_output is DEFER:
+            return DEFER
+        if leader_output is not None:
+            result = link_duplicate(video_path, leader_output, checksum, journal=kwargs.get('journal'),
+                                    max_copy_bytes=kwargs.get('max_copy_bytes'), algorithm=kwargs.get('algorithm', DEFAULT_ALGORITHM),
+                                    leases=kwargs.get('leases'))
+            if result is not None:
+                return result
+    return convert_to_h264(video_path, input_checksum=checksum, **kwargs)
+
+
+def run_conversion(
+    scan_dir: Path,
+    max_workers: int = 0,
+    cache=None,
+    scan_threads: int = 1,
+    order: str = "largest",
+    threads: int = 0,
+    on_progress=None,
+    stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+    timeout_factor: float = DEFAULT_TIMEOUT_FACTOR,
+    resume: bool = False,
+    max_copy_bytes: int | None = None,
+    algorithm: str = DEFAULT_ALGORITHM,
+    shared: bool = False,
+    lease_ttl: float = DEFAULT_TTL,
+    watch: bool = False,
+    settle: float = DEFAULT_SETTLE,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    use_inotify: bool = True,
+    dedup: bool = False,
+    verify_samples: int = 0,
+    split_seconds: float = DEFAULT_SPLIT_SECONDS,
+):
+    """
+    Scans a directory tree and converts all valid ProRes .mov files, with progress tracking and live Markdown report.
+    Yields status messages as strings and a ConversionResult for each finished file.
+
+    Discovery, probing and conversion are pipelined: probed files flow through a
+    bounded queue into a scheduler that hands them to the conversion pool in
+    `order` (largest, smallest or fifo), so the first encode starts as soon as
+    the first ProRes file is found. `max_workers` and `threads` (ffmpeg threads
+    per encode) of 0 are sized from the CPU core count. `on_progress(path, snapshot)`
+    is called from worker threads with live ffmpeg progress for each file, and
+    with a snapshot of None once the file is finished.
+
+    Every state transition is written to a journal in `scan_dir`. With `resume`,
+    the tree is not scanned; only the files the journal shows as unfinished are
+    recovered and converted. The journal is deleted once nothing is unfinished.
+    Files whose move into _PROCESSING/_SOURCE/_ALPHA would copy more than
+    `max_copy_bytes` across a mount boundary are left in place.
+
+    Source checksums (`algorithm`) are computed on a separate pool for the next
+    few scheduled files while earlier files encode, so hashing is I/O that
+    overlaps CPU-bound encoding instead of delaying each encode.
+
+    With `shared`, several processes (on this or other machines mounting the
+    same tree) can convert it at once: each file is leased before it is
+    touched (see leases.py), leases not renewed for `lease_ttl` seconds are
+    taken over and their files recovered, and each process keeps its own
+    journal. A process whose lease was taken over stops working on the file
+    before its next step, killing its encode. The taker finishes conversions
+    the dead process had validated, using that process's journal, and deletes
+    the journal once none of its leases are left.
+
+    With `watch`, the run does not end after the initial scan: files dropped
+    into the tree later are converted once they have stopped changing for
+    `settle` seconds (see watcher.py), until the generator is closed or
+    interrupted. _FAILED folders are not watched, so failures are not retried.
+
+    With `dedup`, sources with the same checksum are encoded once: later
+    copies wait for the first to finish and then get its output linked to
+    their own path (see dedup.py). If the first fails, the next is encoded.
+    `verify_samples` windows of each output are decoded before it is accepted.
+
+    Once there are more free workers than queued files (a few huge masters,
+    or the tail of a run), a file at least `split_seconds` long is encoded
+    as several segments in parallel, one per spare worker (0 disables this).
+    """
+    import datetime
+    import os
+    require_executable("ffmpeg")
+
+    max_workers, threads = plan_workers(max_workers, threads)
+    pending = JobQueue(order)
+    # Sorted policies need to see as much of the tree as possible to be useful.
+    # Shared runs only lease what they are about to start, leaving the rest to other nodes.
+    lookahead = max_workers if order == "fifo" or shared else 100_000
+
+    if not resume:
+        stranded = pending_entries(scan_dir)
+        if stranded:
+            yield (f"Warning: {len(stranded)} file(s) from an interrupted run are unfinished; "
+                   f"run `convert --resume` to recover them from _PROCESSING.")
+
+    folders_to_skip = ['_PROCESSING', '_SOURCE', '_ALPHA']
+    leases = LeaseManager(scan_dir, ttl=lease_ttl) if shared else None
+    journal = ConversionJournal(scan_dir, node=leases.node if shared else None)
+    discovered = queue.Queue(maxsize=max(2, max_workers * 2))
+    stop_event = threading.Event()
+    if resume:
+        producer_args = (_recover_files, (scan_dir, journal, discovered, stop_event))
+    elif watch:
+        producer_args = (_watch_files, (scan_dir, folders_to_skip + ['_FAILED'], cache, scan_threads, discovered, stop_event,
+                                        settle, poll_interval, use_inotify))
+    else:
+        producer_args = (_discover_files, (scan_dir, folders_to_skip, cache, scan_threads, discovered, stop_event))
+    producer = threading.Thread(target=producer_args[0], args=producer_args[1], name="prores-discovery", daemon=True)
+    producer.start()
+
+    scanning = True
+    found = 0
+    total = 0
     processed = 0
     succeeded = 0
     failed = 0
     error_summary = []
-    start_time = time.time()
-    report_path = os.path.join(scan_dir, f"conversion_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
-    with open(report_path, 'w') as report_file:
-        report_file.write(f"# Conversion Report\n\n")
-        report_file.write(f"**Started:** {datetime.datetime.now().isoformat()}\n\n")
-        report_file.write(f"| File | Status | Message | Timestamp |\n|---|---|---|---|\n")
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(convert_to_h264, f): f for f in files_to_process}
-            for future in as_completed(futures):
-                result = future.result()
-                processed += 1
-                now = datetime.datetime.now().isoformat()
-                if result.startswith("Successfully converted"):
-                    succeeded += 1
-                    status = "COMPLETE"
-                    msg = result.split('\n')[0]
-                elif result.startswith("Moved to _ALPHA"):
-                    status = "ALPHA"
-                    msg = result
-                else:
-                    failed += 1
-                    status = "FAILED"
-                    msg = result.split('\n')[0]
-                    if result.startswith("["):
-                        error_summary.append(result)
-                file_name = str(futures[future].relative_to(scan_dir))
-                report_file.write(f"| {file_name} | {status} | {msg.replace('|','\\|')} | {now} |\n")
-                elapsed = time.time() - start_time
-                avg_time = elapsed / processed if processed else 0
-                remaining = total - processed
-                est_remaining = avg_time * remaining
-                yield (f"Progress: {processed}/{total} | Succeeded: {succeeded} | Failed: {failed} | Remaining: {remaining} | "
-                       f"Elapsed: {elapsed:.1f}s | Est. Remaining: {est_remaining:.1f}s")
-                yield result
-        report_file.write(f"\n**Completed:** {datetime.datetime.now().isoformat()}\n")
-        report_file.write(f"\n**Total:** {total} | **Succeeded:** {succeeded} | **Failed:** {failed}\n")
-        if error_summary:
-            report_file.write(f"\n## Error Summary\n")
-            for err in error_summary:
-                report_file.write(f"- {err}\n")
-    yield f"Conversion report saved to: {report_path}" 
\ No newline at end of file
+    progress = ProgressEstimator()
+    report_path = None
+    report_file = None
+    futures = {}
+    weights = {}  # future -> workers it occupies (its number of segments)
+    busy = 0
+    checksums = {}
+    duplicates = DuplicateIndex() if dedup else None
+    source_checksums = {}  # future -> checksum future of the file it converts
+    followers = {}  # checksum -> files waiting for the first copy to be converted
+    linked = 0
+    linked_bytes = 0
+    reclaimed = []
+    claimed_elsewhere = 0
+    next_takeover = 0.0
+    if leases is not None:
+        leases.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="prores-hash") as hasher:
+            while scanning or pending or futures or reclaimed:
+                if leases is not None:
+                    for path in leases.take_lost():
+                        yield f"Warning: another node took over the lease on {_relative_name(path, scan_dir)}"
+                    if time.monotonic() >= next_takeover:
+                        next_takeover = time.monotonic() + lease_ttl / 2
+                        dead_journals = {}
+                        for path, node in leases.take_over_expired():
+                            if node and node not in dead_journals:
+                                dead_journals[node] = read_journal(scan_dir, node)
+                            entry = find_entry(dead_journals.get(node, {}), path.relative_to(scan_dir).as_posix())
+                            item = _reclaim_file(scan_dir, path, entry, journal)
+                            if isinstance(item, str):
+                                leases.release(path)
+                                yield item
+                            else:
+                                yield f"Took over expired lease: {_relative_name(path, scan_dir)}"
+                                reclaimed.append(item)
+                        # A dead node's journal is obsolete once none of its files are leased any more.
+                        if dead_journals:
+                            holding = leases.nodes_holding_leases()
+                            for node in dead_journals.keys() - holding:
+                                journal_path(scan_dir, node).unlink(missing_ok=True)
+
+                # Move newly discovered files into the scheduler.
+                while (scanning or reclaimed) and len(pending) < lookahead:
+                    if reclaimed:
+                        file_info = reclaimed.pop()
+                    else:
+                        try:
+                            file_info = discovered.get(timeout=0 if (futures or pending) else 0.2)
+                        except queue.Empty:
+                            break
+                        if file_info is _DISCOVERY_DONE:
+                            scanning = False
+                            break
+                        if isinstance(file_info, Exception):
+                            raise file_info
+                        if isinstance(file_info, str):
+                            yield file_info
+                            continue
+                        if leases is not None and not _claim(leases, file_info):
+                            claimed_elsewhere += 1
+                            continue
+                    found += 1
+                    f = file_info.path
+                    if file_info.alpha:
+                        alpha_dir = f.parent / "_ALPHA"
+                        alpha_dir.mkdir(exist_ok=True)
+                        try:
+                            move_file(f, alpha_dir / f.name, max_copy_bytes=max_copy_bytes)
+                            journal.record(f, FINALIZED, moved_to="_ALPHA")
+                            metrics.count("files_alpha")
+                            yield f"Moved to _ALPHA: {f.relative_to(scan_dir)}"
+                        except Exception as e:
+                            yield f"Error moving {f.name} to _ALPHA: {e}"
+                        if leases is not None:
+                            leases.release(f)
+                        continue
+                    journal.record(f, QUEUED)
+                    metrics.count("files_queued")
+                    total += 1
+                    progress.add(file_info.size, file_info.info.duration)
+                    pending.push(file_info)
+
+                # Hash the files that will be handed out next.
+                for file_info in pending.peek(max_workers):
+                    if file_info.path not in checksums:
+                        checksums[file_info.path] = hasher.submit(_prefetch_checksum, file_info.path, algorithm)
+
+                # Hand scheduled files to free workers.
+                while pending and busy < max_workers:
+                    file_info = pending.pop()
+                    # Spare workers go to splitting this file, once nothing else will need them.
+                    spare = max_workers - busy - len(pending) if not scanning or watch else 1
+                    segments = segment_count(file_info.info.duration, spare, split_seconds)
+                    if report_file is None:
+                        node_suffix = f"_{leases.node}" if leases is not None else ""
+                        report_path = os.path.join(scan_dir, f"conversion_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{node_suffix}.md")
+                        report_file = open(report_path, 'w')
+                        report_file.write(f"# Conversion Report\n\n")
+                        report_file.write(f"**Started:** {datetime.datetime.now().isoformat()}\n\n")
+                        report_file.write(f"| File | Status | Message | Input | Output | Time | Timestamp |\n|---|---|---|---|---|---|---|\n")
+                    file_progress = None
+                    if on_progress is not None:
+                        file_progress = functools.partial(on_progress, file_info.path)
+                    checksum_future = checksums.pop(file_info.path)
+                    future = executor.submit(
+                        _convert_when_hashed,
+                        checksum_future,
+                        file_info.path,
+                        duplicates=duplicates,
+                        info=file_info.info,
+                        threads=threads,
+                        on_progress=file_progress,
+                        stall_timeout=stall_timeout,
+                        timeout_factor=timeout_factor,
+                        journal=journal,
+                        max_copy_bytes=max_copy_bytes,
+                        algorithm=algorithm,
+                        verify_samples=verify_samples,
+                        segments=segments,
+                        leases=leases,
+                    )
+                    futures[future] = file_info
+                    weights[future] = segments
+                    busy += segments
+                    source_checksums[future] = checksum_future
+
+                if not futures:
+                    continue
+                done, _ = wait(futures, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_info = futures.pop(future)
+                    file_path = file_info.path
+                    busy -= weights.pop(future)
+                    checksum_future = source_checksums.pop(future)
+                    try:
+                        result = future.result()
+                    except LeaseLostError:
+                        result = None  # another node took the file over mid-conversion
+                    if result is DEFER:
+                        if duplicates.in_progress(checksum_future.result()):
+                            # Its twin is still encoding; it is requeued when that finishes.
+                            followers.setdefault(checksum_future.result(), []).append((file_info, checksum_future))
+                        else:
+                            checksums[file_path] = checksum_future
+                            pending.push(file_info)
+                        continue
+                    if on_progress is not None:
+                        on_progress(file_path, None)
+                    checksum = checksum_future.result()
+                    if duplicates is not None and checksum is not None and (result is None or result.status is not Status.DUPLICATE):
+                        if result is not None and result.status is Status.CONVERTED:
+                            duplicates.encoded(checksum, file_path)
+                        else:
+                            duplicates.abandon(checksum)
+                        for waiting, waiting_checksum in followers.pop(checksum, []):
+                            checksums[waiting.path] = waiting_checksum
+                            pending.push(waiting)
+                    if result is None:
+                        # The file is the other node's to finish; keep this node's resume away from it.
+                        journal.record(file_path, RELEASED)
+                        progress.remove(file_info.size, file_info.info.duration)
+                        total -= 1
+                        claimed_elsewhere += 1
+                        yield f"Stopped converting {_relative_name(file_path, scan_dir)}: another node took over its lease"
+                        continue
+                    progress.complete(file_info.size, file_info.info.duration)
+                    processed += 1
+                    now = datetime.datetime.now().isoformat()
+                    if result.status is Status.DUPLICATE:
+                        succeeded += 1
+                        linked += 1
+                        linked_bytes += result.bytes_in
+                        metrics.count("files_deduplicated")
+                        metrics.count("bytes_deduplicated", result.bytes_in)
+                    elif result.status is Status.CONVERTED:
+                        succeeded += 1
+                        metrics.count("files_converted")
+                        metrics.count("bytes_converted", result.bytes_in)
+                        metrics.count("bytes_output", result.bytes_out)
+                    else:
+                        failed += 1
+                        metrics.count("files_failed")
+                        error_summary.append(str(result))
+                        journal.record(file_path, FAILED, message=result.summary, error=result.error.name)
+                    if leases is not None:
+                        # Only once the journal shows the file as done, so a takeover never finds it unaccounted for.
+                        leases.release(file_path)
+                    file_name = str(file_path.relative_to(scan_dir))
+                    escaped_msg = result.summary.replace('|', '\\|')
+                    output_size = format_size(result.bytes_out) if result.bytes_out else "-"
+                    report_file.write(f"| {file_name} | {result.status.name} | {escaped_msg} | {format_size(result.bytes_in)} | "
+                                      f"{output_size} | {result.seconds:.1f}s | {now} |\n")
+                    report_file.flush()
+                    elapsed = progress.elapsed
+                    remaining = total - processed
+                    done_size = f"{format_size(progress.done_bytes)}/{format_size(progress.total_bytes)}"
+                    if scanning:
+                        yield (f"Progress: {processed}/{total}+ ({'watching' if watch else 'still scanning'}) | Succeeded: {succeeded} | Failed: {failed} | "
+                               f"Done: {done_size} | Elapsed: {elapsed:.1f}s")
+                    else:
+                        est_remaining = progress.remaining() or 0.0
+                        yield (f"Progress: {processed}/{total} | Succeeded: {succeeded} | Failed: {failed} | Remaining: {remaining} | "
+                               f"Done: {done_size} | Elapsed: {elapsed:.1f}s | Est. Remaining: {est_remaining:.1f}s")
+                    yield result
+    finally:
+        stop_event.set()
+        producer.join()
+        journal.close(discard_if_complete=True)
+        if leases is not None:
+            leases.close()
+        if report_file is not None:
+            report_file.write(f"\n**Completed:** {datetime.datetime.now().isoformat()}\n")
+            report_file.write(f"\n**Total:** {total} | **Succeeded:** {succeeded} | **Failed:** {failed}\n")
+            if error_summary:
+                report_file.write(f"\n## Error Summary\n")
+                for err in error_summary:
+                    report_file.write(f"- {err}\n")
+            report_file.close()
+
+    if linked:
+        yield f"Linked {linked} duplicate file(s) instead of encoding them ({format_size(linked_bytes)} of ProRes not re-encoded)."
+    if claimed_elsewhere:
+        yield f"Skipped {claimed_elsewhere} file(s) leased or converted by other nodes."
+    if not found:
+        yield "No new ProRes .mov files found to convert."
+    elif report_path is None:
+        yield "No new suitable ProRes files (without alpha) found to convert."
+    else:
+        yield f"Conversion report saved to: {report_path}"
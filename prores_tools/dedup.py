@@ -0,0 +1,128 @@
+"""
+Byte-identical ProRes masters, so each distinct one is encoded only once.
+
+`find_duplicates` groups files by size first, so only files whose size is
+shared are read at all. It then compares a hash of each file's first and
+last blocks, and hashes in full only the files that still collide.
+`convert --dedup` already hashes every source, so it uses `DuplicateIndex`
+to match those checksums as files are converted. The output of the first
+file of a group is then hardlinked or reflinked to the others.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from .checksum import DEFAULT_ALGORITHM, hash_file
+from .records import FileRecord
+from .transfer import reflink
+
+PARTIAL_BLOCK = 1024 * 1024
+
+# Returned by DuplicateIndex.claim while the group's first file is still being encoded.
+DEFER = object()
+
+
+def partial_hash(path: Path, block: int = PARTIAL_BLOCK) -> str:
+    """Hashes a file's size and its first and last `block` bytes."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        digest.update(size.to_bytes(8, "little"))
+        digest.update(f.read(block))
+        if size > block:
+            f.seek(max(block, size - block))
+            digest.update(f.read(block))
+    return digest.hexdigest()
+
+
+def _split(files: list[FileRecord], key) -> list[list[FileRecord]]:
+    groups = {}
+    for file_info in files:
+        try:
+            groups.setdefault(key(file_info), []).append(file_info)
+        except OSError:
+            continue
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(files: list[FileRecord], algorithm: str = DEFAULT_ALGORITHM) -> list[list[FileRecord]]:
+    """
+    Returns the groups of byte-identical files among `files`, each sorted by
+    path. Files without a twin are left out.
+    """
+    groups = []
+    for same_size in _split(files, lambda f: f.size):
+        for same_ends in _split(same_size, lambda f: partial_hash(f.path)):
+            groups.extend(_split(same_ends, lambda f: hash_file(f.path, algorithm)))
+    return [sorted(group, key=lambda f: f.path) for group in groups]
+
+
+def duplicate_totals(groups: list[list[FileRecord]]) -> tuple[int, int]:
+    """Returns (files, bytes) that are copies of another file in their group."""
+    return sum(len(g) - 1 for g in groups), sum((len(g) - 1) * g[0].size for g in groups)
+
+
+def link_or_copy(src: Path, dst: Path) -> str:
+    """
+    Replaces `dst` with a reflink of `src`, or else a hardlink, or else a copy.
+    Returns the method used.
+    """
+    tmp = dst.with_name(f".{dst.name}.dedup")
+    tmp.unlink(missing_ok=True)
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            reflinked = reflink(fsrc.fileno(), fdst.fileno())
+        if reflinked:
+            method = "reflink"
+        else:
+            tmp.unlink()
+            try:
+                os.link(src, tmp)
+                method = "hardlink"
+            except OSError:
+                shutil.copyfile(src, tmp)
+                method = "copy"
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return method
+
+
+class DuplicateIndex:
+    """
+    Tracks which source checksums have been (or are being) encoded during a
+    run. Used from worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups = {}  # checksum -> output path, or None while encoding
+
+    def claim(self, checksum: str):
+        """
+        Returns None if the caller should encode the file (it is the first of
+        its group), the output path to link if the group was already
+        encoded, or DEFER while it is still being encoded.
+        """
+        with self._lock:
+            if checksum not in self._groups:
+                self._groups[checksum] = None
+                return None
+            output = self._groups[checksum]
+            return DEFER if output is None else output
+
+    def in_progress(self, checksum: str) -> bool:
+        with self._lock:
+            return checksum in self._groups and self._groups[checksum] is None
+
+    def encoded(self, checksum: str, output: Path):
+        with self._lock:
+            self._groups[checksum] = output
+
+    def abandon(self, checksum: str):
+        """Forgets a group whose first file failed, so the next file is encoded instead."""
+        with self._lock:
+            self._groups.pop(checksum, None)
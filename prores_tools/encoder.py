@@ -0,0 +1,312 @@
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+from . import metrics, processes
+from .mov import MovParseError, read_video_info
+from .utils import require_executable
+
+DEFAULT_STALL_TIMEOUT = 120.0
+DEFAULT_TIMEOUT_FACTOR = 10.0
+MIN_TIMEOUT = 300.0
+STDERR_TAIL_LINES = 200
+
+# Output settings of every conversion; `plan` samples with the same ones.
+H264_VIDEO_OPTIONS = ["-c:v", "libx264", "-crf", "23", "-preset", "medium", "-pix_fmt", "yuv420p"]
+H264_OUTPUT_OPTIONS = [
+    *H264_VIDEO_OPTIONS, "-c:a", "copy",
+    "-movflags", "+faststart",
+]
+
+# Sources at least this long may be encoded as segments in parallel (see encode_segmented).
+DEFAULT_SPLIT_SECONDS = 600.0
+MIN_SEGMENT_SECONDS = 60.0
+
+
+class EncodeTimeout(subprocess.TimeoutExpired):
+    """An ffmpeg run that stalled or ran longer than its duration-based budget."""
+
+    def __init__(self, cmd, timeout: float, reason: str):
+        super().__init__(cmd, timeout)
+        self.reason = reason
+
+
+def _parse_out_time(fields: dict) -> float | None:
+    for key in ("out_time_us", "out_time_ms"):  # out_time_ms is also in microseconds
+        value = fields.get(key)
+        if value and value != "N/A":
+            try:
+                return max(0, int(value)) / 1_000_000
+            except ValueError:
+                pass
+    return None
+
+
+def _progress_snapshot(fields: dict, duration: float | None) -> dict:
+    out_time = _parse_out_time(fields)
+    speed = fields.get("speed", "").rstrip("x").strip()
+    try:
+        fps = float(fields.get("fps", 0))
+    except ValueError:
+        fps = 0.0
+    try:
+        speed = float(speed)
+    except ValueError:
+        speed = None
+    fraction = None
+    if duration and out_time is not None:
+        fraction = min(1.0, out_time / duration)
+    return {
+        "frame": int(fields.get("frame", 0) or 0),
+        "fps": fps,
+        "speed": speed,
+        "out_time": out_time,
+        "fraction": fraction,
+        "done": fields.get("progress") == "end",
+    }
+
+
+@processes.limited(processes.ENCODE)
+@metrics.timed("encode")
+def run_ffmpeg(
+    command: list[str],
+    duration: float | None = None,
+    on_progress=None,
+    stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+    timeout_factor: float = DEFAULT_TIMEOUT_FACTOR,
+    output: Path | None = None,
+):
+    """
+    Runs an ffmpeg command with `-progress pipe:1` and reports progress as it goes.
+
+    `on_progress` (if given) is called with a dict of frame, fps, speed,
+    out_time (seconds) and fraction (0–1, when `duration` is known) for every
+    progress block ffmpeg emits. The run is killed and EncodeTimeout raised if
+    out_time stops advancing for `stall_timeout` seconds, or if it takes longer
+    than `timeout_factor` × `duration` (never less than MIN_TIMEOUT). Growth of
+    the `output` file also counts as progress, and stall detection ends once
+    ffmpeg reports the last frame: rewriting the index for +faststart, or most
+    of a `-c copy` concat, advances no out_time. Only the
+    last STDERR_TAIL_LINES lines of stderr are kept; they are attached to the
+    CalledProcessError raised on a non-zero exit.
+    """
+    command = [command[0], "-nostats", "-progress", "pipe:1", *command[1:]]
+    overall_timeout = None
+    if duration and timeout_factor:
+        overall_timeout = max(MIN_TIMEOUT, duration * timeout_factor)
+
+    metrics.count("subprocesses")
+    proc = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        bufsize=1,
+    )
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    start = time.monotonic()
+    last_advance = start
+    last_out_time = -1.0
+    last_size = -1
+    finishing = False  # past the last frame; only the overall timeout applies
+    killed_reason = None
+    lock = threading.Lock()
+    finished = threading.Event()
+
+    def _drain_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line.rstrip("\n"))
+
+    def _watchdog():
+        nonlocal killed_reason, last_advance, last_size
+        while not finished.wait(1.0):
+            now = time.monotonic()
+            if output is not None:
+                try:
+                    size = output.stat().st_size
+                except OSError:
+                    size = last_size
+                if size > last_size:
+                    last_size = size
+                    with lock:
+                        last_advance = now
+            with lock:
+                idle = now - last_advance
+                stalled = not finishing and idle > stall_timeout
+            if stall_timeout and stalled:
+                killed_reason = f"stalled (no progress for {stall_timeout:.0f}s)"
+            elif overall_timeout and now - start > overall_timeout:
+                killed_reason = f"exceeded {overall_timeout:.0f}s ({timeout_factor:g}x source duration)"
+            else:
+                continue
+            proc.kill()
+            return
+
+    stderr_thread = threading.Thread(target=_drain_stderr, daemon=True)
+    watchdog_thread = threading.Thread(target=_watchdog, daemon=True)
+    stderr_thread.start()
+    watchdog_thread.start()
+
+    fields = {}
+    try:
+        for line in proc.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            fields[key] = value
+            if key != "progress":
+                continue
+            snapshot = _progress_snapshot(fields, duration)
+            out_time = snapshot["out_time"]
+            if out_time is not None and out_time > last_out_time:
+                with lock:
+                    last_advance = time.monotonic()
+                last_out_time = out_time
+            if snapshot["done"] or (snapshot["fraction"] is not None and snapshot["fraction"] >= 1.0):
+                with lock:
+                    finishing = True
+            if on_progress is not None:
+                on_progress(snapshot)
+            fields = {}
+        proc.wait()
+    finally:
+        finished.set()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stderr_thread.join()
+        watchdog_thread.join()
+
+    if killed_reason is not None:
+        raise EncodeTimeout(command, overall_timeout or stall_timeout, killed_reason)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command, stderr="\n".join(stderr_tail))
+
+
+def segment_count(duration: float | None, max_segments: int, split_seconds: float = DEFAULT_SPLIT_SECONDS) -> int:
+    """How many segments to encode a source of `duration` seconds in; 1 means in one piece."""
+    if not split_seconds or not duration or duration < split_seconds:
+        return 1
+    return max(1, min(max_segments, int(duration // MIN_SEGMENT_SECONDS)))
+
+
+def segment_ranges(nb_frames: int, segments: int) -> list[tuple[int, int]]:
+    """Splits `nb_frames` frames into `segments` contiguous (first frame, frame count) ranges."""
+    bounds = [nb_frames * i // segments for i in range(segments + 1)]
+    return [(start, end - start) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def segment_dir(work_dir: Path, output: Path) -> Path:
+    """The scratch folder encode_segmented uses for `output`'s segments."""
+    return work_dir / f".{output.stem}.segments"
+
+
+def discard_segments(work_dir: Path, output: Path):
+    """Removes segments left behind by a segmented encode that was killed."""
+    shutil.rmtree(segment_dir(work_dir, output), ignore_errors=True)
+
+
+def _concat_line(path: Path) -> str:
+    # The concat demuxer's quoting: close the quote, escape the quote, reopen.
+    return "file '" + str(path).replace("'", "'\\''") + "'\n"
+
+
+def encode_segmented(
+    source: Path,
+    output: Path,
+    segments: int,
+    work_dir: Path,
+    threads: int | None = None,
+    on_progress=None,
+    stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+    timeout_factor: float = DEFAULT_TIMEOUT_FACTOR,
+) -> bool:
+    """
+    Encodes `source` as `segments` frame ranges in parallel (each within the
+    encode budget) and joins them into `output` with the concat demuxer,
+    without re-encoding, copying the source's first audio stream whole.
+
+    ProRes is all-intra, so every range can start exactly on its first frame:
+    each segment seeks to half a frame before it and stops after its frame
+    count, and no frame is dropped or duplicated at a boundary. Returns False
+    without encoding anything if the source's frame rate is unknown (the
+    caller then encodes it in one piece). Raises like run_ffmpeg.
+    """
+    try:
+        info = read_video_info(source)
+    except (MovParseError, OSError):
+        return False
+    frame_rate, nb_frames = info.get("frame_rate"), info.get("nb_frames")
+    if not frame_rate or not nb_frames or not info["duration"]:
+        return False
+
+    ffmpeg = require_executable("ffmpeg")
+    # Segments from a run that was killed mid-encode would be concatenated otherwise.
+    discard_segments(work_dir, output)
+    segments_path = segment_dir(work_dir, output)
+    segments_path.mkdir()
+    ranges = segment_ranges(nb_frames, segments)
+    out_times = [0.0] * len(ranges)
+    frames = [0] * len(ranges)
+    lock = threading.Lock()
+
+    def _segment_progress(index, snapshot):
+        with lock:
+            out_times[index] = snapshot["out_time"] or out_times[index]
+            frames[index] = snapshot["frame"]
+            combined = {
+                "frame": sum(frames),
+                "fps": snapshot["fps"] * len(ranges),
+                "speed": snapshot["speed"] * len(ranges) if snapshot["speed"] else None,
+                "out_time": sum(out_times),
+                "fraction": min(1.0, sum(out_times) / info["duration"]),
+                "done": False,
+            }
+        on_progress(combined)
+
+    def _encode(index, first, count):
+        command = [
+            ffmpeg, "-ss", f"{max(0.0, (first - 0.5) / frame_rate):.6f}", "-i", str(source),
+            "-map", "0:v:0", "-frames:v", str(count), "-vf", "setpts=PTS-STARTPTS",
+            *H264_VIDEO_OPTIONS, "-an", "-y", str(segments_path / f"{index:04d}.mov"),
+        ]
+        if threads:
+            command[-2:-2] = ["-threads", str(threads)]
+        run_ffmpeg(
+            command,
+            duration=count / frame_rate,
+            on_progress=None if on_progress is None else lambda snapshot: _segment_progress(index, snapshot),
+            stall_timeout=stall_timeout,
+            timeout_factor=timeout_factor,
+            output=segments_path / f"{index:04d}.mov",
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="prores-segment") as executor:
+            futures = [executor.submit(_encode, i, first, count) for i, (first, count) in enumerate(ranges)]
+            wait(futures)
+        for future in futures:
+            future.result()
+
+        concat_list = segments_path / "segments.txt"
+        concat_list.write_text("".join(_concat_line(segments_path / f"{i:04d}.mov") for i in range(len(ranges))), encoding="utf-8")
+        run_ffmpeg(
+            [
+                ffmpeg, "-f", "concat", "-safe", "0", "-i", str(concat_list), "-i", str(source),
+                "-map", "0:v:0", "-map", "1:a:0?", "-map_metadata", "1",
+                "-c", "copy", "-movflags", "+faststart", "-y", str(output),
+            ],
+            duration=info["duration"],
+            stall_timeout=stall_timeout,
+            timeout_factor=timeout_factor,
+            output=output,
+        )
+    finally:
+        shutil.rmtree(segments_path, ignore_errors=True)
+    return True
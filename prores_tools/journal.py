@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+
+JOURNAL_NAME = ".prores_tools_journal.jsonl"
+
+# States a file passes through during conversion, in order.
+QUEUED = "queued"
+HASHED = "hashed"
+MOVED = "moved"
+ENCODING = "encoding"
+VALIDATED = "validated"
+FINALIZED = "finalized"
+FAILED = "failed"
+RELEASED = "released"  # left to another node that took over the file's lease
+TERMINAL_STATES = {FINALIZED, FAILED, RELEASED}
+
+
+def journal_path(scan_dir: Path, node: str | None = None) -> Path:
+    """The journal of `scan_dir`, or of one node of a `--shared` conversion."""
+    if node is None:
+        return Path(scan_dir) / JOURNAL_NAME
+    return Path(scan_dir) / JOURNAL_NAME.replace(".jsonl", f".{node}.jsonl")
+
+
+class ConversionJournal:
+    """
+    Write-ahead log of conversion state transitions for one scan root.
+
+    Every transition is appended as one JSON line and fsynced before the
+    corresponding file operation proceeds, so after a crash the journal tells
+    exactly where each file was left. Safe to use from several worker threads.
+
+    QUEUED lines are only flushed: nothing has been touched yet, and the next
+    fsynced line makes them durable too. This keeps queueing a large share
+    from costing one fsync per file before the first encode starts.
+    """
+
+    def __init__(self, scan_dir: Path, node: str | None = None):
+        self.node = node
+        self.path = journal_path(scan_dir, node)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, original_path: Path, state: str, **details):
+        """Records that `original_path` has reached `state`, durably unless it was only queued."""
+        entry = {"path": str(original_path), "state": state, "time": datetime.now().isoformat(), **details}
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if state != QUEUED:
+                os.fsync(self._file.fileno())
+
+    def close(self, discard_if_complete: bool = False):
+        """Closes the journal, deleting it if requested and no file is left unfinished."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+        if discard_if_complete and not pending_entries(self.path.parent, self.node):
+            self.path.unlink(missing_ok=True)
+
+
+def read_journal(scan_dir: Path, node: str | None = None) -> dict[str, dict]:
+    """Replays the journal and returns the latest entry for each file."""
+    latest = {}
+    path = journal_path(scan_dir, node)
+    if not path.exists():
+        return latest
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-write; everything before it is intact.
+                continue
+            latest[entry["path"]] = entry
+    return latest
+
+
+def find_entry(entries: dict[str, dict], rel: str) -> dict | None:
+    """
+    The entry of another node's journal for the file at `rel` (a POSIX path
+    relative to the scan root). Journals record paths as their node saw them,
+    so entries are matched on their trailing components.
+    """
+    tail = PurePosixPath(rel).parts
+    for path, entry in entries.items():
+        if PurePosixPath(Path(path).as_posix()).parts[-len(tail):] == tail:
+            return entry
+    return None
+
+
+def pending_entries(scan_dir: Path, node: str | None = None) -> list[dict]:
+    """Returns the latest entry of every file whose conversion never reached a terminal state."""
+    return [entry for entry in read_journal(scan_dir, node).values() if entry["state"] not in TERMINAL_STATES]
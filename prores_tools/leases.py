@@ -0,0 +1,218 @@
+"""
+Lease files that let several `convert --shared` processes, on one machine or
+on many nodes mounting the same share, drain one tree without converting a
+file twice.
+
+A lease is a small JSON file in `.prores_tools_leases/` under the scan root,
+named after the file it covers and created with O_CREAT|O_EXCL, which is
+atomic on local filesystems and on NFSv3 and later. The holder touches its
+leases every `heartbeat` seconds. A lease not touched for `ttl` seconds
+belongs to a dead process and is taken over by the next node that looks: it
+is renamed away first, so only one node can win it. Node clocks must agree to
+well within `ttl`. Leases name their file relative to the scan root, since
+each node may mount the share at a different path.
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+
+LEASE_DIR = ".prores_tools_leases"
+DEFAULT_TTL = 120.0
+DEFAULT_HEARTBEAT = 15.0
+
+
+class LeaseLostError(Exception):
+    """Raised when another node took over the lease on a file this process is working on."""
+
+
+def node_id() -> str:
+    """Identifies this process among all nodes sharing a tree."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _read_lease(lease: Path) -> dict | None:
+    try:
+        return json.loads(lease.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class LeaseManager:
+    """Claims, heartbeats, releases and takes over leases for one process."""
+
+    def __init__(self, scan_dir: Path, ttl: float = DEFAULT_TTL, heartbeat: float = DEFAULT_HEARTBEAT, node: str | None = None):
+        self.scan_dir = Path(scan_dir)
+        self.dir = self.scan_dir / LEASE_DIR
+        self.dir.mkdir(exist_ok=True)
+        self.ttl = ttl
+        self.heartbeat = min(heartbeat, ttl / 4)
+        self.node = node or node_id()
+        self._held = {}  # lease path -> (file path, token)
+        self._lost = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _relative(self, path: Path) -> str | None:
+        """`path` relative to the scan root as a POSIX path, or None if it is outside it."""
+        # Resolve symlinks only if needed, e.g. for a path relative to a symlinked working directory.
+        for base, target in ((self.scan_dir, path), (self.scan_dir.resolve(), Path(path).resolve())):
+            rel = Path(os.path.relpath(target, base)).as_posix()
+            if rel != ".." and not rel.startswith("../"):
+                return rel
+        return None
+
+    def _local_path(self, recorded: str | None) -> Path | None:
+        """The file a lease names, under this node's scan root; None if it is not under it."""
+        if not recorded or PurePosixPath(recorded).is_absolute():
+            return None
+        path = self.scan_dir / PurePosixPath(recorded)
+        return path if self._relative(path) is not None else None
+
+    def _lease_path(self, path: Path) -> Path:
+        rel = self._relative(path)
+        if rel is None:
+            raise ValueError(f"{path} is not under {self.scan_dir}")
+        return self.dir / (hashlib.sha1(rel.encode("utf-8")).hexdigest() + ".lease")
+
+    def _owns(self, lease: Path, token: str) -> bool:
+        data = _read_lease(lease)
+        return data is not None and data.get("token") == token
+
+    def claim(self, path: Path) -> bool:
+        """Leases `path` to this process; False if another live process holds it."""
+        lease = self._lease_path(path)
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(lease, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"path": self._relative(path), "node": self.node, "token": token, "acquired": datetime.now().isoformat()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            self._held[lease] = (Path(path), token)
+        return True
+
+    def holds(self, path: Path, check: bool = False) -> bool:
+        """
+        True while this process holds the lease on `path`. The heartbeat notices
+        a takeover within `heartbeat` seconds; with `check`, the lease file is
+        read now instead.
+        """
+        lease = self._lease_path(path)
+        with self._lock:
+            entry = self._held.get(lease)
+        if entry is None:
+            return False
+        if check and not self._owns(lease, entry[1]):
+            with self._lock:
+                if self._held.pop(lease, None) is not None:
+                    self._lost.append(entry[0])
+            return False
+        return True
+
+    def release(self, path: Path):
+        """Drops the lease on `path`, if this process still holds it."""
+        lease = self._lease_path(path)
+        with self._lock:
+            entry = self._held.pop(lease, None)
+        if entry is not None and self._owns(lease, entry[1]):
+            lease.unlink(missing_ok=True)
+
+    def _beat(self):
+        with self._lock:
+            held = list(self._held.items())
+        for lease, (path, token) in held:
+            if not self._owns(lease, token):
+                with self._lock:
+                    if self._held.pop(lease, None) is not None:
+                        self._lost.append(path)
+                continue
+            try:
+                os.utime(lease)
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat):
+            self._beat()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prores-leases", daemon=True)
+        self._thread.start()
+
+    def take_lost(self) -> list[Path]:
+        """Returns (and forgets) the files whose leases another node took over."""
+        with self._lock:
+            lost, self._lost = self._lost, []
+        return lost
+
+    def take_over_expired(self) -> list[tuple[Path, str | None]]:
+        """
+        Takes over every lease whose holder stopped heartbeating and returns
+        (file, node that held it) for each, now leased to this process.
+        """
+        taken = []
+        now = time.time()
+        with os.scandir(self.dir) as entries:
+            expired = []
+            for entry in entries:
+                try:
+                    if entry.name.endswith(".lease") and now - entry.stat().st_mtime > self.ttl:
+                        expired.append(Path(entry.path))
+                except OSError:
+                    continue
+        for lease in expired:
+            stale = lease.with_name(f"{lease.name}.{uuid.uuid4().hex}.stale")
+            try:
+                os.rename(lease, stale)
+            except OSError:
+                continue  # Another node took it over first.
+            data = _read_lease(stale)
+            try:
+                revived = time.time() - stale.stat().st_mtime <= self.ttl
+            except OSError:
+                revived = False
+            if revived:
+                # The holder heartbeated between our check and the rename; give it back.
+                try:
+                    os.link(stale, lease)
+                except OSError:
+                    pass
+                stale.unlink(missing_ok=True)
+                continue
+            stale.unlink(missing_ok=True)
+            # A lease without readable content was torn before its holder did anything.
+            path = self._local_path(data.get("path")) if data is not None else None
+            if path is not None and self.claim(path):
+                taken.append((path, data.get("node")))
+        return taken
+
+    def nodes_holding_leases(self) -> set[str]:
+        """The nodes named in the lease files currently in the lease folder."""
+        nodes = set()
+        with os.scandir(self.dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".lease"):
+                    data = _read_lease(Path(entry.path))
+                    if data is not None and data.get("node"):
+                        nodes.add(data["node"])
+        return nodes
+
+    def close(self):
+        """Stops heartbeating and releases every lease still held."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            held = [path for path, _ in self._held.values()]
+        for path in held:
+            self.release(path)
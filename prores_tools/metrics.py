@@ -0,0 +1,186 @@
+"""
+Per-stage timers and counters for convert, report and cleanup runs.
+
+Instrumented code wraps each stage in `with metrics.stage("validate"):` or
+decorates it with `@metrics.timed("probe")`, and bumps counters with
+`metrics.count("bytes_hashed", n)`. Until `enable()` is called, `stage()`
+returns a shared no-op context manager and `timed` and `count()` return after
+a single check, so instrumentation costs next to nothing.
+
+Stage times are summed over all threads, so with several workers a stage can
+add up to more than the run's wall time. At the end of a run the totals are
+appended to a JSON-lines file and/or written as a node_exporter textfile.
+"""
+import functools
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+METRIC_PREFIX = "prores_tools_last_run"
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    """Thread-safe accumulator of stage times and counters for one run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._stages = {}  # name -> [calls, seconds, max seconds]
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            totals = self._stages.get(name)
+            if totals is None:
+                self._stages[name] = [1, seconds, seconds]
+            else:
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] = max(totals[2], seconds)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "wall_seconds": round(time.perf_counter() - self._start, 6),
+                "stages": {
+                    name: {"calls": calls, "seconds": round(seconds, 6), "max_seconds": round(longest, 6)}
+                    for name, (calls, seconds, longest) in sorted(self._stages.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+
+class _Stage:
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics: Metrics, name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+
+_active = None
+
+
+def enable() -> Metrics:
+    """Starts collecting metrics for a new run."""
+    global _active
+    _active = Metrics()
+    return _active
+
+
+def disable() -> Metrics | None:
+    """Stops collecting and returns what was collected, if anything."""
+    global _active
+    collected, _active = _active, None
+    return collected
+
+
+def stage(name: str):
+    """Context manager timing one pass through a stage."""
+    if _active is None:
+        return _NULL_STAGE
+    return _Stage(_active, name)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as a pass through stage `name`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+            with _Stage(_active, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name: str, n: int = 1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+def write_jsonl(path: Path, record: dict):
+    """Appends `record` as one line, so successive runs build up a history."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def format_textfile(record: dict) -> str:
+    """Renders a run record as gauges in the Prometheus/OpenMetrics text format."""
+    labels = f'command="{record["command"]}"'
+    lines = [
+        f"# HELP {METRIC_PREFIX}_timestamp_seconds When the last run started.",
+        f"# TYPE {METRIC_PREFIX}_timestamp_seconds gauge",
+        f"{METRIC_PREFIX}_timestamp_seconds{{{labels}}} {datetime.fromisoformat(record['started']).timestamp():.0f}",
+        f"# HELP {METRIC_PREFIX}_wall_seconds Wall-clock duration of the last run.",
+        f"# TYPE {METRIC_PREFIX}_wall_seconds gauge",
+        f"{METRIC_PREFIX}_wall_seconds{{{labels}}} {record['wall_seconds']}",
+        f"# HELP {METRIC_PREFIX}_stage_seconds Time spent in each stage during the last run, summed over threads.",
+        f"# TYPE {METRIC_PREFIX}_stage_seconds gauge",
+    ]
+    lines += [f'{METRIC_PREFIX}_stage_seconds{{{labels},stage="{name}"}} {values["seconds"]}' for name, values in record["stages"].items()]
+    lines += [
+        f"# HELP {METRIC_PREFIX}_stage_calls Passes through each stage during the last run.",
+        f"# TYPE {METRIC_PREFIX}_stage_calls gauge",
+    ]
+    lines += [f'{METRIC_PREFIX}_stage_calls{{{labels},stage="{name}"}} {values["calls"]}' for name, values in record["stages"].items()]
+    for name, value in record["counters"].items():
+        metric = f"{METRIC_PREFIX}_{_metric_name(name)}"
+        lines += [f"# TYPE {metric} gauge", f"{metric}{{{labels}}} {value}"]
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path, record: dict):
+    """
+    Writes the textfile atomically, as node_exporter's textfile collector
+    may read it at any moment.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(format_textfile(record), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def export(collected: Metrics, command: str, paths: list[Path]):
+    """Writes the run's metrics to each path: `.prom` files as a textfile, anything else as JSON lines."""
+    record = {"command": command, **collected.snapshot()}
+    for path in paths:
+        if Path(path).suffix == ".prom":
+            write_textfile(path, record)
+        else:
+            write_jsonl(path, record)
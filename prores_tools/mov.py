@@ -0,0 +1,242 @@
+"""
+Minimal QuickTime/ISO-BMFF box reader.
+
+Reads just enough of a .mov/.mp4 file to answer what discovery needs — codec
+FourCC, ProRes flavour, alpha, dimensions, duration, frame count and number of
+audio tracks — without spawning ffprobe. Only the top-level box headers, the `moov` box and the first bytes of
+the first video sample are read, which is a few KB for typical files.
+"""
+import struct
+from pathlib import Path
+
+PRORES_PROFILES = {
+    "apco": "Proxy",
+    "apcs": "LT",
+    "apcn": "422",
+    "apch": "HQ",
+    "ap4h": "4444",
+    "ap4x": "4444 XQ",
+}
+
+CODEC_NAMES = {
+    "avc1": "h264",
+    "avc3": "h264",
+    "hvc1": "hevc",
+    "hev1": "hevc",
+    "mp4v": "mpeg4",
+    "jpeg": "mjpeg",
+    "mjpa": "mjpeg",
+    "av01": "av1",
+    "vp09": "vp9",
+}
+
+# Refuse to pull absurdly large sample tables into memory; ffprobe handles those.
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+_HEADER = struct.Struct(">I4s")
+
+
+class MovParseError(ValueError):
+    """Raised when a file is not a QuickTime/MP4 file this reader understands."""
+
+
+def _iter_boxes(buf, start: int, end: int):
+    """Yields (type, payload_start, payload_end) for the boxes in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = _HEADER.unpack_from(buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise MovParseError("truncated box header")
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise MovParseError(f"invalid size for box {box_type!r}")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _child(buf, start: int, end: int, box_type: bytes):
+    for child_type, child_start, child_end in _iter_boxes(buf, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+
+def _find_moov(f) -> bytes:
+    """Walks the top-level boxes by seeking and returns the payload of `moov`."""
+    f.seek(0, 2)
+    file_size = f.tell()
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, box_type = _HEADER.unpack_from(header, 0)
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                break
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            raise MovParseError("invalid top-level box size")
+        if box_type == b"moov":
+            if size > MAX_MOOV_SIZE:
+                raise MovParseError("moov box too large")
+            f.seek(pos + header_size)
+            payload = f.read(size - header_size)
+            if len(payload) != size - header_size:
+                raise MovParseError("truncated moov box")
+            return payload
+        pos += size
+    raise MovParseError("no moov box found")
+
+
+def _full_box_version(buf, start: int) -> int:
+    return buf[start]
+
+
+def _parse_mvhd(buf, start: int, end: int):
+    """(timescale, duration) of an mvhd box, or of an mdhd box, which starts the same way."""
+    if _full_box_version(buf, start) == 1:
+        timescale, duration = struct.unpack_from(">IQ", buf, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", buf, start + 12)
+    return timescale, duration
+
+
+def _parse_hdlr(buf, start: int) -> bytes:
+    return bytes(buf[start + 8:start + 12])
+
+
+def _parse_stsd(buf, start: int, end: int) -> dict:
+    entry_count = struct.unpack_from(">I", buf, start + 4)[0]
+    if entry_count < 1 or start + 8 + 86 > end:
+        raise MovParseError("empty or truncated stsd box")
+    entry = start + 8
+    codec_tag = bytes(buf[entry + 4:entry + 8]).decode("latin-1")
+    width, height = struct.unpack_from(">HH", buf, entry + 32)
+    depth = struct.unpack_from(">H", buf, entry + 82)[0]
+    return {"codec_tag": codec_tag, "width": width, "height": height, "depth": depth}
+
+
+def _first_chunk_offset(buf, stbl_start: int, stbl_end: int) -> int | None:
+    stco = _child(buf, stbl_start, stbl_end, b"stco")
+    if stco and struct.unpack_from(">I", buf, stco[0] + 4)[0] > 0:
+        return struct.unpack_from(">I", buf, stco[0] + 8)[0]
+    co64 = _child(buf, stbl_start, stbl_end, b"co64")
+    if co64 and struct.unpack_from(">I", buf, co64[0] + 4)[0] > 0:
+        return struct.unpack_from(">Q", buf, co64[0] + 8)[0]
+    return None
+
+
+def _prores_frame_has_alpha(f, offset: int) -> bool | None:
+    """
+    Reads the ProRes frame header at `offset` and returns whether its alpha_info
+    field is set, or None if the bytes there are not a ProRes frame.
+    """
+    f.seek(offset)
+    header = f.read(26)
+    if len(header) < 26 or header[4:8] != b"icpf":
+        return None
+    return (header[8 + 17] & 0x0F) != 0
+
+
+def _prores_pix_fmt(codec_tag: str, has_alpha: bool) -> str:
+    # The pixel formats ffmpeg's ProRes decoder reports for each flavour.
+    if codec_tag in ("ap4h", "ap4x"):
+        return "yuva444p12le" if has_alpha else "yuv444p12le"
+    return "yuv422p10le"
+
+
+def _sample_count(buf, stbl_start: int, stbl_end: int) -> int | None:
+    stsz = _child(buf, stbl_start, stbl_end, b"stsz")
+    if not stsz:
+        return None
+    return struct.unpack_from(">I", buf, stsz[0] + 8)[0]
+
+
+def read_video_info(video_path) -> dict:
+    """
+    Parses a QuickTime/MP4 file and describes its first video track.
+
+    Returns a dict with `codec_name`, `codec_tag`, `profile`, `pix_fmt`,
+    `has_alpha`, `width`, `height`, `depth`, `duration` (seconds), `nb_frames`,
+    `frame_rate` (average, from the video track's own duration) and
+    `audio_streams`. `pix_fmt` and `has_alpha` are only known for ProRes and
+    are None otherwise. Raises MovParseError (or OSError) if the file cannot be
+    parsed.
+    """
+    with open(Path(video_path), "rb") as f:
+        moov = memoryview(_find_moov(f))
+
+        duration = None
+        mvhd = _child(moov, 0, len(moov), b"mvhd")
+        if mvhd:
+            timescale, units = _parse_mvhd(moov, *mvhd)
+            if timescale:
+                duration = units / timescale
+
+        info = None
+        audio_streams = 0
+        for box_type, trak_start, trak_end in _iter_boxes(moov, 0, len(moov)):
+            if box_type != b"trak":
+                continue
+            mdia = _child(moov, trak_start, trak_end, b"mdia")
+            hdlr = mdia and _child(moov, *mdia, b"hdlr")
+            if not hdlr:
+                continue
+            handler = _parse_hdlr(moov, hdlr[0])
+            if handler == b"soun":
+                audio_streams += 1
+            if handler != b"vide" or info is not None:
+                continue
+            minf = _child(moov, *mdia, b"minf")
+            stbl = minf and _child(moov, *minf, b"stbl")
+            stsd = stbl and _child(moov, *stbl, b"stsd")
+            if not stsd:
+                raise MovParseError("video track without sample description")
+
+            info = _parse_stsd(moov, *stsd)
+            codec_tag = info["codec_tag"]
+            info["duration"] = duration
+            info["nb_frames"] = _sample_count(moov, *stbl)
+            info["frame_rate"] = None
+            mdhd = _child(moov, *mdia, b"mdhd")
+            if mdhd and info["nb_frames"]:
+                timescale, units = _parse_mvhd(moov, *mdhd)
+                if timescale and units:
+                    info["frame_rate"] = info["nb_frames"] * timescale / units
+            if codec_tag in PRORES_PROFILES:
+                has_alpha = None
+                offset = _first_chunk_offset(moov, *stbl)
+                if offset is not None:
+                    has_alpha = _prores_frame_has_alpha(f, offset)
+                if has_alpha is None:
+                    # No readable frame; fall back to the sample description depth.
+                    has_alpha = codec_tag in ("ap4h", "ap4x") and info["depth"] == 32
+                info.update(
+                    codec_name="prores",
+                    profile=PRORES_PROFILES[codec_tag],
+                    has_alpha=has_alpha,
+                    pix_fmt=_prores_pix_fmt(codec_tag, has_alpha),
+                )
+            else:
+                info.update(
+                    codec_name=CODEC_NAMES.get(codec_tag, codec_tag.strip()),
+                    profile=None,
+                    has_alpha=None,
+                    pix_fmt=None,
+                )
+
+    if info is None:
+        raise MovParseError("no video track found")
+    info["audio_streams"] = audio_streams
+    return info
@@ -0,0 +1,164 @@
+"""
+Projects how much space `convert` would free and how long it would take,
+without converting anything.
+
+Files are grouped into classes of the same codec, profile and resolution.
+A few short segments of up to `files_per_class` files per class are encoded
+with the conversion's own libx264 settings, and the resulting output bytes and
+encode seconds per source byte are applied to every file in the class. ProRes
+is close to constant bitrate within a profile and resolution, so per-byte
+ratios carry over well between files of a class.
+"""
+import heapq
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from . import processes
+from .encoder import H264_OUTPUT_OPTIONS
+from .scheduler import plan_workers
+from .utils import format_size, iter_prores_files, require_executable, segment_offsets
+
+DEFAULT_SAMPLES = 3
+DEFAULT_SEGMENT_SECONDS = 4.0
+DEFAULT_FILES_PER_CLASS = 2
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _file_class(info) -> tuple:
+    return (info.profile or info.codec_name, info.width, info.height)
+
+
+def _class_label(key: tuple) -> str:
+    profile, width, height = key
+    return f"{profile} {width}x{height}" if width and height else str(profile)
+
+
+def sample_encode(path: Path, offset: float, length: float, threads: int, work_dir: Path) -> tuple[int, float]:
+    """Encodes one segment with the conversion settings; returns (output bytes, wall seconds)."""
+    output = work_dir / "sample.mov"
+    command = [
+        require_executable("ffmpeg"), "-v", "error",
+        "-ss", f"{offset:.3f}", "-t", f"{length:.3f}", "-i", str(path),
+        *H264_OUTPUT_OPTIONS, "-threads", str(threads), "-y", str(output),
+    ]
+    start = time.monotonic()
+    try:
+        processes.run(processes.ENCODE, command, capture_output=True, text=True, check=True, timeout=max(300.0, length * 60))
+        return output.stat().st_size, time.monotonic() - start
+    finally:
+        output.unlink(missing_ok=True)
+
+
+def _sample_class(files: list, samples: int, segment_seconds: float, threads: int, work_dir: Path):
+    """
+    Samples the longest files of a class. Returns (output bytes per source
+    byte, encode seconds per source byte), or None if no segment could be encoded.
+    """
+    source_bytes = 0.0
+    output_bytes = 0
+    encode_seconds = 0.0
+    for file_info in files:
+        info = file_info.info
+        if not info.duration:
+            continue
+        for offset in segment_offsets(info.duration, samples, segment_seconds):
+            length = min(segment_seconds, info.duration - offset)
+            try:
+                size, seconds = sample_encode(file_info.path, offset, length, threads, work_dir)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+                continue
+            source_bytes += file_info.size * length / info.duration
+            output_bytes += size
+            encode_seconds += seconds
+    if not source_bytes:
+        return None
+    return output_bytes / source_bytes, encode_seconds / source_bytes
+
+
+def wall_time(encode_times: list[float], workers: int) -> float:
+    """Makespan of running the encodes largest first on `workers` parallel workers."""
+    loads = [0.0] * max(1, workers)
+    for seconds in sorted(encode_times, reverse=True):
+        heapq.heapreplace(loads, loads[0] + seconds)
+    return max(loads)
+
+
+def plan_conversion(
+    scan_dir: Path,
+    max_workers: int = 0,
+    threads: int = 0,
+    cache=None,
+    scan_threads: int = 1,
+    samples: int = DEFAULT_SAMPLES,
+    segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+    files_per_class: int = DEFAULT_FILES_PER_CLASS,
+):
+    """
+    Finds the files `convert` would process, samples each file class and yields
+    progress lines followed by per-folder and total projections of H.264 size,
+    space saved (once originals are cleaned up) and encode time for
+    `max_workers` workers with `threads` ffmpeg threads each.
+
+    Samples are encoded one at a time with `threads` threads, so their speed
+    matches one worker's share of the CPU during a real run.
+    """
+    require_executable("ffmpeg")
+    max_workers, threads = plan_workers(max_workers, threads)
+    folders_to_skip = ['_PROCESSING', '_SOURCE', '_ALPHA']
+
+    classes = {}
+    alpha_files = []
+    for file_info in iter_prores_files(scan_dir, folders_to_ignore=folders_to_skip, cache=cache, scan_threads=scan_threads):
+        if file_info.alpha:
+            alpha_files.append(file_info)
+        else:
+            classes.setdefault(_file_class(file_info.info), []).append(file_info)
+    total_files = sum(len(files) for files in classes.values())
+    yield f"Found {total_files} ProRes file(s) to convert in {len(classes)} class(es), {len(alpha_files)} with alpha."
+    if not classes:
+        return
+
+    folders = {}
+    unestimated = []
+    encode_times = []
+    with tempfile.TemporaryDirectory(prefix="prores-plan-") as tmp:
+        for i, (key, files) in enumerate(sorted(classes.items(), key=lambda item: -len(item[1])), 1):
+            representatives = sorted(files, key=lambda f: -(f.info.duration or 0))[:files_per_class]
+            yield f"Sampling class {i}/{len(classes)}: {_class_label(key)} ({len(files)} file(s), {len(representatives)} sampled)"
+            ratios = _sample_class(representatives, samples, segment_seconds, threads, Path(tmp))
+            if ratios is None:
+                unestimated.extend(files)
+                continue
+            bytes_ratio, seconds_per_byte = ratios
+            for file_info in files:
+                folder = folders.setdefault(file_info.path.parent, {"files": 0, "source": 0, "output": 0.0, "seconds": 0.0})
+                folder["files"] += 1
+                folder["source"] += file_info.size
+                folder["output"] += file_info.size * bytes_ratio
+                seconds = file_info.size * seconds_per_byte
+                folder["seconds"] += seconds
+                encode_times.append(seconds)
+
+    yield "Projected savings per folder (originals in _SOURCE must be cleaned up to free the space):"
+    for path, folder in sorted(folders.items(), key=lambda item: item[1]["output"] - item[1]["source"]):
+        rel = path.relative_to(scan_dir) if path != scan_dir else Path(".")
+        yield (f"  {rel}: {folder['files']} file(s), {format_size(folder['source'])} -> ~{format_size(int(folder['output']))}, "
+               f"saves ~{format_size(max(0, int(folder['source'] - folder['output'])))}, ~{format_duration(folder['seconds'])} of encoding")
+
+    source = sum(f["source"] for f in folders.values())
+    output = int(sum(f["output"] for f in folders.values()))
+    if source:
+        yield (f"Total: {sum(f['files'] for f in folders.values())} file(s), {format_size(source)} -> ~{format_size(output)}, "
+               f"saves ~{format_size(max(0, source - output))} ({max(0, source - output) / source:.0%})")
+        yield (f"Estimated wall time with {max_workers} worker(s) x {threads} thread(s): "
+               f"~{format_duration(wall_time(encode_times, max_workers))} (~{format_duration(sum(encode_times))} of encoding in total)")
+    if unestimated:
+        yield f"{len(unestimated)} file(s) could not be sampled and are not included ({format_size(sum(f.size for f in unestimated))})."
+    if alpha_files:
+        yield f"{len(alpha_files)} file(s) with alpha would be moved to _ALPHA unconverted ({format_size(sum(f.size for f in alpha_files))})."
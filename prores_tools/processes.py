@@ -0,0 +1,90 @@
+"""
+Process-wide budgets for ffprobe and ffmpeg subprocesses.
+
+Every module starts its subprocesses through `run()` or inside `budget()`,
+so probes started by the scan pool, encodes started by the conversion pool,
+sample encodes started by the planner and sample decodes started by the
+verifier draw from the same two budgets, however many threads ask at once.
+On a NAS this keeps the number of processes reading the same disks bounded
+no matter how pools are sized.
+
+A limit of 0 means unlimited. Limits are set once per run with `set_limit`,
+normally from the CLI's `--max-probes` and `--max-encodes`.
+"""
+import functools
+import subprocess
+import threading
+from contextlib import contextmanager
+
+from . import metrics
+
+PROBE = "probe"
+ENCODE = "encode"
+DEFAULT_LIMITS = {
+    PROBE: 8,
+    ENCODE: 0,
+}
+
+_limits = dict(DEFAULT_LIMITS)
+_semaphores = {}
+_lock = threading.Lock()
+
+
+def set_limit(kind: str, limit: int):
+    """Sets the number of `kind` subprocesses allowed at once (0 = unlimited)."""
+    if kind not in DEFAULT_LIMITS:
+        raise ValueError(f"Unknown subprocess kind '{kind}'")
+    if limit < 0:
+        raise ValueError(f"Limit for {kind} subprocesses must not be negative")
+    with _lock:
+        _limits[kind] = limit
+        _semaphores.pop(kind, None)
+
+
+def get_limit(kind: str) -> int:
+    return _limits[kind]
+
+
+def _semaphore(kind: str) -> threading.Semaphore | None:
+    with _lock:
+        limit = _limits[kind]
+        if not limit:
+            return None
+        semaphore = _semaphores.get(kind)
+        if semaphore is None:
+            semaphore = _semaphores[kind] = threading.BoundedSemaphore(limit)
+        return semaphore
+
+
+@contextmanager
+def budget(kind: str):
+    """Holds one slot of the `kind` budget, waiting for one to free up if needed."""
+    semaphore = _semaphore(kind)
+    if semaphore is None:
+        yield
+        return
+    if not semaphore.acquire(blocking=False):
+        with metrics.stage(f"wait_{kind}"):
+            semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def limited(kind: str):
+    """Decorator running every call of a function inside the `kind` budget."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with budget(kind):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def run(kind: str, command: list[str], **kwargs) -> subprocess.CompletedProcess:
+    """`subprocess.run` within the `kind` budget."""
+    with budget(kind):
+        metrics.count("subprocesses")
+        return subprocess.run(command, **kwargs)
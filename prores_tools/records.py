@@ -0,0 +1,100 @@
+"""
+Record types passed between discovery, conversion, reporting and cleanup.
+
+Discovered files are `FileRecord`s rather than per-file dicts. With
+`__slots__` there is no per-instance `__dict__`, which matters when a scan
+holds a million of them. A conversion returns a `ConversionResult` whose
+`status` and `error` callers can test directly. `str()` of a result is the
+message shown to users.
+"""
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # utils builds FileRecords, so this module must not import it at runtime.
+    from .utils import MediaInfo
+
+
+class FileRecord:
+    """A discovered ProRes (`type` "prores") or PSD (".psd") file."""
+
+    __slots__ = ("path", "size", "mtime_ns", "type", "alpha", "info")
+
+    def __init__(self, path: Path, size: int, mtime_ns: int | None = None, type: str = "prores",
+                 alpha: bool = False, info: "MediaInfo | None" = None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.type = type
+        self.alpha = alpha
+        self.info = info
+
+    def __repr__(self):
+        return f"FileRecord({str(self.path)!r}, size={self.size}, type={self.type!r}, alpha={self.alpha})"
+
+
+class Status(Enum):
+    CONVERTED = "converted"
+    DUPLICATE = "duplicate"  # linked to the output of an identical source, see dedup.py
+    FAILED = "failed"
+
+
+class ErrorCategory(Enum):
+    """Why a conversion failed; the value is the tag shown in front of its message."""
+    TRANSFER = "TRANSFER ERROR"
+    INTEGRITY = "INTEGRITY ERROR"
+    VALIDATION = "VALIDATION ERROR"
+    TIMEOUT = "TIMEOUT ERROR"
+    FFMPEG = "FFMPEG ERROR"
+    UNEXPECTED = "UNEXPECTED ERROR"
+    RETRY = "RETRY ERROR"
+
+
+class ConversionResult:
+    """The outcome of converting (or linking) one source file."""
+
+    __slots__ = ("path", "status", "message", "error", "suggestion", "bytes_in", "bytes_out", "bytes_copied",
+                 "algorithm", "input_checksum", "output_checksum", "attempts", "seconds")
+
+    def __init__(self, path: Path, status: Status, message: str, error: ErrorCategory | None = None,
+                 suggestion: str | None = None, bytes_in: int = 0, bytes_out: int = 0, bytes_copied: int = 0,
+                 algorithm: str | None = None, input_checksum: str | None = None, output_checksum: str | None = None,
+                 attempts: int = 1, seconds: float = 0.0):
+        self.path = path
+        self.status = status
+        self.message = message
+        self.error = error
+        self.suggestion = suggestion
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.bytes_copied = bytes_copied
+        self.algorithm = algorithm
+        self.input_checksum = input_checksum
+        self.output_checksum = output_checksum
+        self.attempts = attempts
+        self.seconds = seconds
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status is not Status.FAILED
+
+    @property
+    def summary(self) -> str:
+        """The first line of the message, with the error tag if there is one."""
+        return f"[{self.error.value}] {self.message}" if self.error is not None else self.message
+
+    def __str__(self):
+        lines = [self.summary]
+        if self.suggestion:
+            lines.append(f"Suggestion: {self.suggestion}")
+        if self.succeeded and self.algorithm:
+            label = self.algorithm.upper()
+            lines += [f"Input {label}: {self.input_checksum}", f"Output {label}: {self.output_checksum}"]
+        if self.bytes_copied:
+            from .utils import format_size
+            lines.append(f"Copied across devices: {format_size(self.bytes_copied)}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"ConversionResult({str(self.path)!r}, {self.status}, {self.summary!r})"
@@ -1,165 +1,311 @@
+import html
+from itertools import chain
 from pathlib import Path
 from datetime import datetime
 from weasyprint import HTML, CSS
 import pkg_resources
-from .utils import find_prores_files_fast, find_files_by_extension, format_size
+from . import dedup, metrics
+from .checksum import is_sidecar
+from . import snapshot as snapshots
+from .records import FileRecord
+from .rollup import build_rollup, iter_folder_rows, iter_rollup_lines
+from .utils import format_size, walk_files
+from .writers import pre_block, write_csv, write_html, write_json
 
-def generate_report(target_dir: Path):
+# WeasyPrint's memory and time grow with document length, so long PDF reports
+# are split into parts of at most this many files, along top-level folders.
+DEFAULT_PDF_MAX_FILES = 5000
+LARGEST_FOLDERS_SHOWN = 10
+CONVERSION_FOLDERS = ('_SOURCE', '_FAILED', '_ALPHA', '_PROCESSING')
+
+def _stylesheet_path() -> str:
+    return pkg_resources.resource_filename('prores_tools', 'report_style.css')
+
+def _write_pdf(path: Path, parts) -> Path:
+    html_doc = HTML(string="<html><head></head><body>" + "".join(parts) + "</body></html>")
+    html_doc.write_pdf(path, stylesheets=[CSS(_stylesheet_path())])
+    return path
+
+def _output_paths(target_dir: Path, suffix: str, fmt: str, parts: int = 1) -> list[Path]:
+    if parts == 1:
+        return [target_dir / f"{target_dir.name}_{suffix}.{fmt}"]
+    return [target_dir / f"{target_dir.name}_{suffix}_part{i}.{fmt}" for i in range(1, parts + 1)]
+
+def _part_note(index: int, parts: int) -> str:
+    return f"<p><strong>Part:</strong> {index + 1} of {parts}</p>" if parts > 1 else ""
+
+def _snapshot_files(target_dir: Path, snapshot: dict):
+    """Splits a snapshot into the ProRes and PSD FileRecords the report renders."""
+    prores_files = []
+    psd_files = []
+    for rel, size, _, tag in snapshots.iter_files(snapshot):
+        if tag in snapshots.PRORES_TAGS:
+            prores_files.append(FileRecord(target_dir / rel, size, alpha=tag == snapshots.PRORES_ALPHA))
+        elif tag == snapshots.PSD:
+            psd_files.append(FileRecord(target_dir / rel, size, type=".psd"))
+    return prores_files, psd_files
+
+def _chunk_by_top_folder(root: Path, files: list, max_files: int) -> list[list]:
     """
-    Scans a directory tree, finds all ProRes and PSD files, and generates a PDF report.
+    Splits path-sorted `files` into chunks of at most `max_files`, keeping each
+    top-level folder in one chunk unless it alone is larger than the cap.
     """
-    report_path = target_dir / f"{target_dir.name}_report.pdf"
-    
-    folders_to_skip = ['_PROCESSING']
-    prores_files = find_prores_files_fast(target_dir, folders_to_ignore=folders_to_skip)
-    all_psd_files = find_files_by_extension(target_dir, ".psd", folders_to_ignore=folders_to_skip)
-    
-    # Filter for PSD files over 100MB
-    large_psd_files = [psd for psd in all_psd_files if psd['size'] > 100 * 1024 * 1024]
-
-    all_files = sorted(prores_files + large_psd_files, key=lambda x: x['path'])
-
-    # Calculate size totals
-    total_prores_size = sum(f['size'] for f in prores_files)
-    alpha_size = sum(f['size'] for f in prores_files if f['alpha'])
-    no_alpha_size = total_prores_size - alpha_size
-    total_psd_size = sum(f['size'] for f in large_psd_files)
-    grand_total_size = total_prores_size + total_psd_size
-
-    tree_html_content = build_tree_html(target_dir, all_files)
-    
-    css_path = pkg_resources.resource_filename('prores_tools', 'report_style.css')
-    stylesheet = CSS(css_path)
-
-    html_content = f"""
-    <html>
-    <head>
-    </head>
-    <body>
+    groups = {}
+    for file_info in files:
+        parts = file_info.path.relative_to(root).parts
+        groups.setdefault(parts[0] if len(parts) > 1 else "", []).append(file_info)
+    chunks = [[]]
+    for group in groups.values():
+        if chunks[-1] and len(chunks[-1]) + len(group) > max_files:
+            chunks.append([])
+        for start in range(0, len(group), max_files):
+            if len(chunks[-1]) >= max_files:
+                chunks.append([])
+            chunks[-1].extend(group[start:start + max_files])
+    return chunks
+
+def _summary_html(target_dir: Path, top, duplicates: tuple[int, int] | None = None) -> str:
+    alpha_files, alpha_bytes = top.counts['alpha'], top.sizes['alpha']
+    prores_files, prores_bytes = top.counts['prores'] + alpha_files, top.sizes['prores'] + alpha_bytes
+    largest = sorted(top.children.values(), key=lambda c: -c.total_bytes)[:LARGEST_FOLDERS_SHOWN]
+    largest_html = "".join(
+        f"<li>{html.escape(c.name)}/: {format_size(c.total_bytes)} "
+        f"(ProRes {format_size(c.sizes['prores'])}, Alpha {format_size(c.sizes['alpha'])}, PSD {format_size(c.sizes['psd'])})</li>"
+        for c in largest
+    )
+    return f"""
         <h1>Project Asset Report</h1>
         <p><strong>Source Directory:</strong> {target_dir.resolve()}</p>
         <p><strong>Report Generated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
         <div class="summary">
             <p><strong>Summary:</strong></p>
             <ul>
-                <li>Total ProRes Files: {len(prores_files)} ({format_size(total_prores_size)})</li>
-                <li>  - With Alpha Channel: {sum(1 for f in prores_files if f['alpha'])} ({format_size(alpha_size)})</li>
-                <li>  - Without Alpha Channel: {sum(1 for f in prores_files if not f['alpha'])} ({format_size(no_alpha_size)})</li>
-                <li>Total PSD Files (&gt;100MB): {len(large_psd_files)} ({format_size(total_psd_size)})</li>
-                <li style="border-top: 1px solid #ccc; padding-top: 5px; margin-top: 5px;"><strong>Grand Total: {len(all_files)} files ({format_size(grand_total_size)})</strong></li>
+                <li>Total ProRes Files: {prores_files} ({format_size(prores_bytes)})</li>
+                <li>  - With Alpha Channel: {alpha_files} ({format_size(alpha_bytes)})</li>
+                <li>  - Without Alpha Channel: {top.counts['prores']} ({format_size(top.sizes['prores'])})</li>
+                <li>Total PSD Files (&gt;100MB): {top.counts['psd']} ({format_size(top.sizes['psd'])})</li>
+                {f'<li>Duplicate ProRes Files: {duplicates[0]} ({format_size(duplicates[1])} not re-encoded by convert --dedup)</li>' if duplicates is not None else ''}
+                <li style="border-top: 1px solid #ccc; padding-top: 5px; margin-top: 5px;"><strong>Grand Total: {top.total_files} files ({format_size(top.total_bytes)})</strong></li>
             </ul>
+            {f'<p><strong>Largest Folders:</strong></p><ul>{largest_html}</ul>' if largest_html else ''}
         </div>
-        <div class="tree-container">
-            <pre>{tree_html_content}</pre>
-        </div>
-    </body>
-    </html>
     """
 
-    html_doc = HTML(string=html_content)
-    html_doc.write_pdf(report_path, stylesheets=[stylesheet])
-    
-    return report_path
+@metrics.timed("render")
+def write_report(target_dir: Path, prores_files: list, psd_files: list, fmt: str = "pdf",
+                 pdf_max_files: int = DEFAULT_PDF_MAX_FILES, depth: int | None = None, min_size: int = 0,
+                 duplicates: tuple[int, int] | None = None) -> list[Path]:
+    """
+    Writes the asset report for the given ProRes and PSD FileRecords as pdf,
+    html, json or csv and returns the paths written. JSON, CSV and HTML are
+    streamed; PDFs with more than `pdf_max_files` files are split into parts.
+    The tree and the JSON folder totals are collapsed below `depth` levels and
+    `min_size` bytes. `duplicates` is the (files, bytes) of ProRes copies to
+    show in the summary (see dedup.duplicate_totals).
+    """
+    all_files = sorted(prores_files + psd_files, key=lambda x: x.path)
+    top = build_rollup(target_dir, all_files)
+
+    def rows():
+        for f in all_files:
+            yield {"path": str(f.path.relative_to(target_dir)), "type": f.type, "alpha": f.alpha, "size": f.size}
+
+    if fmt == "json":
+        summary = {
+            "prores_files": top.counts['prores'] + top.counts['alpha'],
+            "prores_bytes": top.sizes['prores'] + top.sizes['alpha'],
+            "alpha_files": top.counts['alpha'],
+            "alpha_bytes": top.sizes['alpha'],
+            "psd_files": top.counts['psd'],
+            "psd_bytes": top.sizes['psd'],
+            "total_files": top.total_files,
+            "total_bytes": top.total_bytes,
+            **({"duplicate_files": duplicates[0], "duplicate_bytes": duplicates[1]} if duplicates is not None else {}),
+            "folders": list(iter_folder_rows(top, depth, min_size)),
+        }
+        return [write_json(_output_paths(target_dir, "report", fmt)[0], rows(), summary)]
+    if fmt == "csv":
+        return [write_csv(_output_paths(target_dir, "report", fmt)[0], ["path", "type", "alpha", "size"], rows())]
+
+    def document(tree, index=0, parts=1):
+        return chain(
+            [_summary_html(target_dir, top, duplicates), _part_note(index, parts), '<div class="tree-container">'],
+            pre_block(iter_rollup_lines(tree, depth, min_size)),
+            ['</div>\n'],
+        )
+
+    if fmt == "html":
+        return [write_html(_output_paths(target_dir, "report", fmt)[0], document(top), _stylesheet_path())]
+    chunks = _chunk_by_top_folder(target_dir, all_files, pdf_max_files)
+    if len(chunks) == 1:
+        trees = [top]
+    else:
+        trees = [build_rollup(target_dir, chunk) for chunk in chunks]
+    paths = _output_paths(target_dir, "report", fmt, len(chunks))
+    for i, (path, tree) in enumerate(zip(paths, trees)):
+        _write_pdf(path, document(tree, i, len(chunks)))
+    return paths
+
+def generate_report(target_dir: Path, cache=None, scan_threads: int = 1, fmt: str = "pdf",
+                    pdf_max_files: int = DEFAULT_PDF_MAX_FILES, depth: int | None = None, min_size: int = 0,
+                    find_duplicates: bool = False) -> list[Path]:
+    """
+    Scans a directory tree, finds all ProRes and PSD files, and generates a report.
+    The scan is saved as a snapshot in `target_dir` for later `--since` reports.
+    With `find_duplicates`, byte-identical ProRes files are counted in the
+    summary; only files whose size is shared with another are read.
+    """
+    snapshot = snapshots.scan_tree(target_dir, cache=cache, scan_threads=scan_threads)
+    snapshots.save_snapshot(snapshot, snapshots.default_snapshot_path(target_dir))
+    prores_files, all_psd_files = _snapshot_files(target_dir, snapshot)
+
+    # Filter for PSD files over 100MB
+    large_psd_files = [psd for psd in all_psd_files if psd.size > 100 * 1024 * 1024]
+
+    duplicates = None
+    if find_duplicates:
+        duplicates = dedup.duplicate_totals(dedup.find_duplicates(prores_files))
+    return write_report(target_dir, prores_files, large_psd_files, fmt, pdf_max_files, depth, min_size, duplicates)
 
-def generate_conversion_report(target_dir: Path):
+def generate_delta_report(target_dir: Path, since: Path, cache=None, scan_threads: int = 1, fmt: str = "pdf"):
     """
-    Scans a directory tree for _SOURCE, _FAILED, _ALPHA, and _PROCESSING folders and generates a PDF conversion report.
+    Rescans only the directories that changed since the snapshot at `since` and
+    generates a report of files added, removed and converted since then. The new
+    scan replaces the snapshot in `target_dir`. Returns (report_path, diff, stats).
     """
-    report_path = target_dir / f"{target_dir.name}_conversion_report.pdf"
+    previous = snapshots.load_snapshot(since)
+    if previous["root"] != str(target_dir.resolve()):
+        raise ValueError(f"Snapshot {since} is of {previous['root']}, not {target_dir.resolve()}")
+    report_path = _output_paths(target_dir, "delta_report", fmt)[0]
 
-    def gather_files(folder_name):
-        return list(target_dir.rglob(f'{folder_name}/*'))
+    snapshot = snapshots.scan_tree(target_dir, previous=previous, cache=cache, scan_threads=scan_threads)
+    snapshots.save_snapshot(snapshot, snapshots.default_snapshot_path(target_dir))
+    diff = snapshots.diff_snapshots(previous, snapshot)
+    reclaimed = diff['bytes_before'] - diff['bytes_after']
+    since_time = datetime.fromtimestamp(previous['created_ns'] / 1e9)
+    changes = ('added', 'removed', 'converted')
 
-    source_files = gather_files('_SOURCE')
-    failed_files = gather_files('_FAILED')
-    alpha_files = gather_files('_ALPHA')
-    processing_files = gather_files('_PROCESSING')
+    def rows():
+        for change in changes:
+            for path, size in diff[change]:
+                yield {"path": path, "change": change, "size": size}
 
-    def file_summary(files):
-        return [(str(f.relative_to(target_dir)), f.stat().st_size) for f in files if f.is_file()]
+    if fmt == "json":
+        summary = {change: len(diff[change]) for change in changes}
+        summary.update(since=since_time.isoformat(), bytes_before=diff['bytes_before'], bytes_after=diff['bytes_after'])
+        write_json(report_path, rows(), summary)
+        return report_path, diff, snapshot['stats']
+    if fmt == "csv":
+        write_csv(report_path, ["path", "change", "size"], rows())
+        return report_path, diff, snapshot['stats']
 
-    html_content = f"""
-    <html>
-    <head></head>
-    <body>
+    def file_list(files):
+        return (f'{path} ({format_size(size)})' for path, size in files)
+
+    header = f"""
+        <h1>Project Delta Report</h1>
+        <p><strong>Source Directory:</strong> {target_dir.resolve()}</p>
+        <p><strong>Changes Since:</strong> {since_time.strftime('%Y-%m-%d %H:%M:%S')}</p>
+        <p><strong>Report Generated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+        <div class="summary">
+            <ul>
+                <li><strong>Files Added:</strong> {len(diff['added'])} ({format_size(sum(size for _, size in diff['added']))})</li>
+                <li><strong>Files Removed:</strong> {len(diff['removed'])} ({format_size(sum(size for _, size in diff['removed']))})</li>
+                <li><strong>ProRes Files Converted:</strong> {len(diff['converted'])}</li>
+                <li><strong>{'Bytes Reclaimed' if reclaimed >= 0 else 'Bytes Added'}:</strong> {format_size(abs(reclaimed))}</li>
+            </ul>
+        </div>
+        <h2>Details</h2>
+    """
+    parts = chain(
+        [header, "<h3>Added</h3>"], pre_block(file_list(diff['added'])),
+        ["<h3>Removed</h3>"], pre_block(file_list(diff['removed'])),
+        ["<h3>Converted</h3>"], pre_block(file_list(diff['converted'])),
+    )
+    if fmt == "html":
+        write_html(report_path, parts, _stylesheet_path())
+    else:
+        _write_pdf(report_path, parts)
+    return report_path, diff, snapshot['stats']
+
+def generate_conversion_report(target_dir: Path, scan_threads: int = 1, fmt: str = "pdf",
+                               pdf_max_files: int = DEFAULT_PDF_MAX_FILES) -> list[Path]:
+    """
+    Scans a directory tree for _SOURCE, _FAILED, _ALPHA, and _PROCESSING folders and generates a conversion report.
+    JSON and CSV rows are written as the tree is walked; PDFs are split into parts of at most `pdf_max_files` files.
+    """
+    def rows():
+        for path, st in walk_files(target_dir, scan_threads=scan_threads):
+            if path.parent.name in CONVERSION_FOLDERS and not is_sidecar(path):
+                yield {"path": str(path.relative_to(target_dir)), "folder": path.parent.name, "size": st.st_size}
+
+    if fmt == "json":
+        counts = dict.fromkeys(CONVERSION_FOLDERS, 0)
+
+        def counted():
+            for row in rows():
+                counts[row['folder']] += 1
+                yield row
+
+        return [write_json(_output_paths(target_dir, "conversion_report", fmt)[0], counted(), lambda: counts)]
+    if fmt == "csv":
+        return [write_csv(_output_paths(target_dir, "conversion_report", fmt)[0], ["path", "folder", "size"], rows())]
+
+    grouped = {folder: [] for folder in CONVERSION_FOLDERS}
+    for row in rows():
+        grouped[row['folder']].append((row['path'], row['size']))
+    for files in grouped.values():
+        files.sort()
+
+    header = f"""
         <h1>Conversion Report</h1>
         <p><strong>Source Directory:</strong> {target_dir.resolve()}</p>
         <p><strong>Report Generated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
         <div class="summary">
             <ul>
-                <li><strong>Successfully Converted (_SOURCE):</strong> {len(source_files)}</li>
-                <li><strong>Failed Conversions (_FAILED):</strong> {len(failed_files)}</li>
-                <li><strong>Alpha Channel Files (_ALPHA):</strong> {len(alpha_files)}</li>
-                <li><strong>Still in Processing (_PROCESSING):</strong> {len(processing_files)}</li>
+                <li><strong>Successfully Converted (_SOURCE):</strong> {len(grouped['_SOURCE'])}</li>
+                <li><strong>Failed Conversions (_FAILED):</strong> {len(grouped['_FAILED'])}</li>
+                <li><strong>Alpha Channel Files (_ALPHA):</strong> {len(grouped['_ALPHA'])}</li>
+                <li><strong>Still in Processing (_PROCESSING):</strong> {len(grouped['_PROCESSING'])}</li>
             </ul>
         </div>
         <h2>Details</h2>
-        <h3>_SOURCE</h3>
-        <pre>{chr(10).join([f'{f[0]} ({format_size(f[1])})' for f in file_summary(source_files)]) or 'None'}</pre>
-        <h3>_FAILED</h3>
-        <pre>{chr(10).join([f'{f[0]} ({format_size(f[1])})' for f in file_summary(failed_files)]) or 'None'}</pre>
-        <h3>_ALPHA</h3>
-        <pre>{chr(10).join([f'{f[0]} ({format_size(f[1])})' for f in file_summary(alpha_files)]) or 'None'}</pre>
-        <h3>_PROCESSING</h3>
-        <pre>{chr(10).join([f'{f[0]} ({format_size(f[1])})' for f in file_summary(processing_files)]) or 'None'}</pre>
-    </body>
-    </html>
     """
 
-    css_path = pkg_resources.resource_filename('prores_tools', 'report_style.css')
-    stylesheet = CSS(css_path)
-    html_doc = HTML(string=html_content)
-    html_doc.write_pdf(report_path, stylesheets=[stylesheet])
-    return report_path
+    def document(sections, index=0, parts=1):
+        yield header
+        yield _part_note(index, parts)
+        for folder, files in sections.items():
+            yield f"<h3>{folder}</h3>"
+            yield from pre_block(f'{path} ({format_size(size)})' for path, size in files)
+
+    if fmt == "html":
+        return [write_html(_output_paths(target_dir, "conversion_report", fmt)[0], document(grouped), _stylesheet_path())]
+
+    # Fill each PDF part with up to pdf_max_files entries, in section order.
+    chunks = [{}]
+    filled = 0
+    for folder, files in grouped.items():
+        start = 0
+        while start < len(files):
+            if filled >= pdf_max_files:
+                chunks.append({})
+                filled = 0
+            take = files[start:start + pdf_max_files - filled]
+            chunks[-1].setdefault(folder, []).extend(take)
+            filled += len(take)
+            start += len(take)
+    if len(chunks) == 1:
+        chunks = [grouped]
+    paths = _output_paths(target_dir, "conversion_report", fmt, len(chunks))
+    for i, (path, sections) in enumerate(zip(paths, chunks)):
+        _write_pdf(path, document(sections, i, len(chunks)))
+    return paths
 
-def build_tree_html(root: Path, files: list) -> str:
+def iter_tree_lines(root: Path, files: list, depth: int | None = None, min_size: int = 0):
+    """Yields the lines of a du-style tree of `files` under `root`, with folder totals and aligned tags."""
+    return iter_rollup_lines(build_rollup(root, files), depth, min_size)
+
+def build_tree_html(root: Path, files: list, depth: int | None = None, min_size: int = 0) -> str:
     """Builds a preformatted HTML string of the file tree with aligned tags."""
-    tree = {}
-    for file_info in files:
-        path = file_info['path']
-        parts = path.relative_to(root).parts
-        current_level = tree
-        for part in parts[:-1]:
-            current_level = current_level.setdefault(part, {})
-        current_level[parts[-1]] = file_info
-
-    if not tree:
-        return f"{root.name}/\n(No relevant files found)"
-    
-    raw_lines = []
-
-    def _generate_raw_lines(d, prefix=""):
-        items = sorted(d.items())
-        for i, (name, content) in enumerate(items):
-            connector = "├── " if i < len(items) - 1 else "└── "
-            if isinstance(content, dict) and 'path' not in content:
-                raw_lines.append((f"{prefix}{connector}{name}/", None, None))
-                _generate_raw_lines(content, prefix + ("│   " if i < len(items) - 1 else "    "))
-            else:
-                if content['type'] == 'prores':
-                    tag = "[ProRes - Alpha]" if content['alpha'] else "[ProRes]"
-                else:
-                    tag = "[PSD >100MB]"
-                
-                size_str = format_size(content['size'])
-                raw_lines.append((f"{prefix}{connector}{name}", tag, size_str))
-
-    _generate_raw_lines(tree)
-
-    max_len = 0
-    if any(tag for _, tag, _ in raw_lines if tag):
-        max_len = max(len(text) for text, _, _ in raw_lines if text)
-    
-    tag_width = 20
-    
-    output_lines = [f"{root.name}/"]
-    for text, tag, size in raw_lines:
-        if tag:
-            line_part1 = text.ljust(max_len + 4)
-            line_part2 = tag.ljust(tag_width)
-            line = f"{line_part1}{line_part2}{size}"
-            output_lines.append(line)
-        else:
-            output_lines.append(text)
-            
-    return "\n".join(output_lines) 
\ No newline at end of file
+    return "\n".join(iter_tree_lines(root, files, depth, min_size))
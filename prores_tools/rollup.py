@@ -0,0 +1,141 @@
+"""
+Per-folder size rollups for reports, du style.
+
+Files are attached to their folder as the tree is built, then folder totals
+are summed bottom-up in one post-order pass, so every file and folder is
+visited a constant number of times. The rendered tree lists folders and files
+largest first and can be collapsed below a depth or a size.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .records import FileRecord
+from .utils import format_size
+
+CATEGORIES = ("prores", "alpha", "psd")
+CATEGORY_LABELS = {"prores": "ProRes", "alpha": "Alpha", "psd": "PSD"}
+TAG_WIDTH = 20
+
+
+def file_category(file_info: FileRecord) -> str:
+    if file_info.type != 'prores':
+        return "psd"
+    return "alpha" if file_info.alpha else "prores"
+
+
+@dataclass
+class Folder:
+    """A folder with its files and the counts and bytes per category of everything below it."""
+    name: str
+    depth: int = 0
+    files: list = field(default_factory=list)
+    children: dict = field(default_factory=dict)
+    counts: dict = field(default_factory=lambda: dict.fromkeys(CATEGORIES, 0))
+    sizes: dict = field(default_factory=lambda: dict.fromkeys(CATEGORIES, 0))
+
+    @property
+    def total_files(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.sizes.values())
+
+
+def build_rollup(root: Path, files: list) -> Folder:
+    """Builds the folder tree of `files` under `root` with totals rolled up to every folder."""
+    top = Folder(root.name)
+    for file_info in files:
+        node = top
+        for part in file_info.path.relative_to(root).parts[:-1]:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = Folder(part, node.depth + 1)
+            node = child
+        node.files.append(file_info)
+        category = file_category(file_info)
+        node.counts[category] += 1
+        node.sizes[category] += file_info.size
+
+    # Pre-order list of (folder, parent); walking it backwards visits every
+    # folder after all of its descendants.
+    order = []
+    stack = [(top, None)]
+    while stack:
+        node, parent = stack.pop()
+        order.append((node, parent))
+        stack.extend((child, node) for child in node.children.values())
+    for node, parent in reversed(order):
+        if parent is not None:
+            for category in CATEGORIES:
+                parent.counts[category] += node.counts[category]
+                parent.sizes[category] += node.sizes[category]
+    return top
+
+
+def _breakdown(folder: Folder) -> str:
+    parts = [f"{CATEGORY_LABELS[c]} {format_size(folder.sizes[c])}" for c in CATEGORIES if folder.counts[c]]
+    return f"{format_size(folder.total_bytes)} ({', '.join(parts)})"
+
+
+def _file_tag(file_info: FileRecord) -> str:
+    return {"prores": "[ProRes]", "alpha": "[ProRes - Alpha]", "psd": "[PSD >100MB]"}[file_category(file_info)]
+
+
+def _visible_rows(top: Folder, depth: int | None, min_size: int):
+    """Yields (text, tag, size) for the lines shown with the given collapsing."""
+    def _expand(node: Folder, prefix: str):
+        items = [(child.total_bytes, child.name, child) for child in node.children.values()]
+        small = [f for f in node.files if f.size < min_size]
+        items += [(f.size, f.path.name, f) for f in node.files if f.size >= min_size]
+        items.sort(key=lambda item: (-item[0], item[1]))
+        if small:
+            items.append((sum(f.size for f in small), None, small))
+        for i, (size, name, item) in enumerate(items):
+            last = i == len(items) - 1
+            connector = "└── " if last else "├── "
+            if isinstance(item, Folder):
+                yield f"{prefix}{connector}{name}/", f"[{item.total_files} files]", _breakdown(item)
+                if (depth is None or item.depth < depth) and item.total_bytes >= min_size:
+                    yield from _expand(item, prefix + ("    " if last else "│   "))
+            elif isinstance(item, list):
+                yield f"{prefix}{connector}… {len(item)} smaller files", "", format_size(size)
+            else:
+                yield f"{prefix}{connector}{name}", _file_tag(item), format_size(size)
+
+    if depth is None or depth > 0:
+        yield from _expand(top, "")
+
+
+def iter_rollup_lines(top: Folder, depth: int | None = None, min_size: int = 0):
+    """
+    Yields the lines of the rollup tree. Folders deeper than `depth` or smaller
+    than `min_size` bytes are shown with their totals but not expanded; files
+    smaller than `min_size` are summarised in one line per folder.
+    """
+    yield f"{top.name}/"
+    if not top.total_files:
+        yield "(No relevant files found)"
+        return
+    rows = list(_visible_rows(top, depth, min_size))
+    if not rows:
+        return
+    width = max(len(text) for text, _, _ in rows) + 4
+    for text, tag, size in rows:
+        yield f"{text.ljust(width)}{tag.ljust(TAG_WIDTH)}{size}"
+
+
+def iter_folder_rows(top: Folder, depth: int | None = None, min_size: int = 0):
+    """Yields a dict of totals per folder, largest first, pruned like the tree."""
+    def _walk(node: Folder, path: str):
+        for child in sorted(node.children.values(), key=lambda c: (-c.total_bytes, c.name)):
+            if child.total_bytes < min_size:
+                continue
+            child_path = f"{path}/{child.name}" if path else child.name
+            row = {"path": child_path, "files": child.total_files, "bytes": child.total_bytes}
+            row.update({f"{c}_bytes": child.sizes[c] for c in CATEGORIES})
+            yield row
+            if depth is None or child.depth < depth:
+                yield from _walk(child, child_path)
+
+    yield from _walk(top, "")
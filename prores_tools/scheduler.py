@@ -0,0 +1,110 @@
+import heapq
+import itertools
+import os
+import time
+
+from .records import FileRecord
+
+SCHEDULING_POLICIES = ("largest", "smallest", "fifo")
+
+# libx264 stops scaling well past roughly this many threads per encode at HD sizes.
+_THREADS_PER_ENCODE = 4
+
+
+def plan_workers(workers: int = 0, threads: int = 0, cpu_count: int | None = None) -> tuple[int, int]:
+    """
+    Chooses how many files to encode in parallel and how many threads each
+    ffmpeg gets, so that workers × threads does not exceed the CPU cores.
+    A value of 0 for either means "size automatically".
+    """
+    cores = cpu_count or os.cpu_count() or 1
+    if workers <= 0:
+        workers = max(1, cores // (threads if threads > 0 else _THREADS_PER_ENCODE))
+    if threads <= 0:
+        threads = max(1, cores // workers)
+    return workers, threads
+
+
+class JobQueue:
+    """
+    Pending conversions ordered by a scheduling policy:
+    - largest: biggest files first, so one huge master doesn't finish last alone
+    - smallest: smallest files first, for quick feedback
+    - fifo: in discovery order
+    """
+
+    def __init__(self, policy: str = "largest"):
+        if policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"Unknown scheduling policy '{policy}'. Choose one of: {', '.join(SCHEDULING_POLICIES)}")
+        self.policy = policy
+        self._heap = []
+        self._counter = itertools.count()
+
+    def _key(self, size: int, seq: int):
+        if self.policy == "largest":
+            return -size
+        if self.policy == "smallest":
+            return size
+        return seq
+
+    def push(self, file_info: FileRecord):
+        seq = next(self._counter)
+        heapq.heappush(self._heap, (self._key(file_info.size, seq), seq, file_info))
+
+    def pop(self) -> FileRecord:
+        return heapq.heappop(self._heap)[2]
+
+    def peek(self, n: int) -> list[FileRecord]:
+        """Returns the next `n` files that pop() would return, without removing them."""
+        return [item[2] for item in heapq.nsmallest(n, self._heap)]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class ProgressEstimator:
+    """
+    Estimates remaining time from the amount of work finished so far rather
+    than the number of files. Work is measured in seconds of source footage
+    when every queued file has a known duration, and in bytes otherwise.
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.total_seconds = 0.0
+        self.done_seconds = 0.0
+        self._all_durations_known = True
+
+    def add(self, size: int, duration: float | None):
+        self.total_bytes += size
+        if duration:
+            self.total_seconds += duration
+        else:
+            self._all_durations_known = False
+
+    def complete(self, size: int, duration: float | None):
+        self.done_bytes += size
+        if duration:
+            self.done_seconds += duration
+
+    def remove(self, size: int, duration: float | None):
+        """Withdraws a queued file that will not be converted here after all."""
+        self.total_bytes -= size
+        if duration:
+            self.total_seconds -= duration
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    def remaining(self) -> float | None:
+        """Seconds left at the throughput achieved so far, or None before any work is done."""
+        if self._all_durations_known and self.total_seconds:
+            done, total = self.done_seconds, self.total_seconds
+        else:
+            done, total = self.done_bytes, self.total_bytes
+        if not done:
+            return None
+        return (total - done) * self.elapsed / done
@@ -0,0 +1,226 @@
+"""
+Snapshot index of a scanned tree, so later reports only revisit what changed.
+
+A snapshot records, for every directory under the root, its mtime, its
+subdirectories, the `.mov`/`.psd` files directly inside it as
+[size, mtime_ns, tag] and their count and bytes per tag. Adding, removing or
+renaming an entry updates the directory's mtime, so an incremental scan stats
+each directory once and only lists and probes the directories whose mtime
+differs from the snapshot.
+Snapshots are stored as gzipped JSON.
+"""
+import gzip
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from . import metrics
+from .utils import DEFAULT_PROBE_WORKERS, probe
+
+SNAPSHOT_NAME = ".prores_tools_snapshot.json.gz"
+SNAPSHOT_VERSION = 1
+TRACKED_EXTENSIONS = (".mov", ".psd")
+DEFAULT_IGNORED = ("_PROCESSING",)
+
+# Tags stored for each file.
+PRORES = "prores"
+PRORES_ALPHA = "prores-alpha"
+OTHER_VIDEO = "mov"
+PSD = "psd"
+PRORES_TAGS = {PRORES, PRORES_ALPHA}
+
+# Directories modified this close to the previous snapshot may have changed
+# again within the same mtime tick, so they are always listed again.
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+def default_snapshot_path(root: Path) -> Path:
+    return Path(root) / SNAPSHOT_NAME
+
+
+def load_snapshot(path: Path) -> dict:
+    """Reads a snapshot, raising ValueError if it is unreadable or from another version."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, EOFError, ValueError) as e:
+        raise ValueError(f"Cannot read snapshot {path}: {e}") from e
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot {path} was written by an incompatible version")
+    return snapshot
+
+
+def save_snapshot(snapshot: dict, path: Path):
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _join(rel: str, name: str) -> str:
+    return f"{rel}/{name}" if rel else name
+
+
+@metrics.timed("list")
+def _list_directory(root: Path, rel: str, old: dict | None, reuse_before: int, folders_to_ignore):
+    """
+    Returns (rel, entry, subdir rels, files to probe, reused) for one
+    directory, reusing `old` without listing it if its mtime is unchanged.
+    """
+    path = root / rel if rel else root
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return rel, None, [], [], False
+    if old is not None and old["mtime_ns"] == mtime_ns and mtime_ns < reuse_before:
+        return rel, old, [_join(rel, name) for name in old["subdirs"]], [], True
+
+    old_files = old["files"] if old is not None else {}
+    files = {}
+    subdirs = []
+    to_probe = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in folders_to_ignore:
+                            subdirs.append(entry.name)
+                        continue
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext not in TRACKED_EXTENSIONS or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                previous = old_files.get(entry.name)
+                if previous is not None and previous[0] == st.st_size and previous[1] == st.st_mtime_ns:
+                    files[entry.name] = previous
+                elif ext == ".psd":
+                    files[entry.name] = [st.st_size, st.st_mtime_ns, PSD]
+                else:
+                    files[entry.name] = [st.st_size, st.st_mtime_ns, None]
+                    to_probe.append((rel, entry.name, Path(entry.path), st))
+    except (PermissionError, FileNotFoundError, NotADirectoryError):
+        pass
+    subdirs.sort()
+    entry = {"mtime_ns": mtime_ns, "subdirs": subdirs, "files": files}
+    return rel, entry, [_join(rel, name) for name in subdirs], to_probe, False
+
+
+def _video_tag(info) -> str:
+    if not info.is_prores:
+        return OTHER_VIDEO
+    return PRORES_ALPHA if info.has_alpha else PRORES
+
+
+def _directory_totals(files: dict) -> dict:
+    totals = {}
+    for size, _, tag in files.values():
+        count, total = totals.get(tag, (0, 0))
+        totals[tag] = [count + 1, total + size]
+    return totals
+
+
+@metrics.timed("scan")
+def scan_tree(root: Path, previous: dict | None = None, cache=None, scan_threads: int = 1,
+              probe_workers: int = DEFAULT_PROBE_WORKERS, folders_to_ignore=DEFAULT_IGNORED) -> dict:
+    """
+    Scans `root` into a new snapshot. If `previous` is given, directories whose
+    mtime is unchanged are taken from it without being listed, and files whose
+    size and mtime are unchanged are not reprobed. The returned snapshot's
+    "stats" record how many directories were listed and how many were reused.
+    """
+    root = Path(root)
+    created_ns = time.time_ns()
+    old_dirs = previous["dirs"] if previous is not None else {}
+    reuse_before = previous["created_ns"] - _RACY_WINDOW_NS if previous is not None else 0
+    folders_to_ignore = frozenset(folders_to_ignore)
+    dirs = {}
+    to_probe = []
+    stats = {"listed": 0, "reused": 0, "probed": 0}
+
+    def _add(result):
+        rel, entry, subdirs, probes, reused = result
+        if entry is not None:
+            dirs[rel] = entry
+            stats["reused" if reused else "listed"] += 1
+            to_probe.extend(probes)
+        return subdirs
+
+    if scan_threads <= 1:
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            stack.extend(reversed(_add(_list_directory(root, rel, old_dirs.get(rel), reuse_before, folders_to_ignore))))
+    else:
+        with ThreadPoolExecutor(max_workers=scan_threads) as executor:
+            pending = {executor.submit(_list_directory, root, "", old_dirs.get(""), reuse_before, folders_to_ignore)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for rel in _add(future.result()):
+                        pending.add(executor.submit(_list_directory, root, rel, old_dirs.get(rel), reuse_before, folders_to_ignore))
+
+    # Probe new and changed videos; the cache is only used from this thread.
+    with ThreadPoolExecutor(max_workers=probe_workers) as executor:
+        futures = {}
+        for rel, name, path, st in to_probe:
+            info = cache.get(st) if cache is not None else None
+            if info is not None:
+                dirs[rel]["files"][name][2] = _video_tag(info)
+            else:
+                futures[executor.submit(probe, path)] = (rel, name, path, st)
+        stats["probed"] = len(futures)
+        for future, (rel, name, path, st) in futures.items():
+            info = future.result()
+            if cache is not None:
+                cache.put(path, st, info)
+            dirs[rel]["files"][name][2] = _video_tag(info)
+
+    for rel, entry in dirs.items():
+        if "totals" not in entry:
+            entry["totals"] = _directory_totals(entry["files"])
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "root": str(root.resolve()),
+        "created_ns": created_ns,
+        "dirs": dirs,
+        "stats": stats,
+    }
+
+
+def iter_files(snapshot: dict):
+    """Yields (relative path, size, mtime_ns, tag) for every file in a snapshot."""
+    for rel, entry in snapshot["dirs"].items():
+        for name, (size, mtime_ns, tag) in entry["files"].items():
+            yield _join(rel, name), size, mtime_ns, tag
+
+
+def diff_snapshots(old: dict, new: dict) -> dict:
+    """
+    Compares two snapshots of the same tree. A ProRes file that is a non-ProRes
+    video at the same path in `new` counts as converted rather than changed.
+    Returns lists of (path, size) for added, removed and converted files, and
+    the tracked bytes before and after.
+    """
+    before = {path: (size, tag) for path, size, _, tag in iter_files(old)}
+    after = {path: (size, tag) for path, size, _, tag in iter_files(new)}
+    added = sorted((path, size) for path, (size, _) in after.items() if path not in before)
+    removed = sorted((path, size) for path, (size, _) in before.items() if path not in after)
+    converted = sorted(
+        (path, before[path][0])
+        for path, (size, tag) in after.items()
+        if path in before and before[path][1] in PRORES_TAGS and tag == OTHER_VIDEO
+    )
+    return {
+        "added": added,
+        "removed": removed,
+        "converted": converted,
+        "bytes_before": sum(size for size, _ in before.values()),
+        "bytes_after": sum(size for size, _ in after.values()),
+    }
@@ -0,0 +1,132 @@
+"""
+File state transitions (_PROCESSING, _SOURCE, _FAILED, _ALPHA) that never turn
+into an accidental copy.
+
+Moves within one filesystem are a single `os.replace`. Moves onto another
+filesystem are detected up front by comparing `st_dev`, and are done with the
+cheapest mechanism available: a reflink (FICLONE), then an in-kernel
+`copy_file_range` (server-side on NFS 4.2), then a plain copy. Bind mounts of
+one filesystem (and some overlay and NFS setups) share `st_dev` but still
+refuse renames across them with EXDEV; those moves fall back to the same copy.
+"""
+import errno
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+from . import metrics, volumes
+
+# FICLONE from <linux/fs.h>: share the source's extents instead of copying data.
+_FICLONE = 0x40049409
+_COPY_CHUNK = 64 * 1024 * 1024
+
+
+class Transfer(NamedTuple):
+    method: str  # "rename", "reflink", "copy_file_range" or "copy"
+    bytes_copied: int
+
+
+class CrossDeviceMoveError(OSError):
+    """Raised instead of copying a file larger than the allowed limit across devices."""
+
+
+def is_cross_device(src: Path, dst_dir: Path) -> bool:
+    """
+    True if `src` and `dst_dir` are on different filesystems. A rename across
+    bind mounts of one filesystem can still fail with EXDEV; move_file copies then.
+    """
+    return os.stat(src).st_dev != os.stat(dst_dir).st_dev
+
+
+def reflink(src_fd: int, dst_fd: int) -> bool:
+    """Makes `dst_fd` share `src_fd`'s extents (FICLONE); False where the filesystem or platform cannot."""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int, consume) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = os.copy_file_range(src_fd, dst_fd, min(_COPY_CHUNK, size - copied))
+            if n == 0:
+                break
+            consume(n)
+            copied += n
+    except OSError:
+        if copied:
+            raise
+        return False
+    return copied == size
+
+
+@metrics.timed("move")
+def move_file(src: Path, dst: Path, max_copy_bytes: int | None = None) -> Transfer:
+    """
+    Moves `src` to `dst` (replacing `dst` if it exists) and reports how.
+
+    Same-device moves are atomic renames. Cross-device moves, and renames the
+    kernel refuses with EXDEV, are staged in a temporary file next to `dst`,
+    fsynced, renamed into place and only then is `src` removed. If
+    `max_copy_bytes` is set and a move would copy more than that,
+    CrossDeviceMoveError is raised and nothing is touched.
+    """
+    src, dst = Path(src), Path(dst)
+    if not is_cross_device(src, dst.parent):
+        try:
+            os.replace(src, dst)
+            return Transfer("rename", 0)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+    size = src.stat().st_size
+    if max_copy_bytes is not None and size > max_copy_bytes:
+        raise CrossDeviceMoveError(
+            f"Refusing to copy {size} bytes across devices from {src} to {dst.parent} (limit {max_copy_bytes})"
+        )
+
+    tmp = dst.with_name(f".{dst.name}.partial")
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst, \
+                volumes.io_slots(os.fstat(fsrc.fileno()).st_dev, os.fstat(fdst.fileno()).st_dev) as consume:
+            src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+            volumes.advise_sequential(src_fd)
+            if reflink(src_fd, dst_fd):
+                method, copied = "reflink", 0
+            elif _copy_file_range(src_fd, dst_fd, size, consume):
+                method, copied = "copy_file_range", size
+            else:
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                while True:
+                    chunk = fsrc.read(_COPY_CHUNK)
+                    if not chunk:
+                        break
+                    consume(len(chunk))
+                    fdst.write(chunk)
+                method, copied = "copy", size
+            fdst.flush()
+            os.fsync(dst_fd)
+            # The copy is on disk; neither side needs to stay cached.
+            volumes.drop_cached(src_fd)
+            volumes.drop_cached(dst_fd)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.unlink(src)
+    metrics.count("bytes_copied", copied)
+    return Transfer(method, copied)
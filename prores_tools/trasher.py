@@ -1,40 +1,119 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from send2trash import send2trash
-from .utils import find_prores_files_fast
+from . import metrics
+from .checksum import find_sidecar, read_sidecar, unchanged_since_hashed
+from .utils import iter_prores_files
 
-def find_files_to_cleanup(scan_dir: Path):
+TRASH_BATCH_SIZE = 64
+TRASH_WORKERS = 4
+
+
+def _is_candidate_dir(directory: str) -> bool:
+    """Only `_SOURCE` trees and `.PRV` folders can hold files to clean up."""
+    return directory.endswith('.PRV') or '_SOURCE' in Path(directory).parts
+
+
+def _converted_output_intact(source_path: Path) -> bool:
+    """
+    True unless the sidecar next to an archived original shows that its
+    converted output is missing or was modified after it was hashed.
+    Originals archived without a sidecar are trusted as before.
+    """
+    sidecar = find_sidecar(source_path)
+    if sidecar is None:
+        return True
+    source = source_path.resolve()
+    try:
+        entries = read_sidecar(sidecar)
+    except (OSError, ValueError):
+        return False
+    return all(unchanged_since_hashed(entry) for entry in entries if entry['path'] != source)
+
+
+@metrics.timed("scan")
+def find_files_to_cleanup(scan_dir: Path, cache=None, scan_threads: int = 1):
     """
     Finds all ProRes files that meet the cleanup criteria.
+
+    Returns (files_to_trash, skipped): originals in _SOURCE whose converted
+    output no longer matches their checksum sidecar are skipped, not trashed.
+    A trashed original's sidecar is trashed with it.
     """
-    # Scan everywhere except the _PROCESSING folder to avoid touching active files
+    # Scan everywhere except the _PROCESSING folder to avoid touching active files,
+    # but only list and probe .mov files in folders that can match a criterion.
     folders_to_skip = ['_PROCESSING']
-    all_prores_files = find_prores_files_fast(scan_dir, folders_to_ignore=folders_to_skip)
-    
+    candidates = iter_prores_files(scan_dir, folders_to_ignore=folders_to_skip, cache=cache, scan_threads=scan_threads,
+                                   dir_filter=_is_candidate_dir)
+
     files_to_trash = []
+    skipped = []
 
-    for file_info in all_prores_files:
-        path = file_info['path']
+    for file_info in candidates:
+        path = file_info.path
         
         # Criterion 1: Any ProRes file in a _SOURCE folder
         if '_SOURCE' in path.parts:
+            if not _converted_output_intact(path):
+                skipped.append(path)
+                continue
             files_to_trash.append(path)
+            sidecar = find_sidecar(path)
+            if sidecar is not None:
+                files_to_trash.append(sidecar)
             continue
 
         # Criterion 2: ProRes file without alpha in a .PRV folder
-        if not file_info['alpha'] and path.parent.name.endswith('.PRV'):
+        if not file_info.alpha and path.parent.name.endswith('.PRV'):
             files_to_trash.append(path)
     
     # Return a unique list of files
-    return list(set(files_to_trash))
+    return list(set(files_to_trash)), skipped
 
-def move_files_to_trash(files: list[Path]):
-    """
-    Moves a list of files to the system's Trash.
-    """
+def reclaimable_by_folder(files: list[Path]) -> list[tuple[Path, int, int]]:
+    """Returns (folder, file count, bytes) for the files to trash, largest first."""
+    folders = {}
     for f in files:
+        try:
+            size = f.stat().st_size
+        except OSError:
+            continue
+        count, total = folders.get(f.parent, (0, 0))
+        folders[f.parent] = (count + 1, total + size)
+    return sorted(((folder, count, total) for folder, (count, total) in folders.items()), key=lambda item: (-item[2], item[0]))
+
+@metrics.timed("trash")
+def _trash_batch(batch: list[Path]) -> list[str]:
+    try:
+        send2trash(batch)
+        metrics.count("files_trashed", len(batch))
+        return [f"Moved to Trash: {f}" for f in batch]
+    except OSError:
+        pass
+    # Part of the batch failed; retry file by file to report exactly which.
+    results = []
+    for f in batch:
+        if not os.path.lexists(f):
+            metrics.count("files_trashed")
+            results.append(f"Moved to Trash: {f}")
+            continue
         try:
             send2trash(f)
-            yield f"Moved to Trash: {f}"
+            metrics.count("files_trashed")
+            results.append(f"Moved to Trash: {f}")
         except OSError as e:
-            yield f"Error moving {f} to Trash: {e}" 
\ No newline at end of file
+            metrics.count("trash_errors")
+            results.append(f"Error moving {f} to Trash: {e}")
+    return results
+
+def move_files_to_trash(files: list[Path], batch_size: int = TRASH_BATCH_SIZE, workers: int = TRASH_WORKERS):
+    """
+    Moves a list of files to the system's Trash, in batches of `batch_size`
+    files per send2trash call with `workers` batches in flight at once.
+    """
+    files = sorted(files)
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(_trash_batch, batches):
+            yield from results
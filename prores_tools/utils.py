@@ -1,7 +1,16 @@
+import json
+import os
 import subprocess
 import shutil
+import struct
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . import metrics, processes
+from .checksum import DEFAULT_BUFFER_SIZE, hash_file
+from .mov import MovParseError, read_video_info
+from .records import FileRecord
 
 def format_size(size_bytes):
     """Converts bytes to a human-readable string (GB, MB, KB)."""
@@ -14,130 +23,289 @@ def format_size(size_bytes):
     else:
         return f"{size_bytes} Bytes"
 
-def find_files_by_extension(scan_dir: Path, extension: str, folders_to_ignore: list[str] | None = None):
+_SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024**2, "MB": 1024**2, "G": 1024**3, "GB": 1024**3, "T": 1024**4, "TB": 1024**4}
+
+def parse_size(text: str) -> int:
+    """Parses a size such as "500MB", "1.5G" or "2048" (bytes) into bytes."""
+    value = text.strip().upper()
+    number = value.rstrip("KMGTB ")
+    unit = value[len(number):].strip()
+    if unit not in _SIZE_UNITS:
+        raise ValueError(f"Unknown size unit in '{text}'")
+    try:
+        return int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size '{text}'") from None
+
+def segment_offsets(duration: float, samples: int, segment_seconds: float) -> list[float]:
+    """Start times of `samples` segments spread evenly over the clip."""
+    if duration <= segment_seconds or samples <= 1:
+        return [max(0.0, (duration - segment_seconds) / 2)]
+    span = duration - segment_seconds
+    return [span * (i + 0.5) / samples for i in range(samples)]
+
+@metrics.timed("list")
+def _scan_directory(directory: str, extensions: tuple[str, ...] | None, folders_to_ignore, dir_filter=None):
+    """
+    Lists one directory, returning matching files as (path, stat) pairs and the
+    subdirectories that should be descended into. Unreadable directories are
+    treated as empty.
+    """
+    files = []
+    subdirs = []
+    want_files = dir_filter is None or dir_filter(directory)
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in folders_to_ignore:
+                            subdirs.append(entry.path)
+                    elif want_files and (extensions is None or entry.name.lower().endswith(extensions)) and entry.is_file():
+                        files.append((Path(entry.path), entry.stat()))
+                except OSError:
+                    continue
+    except (PermissionError, FileNotFoundError, NotADirectoryError):
+        pass
+    return files, subdirs
+
+def walk_files(scan_dir: Path, extensions: tuple[str, ...] | None = None, folders_to_ignore: list[str] | None = None, scan_threads: int = 1, dir_filter=None):
     """
-    Scans a directory tree to find all files with a given extension,
-    optionally skipping special folders.
+    Lazily yields (path, stat_result) for every file under `scan_dir` whose
+    extension is in `extensions` (case-insensitive; None matches everything).
+
+    Folders named in `folders_to_ignore` are pruned before they are listed, and
+    the stat data comes from the directory entry, so no extra syscalls are made
+    per file beyond what `os.scandir` needs. With `scan_threads` > 1, sibling
+    subtrees are listed concurrently, which hides latency on network shares.
+    If `dir_filter(directory)` is given, files are only taken from the
+    directories it returns True for; the others are still descended into.
     """
-    if folders_to_ignore is None:
-        folders_to_ignore = []
+    folders_to_ignore = frozenset(folders_to_ignore or ())
+    if extensions is not None:
+        extensions = tuple(ext.lower() for ext in extensions)
 
-    found_files = []
-    all_files = scan_dir.rglob(f'*{extension}')
+    if scan_threads <= 1:
+        stack = [str(scan_dir)]
+        while stack:
+            files, subdirs = _scan_directory(stack.pop(), extensions, folders_to_ignore, dir_filter)
+            yield from files
+            stack.extend(reversed(subdirs))
+        return
 
-    for p in all_files:
-        if p.is_file() and not any(part in p.parts for part in folders_to_ignore):
-            size = p.stat().st_size
-            found_files.append({"path": p, "size": size, "type": extension})
-    
-    return found_files
+    with ThreadPoolExecutor(max_workers=scan_threads) as executor:
+        pending = {executor.submit(_scan_directory, str(scan_dir), extensions, folders_to_ignore, dir_filter)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    pending.add(executor.submit(_scan_directory, subdir, extensions, folders_to_ignore, dir_filter))
+                yield from files
 
-def is_prores(video_path: str) -> bool:
-    """Check if a video file is encoded with ProRes."""
-    if not shutil.which("ffprobe"):
-        raise FileNotFoundError("ffprobe not found. Please install ffmpeg.")
-    
-    command = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=codec_name",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        str(video_path)
+def find_files_by_extension(scan_dir: Path, extension: str, folders_to_ignore: list[str] | None = None, scan_threads: int = 1):
+    """
+    Scans a directory tree to find all files with a given extension
+    (case-insensitive), optionally skipping special folders.
+    """
+    return [
+        FileRecord(path, st.st_size, st.st_mtime_ns, type=extension)
+        for path, st in walk_files(scan_dir, (extension,), folders_to_ignore, scan_threads)
     ]
-    
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """Properties of a file's first video stream (plus audio stream count) from a single probe."""
+    valid: bool
+    codec_name: str | None = None
+    profile: str | None = None
+    pix_fmt: str | None = None
+    width: int | None = None
+    height: int | None = None
+    duration: float | None = None
+    nb_frames: int | None = None
+    bit_rate: int | None = None
+    audio_streams: int = 0
+    # False if the probe could not finish (timeout, I/O error), so the file may be fine; never cached.
+    conclusive: bool = field(default=True, compare=False)
+
+    @property
+    def is_prores(self) -> bool:
+        return self.valid and "prores" in (self.codec_name or "").lower()
+
+    @property
+    def has_alpha(self) -> bool:
+        return self.valid and _pix_fmt_has_alpha(self.pix_fmt)
+
+def _pix_fmt_has_alpha(pix_fmt: str | None) -> bool:
+    # Pixel formats with alpha usually contain 'a' (e.g., yuva, rgba)
+    return bool(pix_fmt) and 'a' in pix_fmt
+
+@lru_cache(maxsize=None)
+def _which(name: str) -> str | None:
+    return shutil.which(name)
+
+def require_executable(name: str) -> str:
+    """Resolves an ffmpeg tool on PATH once per process, raising if it is missing."""
+    path = _which(name)
+    if not path:
+        raise FileNotFoundError(f"{name} not found. Please install ffmpeg.")
+    return path
+
+def _to_number(value, kind):
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        return "prores" in result.stdout.lower()
-    except subprocess.CalledProcessError:
-        # This could happen for various reasons, e.g., not a valid video file
-        return False
-    except FileNotFoundError:
-        return False
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
 
-def has_alpha_channel(video_path: str) -> bool:
-    """Check if a video file's pixel format has an alpha channel."""
-    if not shutil.which("ffprobe"):
-        raise FileNotFoundError("ffprobe not found. Please install ffmpeg.")
-    
+@metrics.timed("probe")
+def probe(video_path, need_pix_fmt: bool = False) -> MediaInfo:
+    """
+    Probes a video file once and returns a MediaInfo record.
+
+    QuickTime/MP4 files are parsed in-process; ffprobe is only run for files the
+    parser cannot handle, or for non-ProRes files when `need_pix_fmt` is set
+    (the parser only knows the pixel format of ProRes streams).
+    """
+    try:
+        info = read_video_info(video_path)
+    except (MovParseError, struct.error, IndexError, OSError):
+        info = None
+    if info is not None and (info["pix_fmt"] is not None or not need_pix_fmt):
+        duration = info["duration"]
+        bit_rate = None
+        if duration:
+            bit_rate = int(Path(video_path).stat().st_size * 8 / duration)
+        return MediaInfo(
+            valid=True,
+            codec_name=info["codec_name"],
+            profile=info["profile"],
+            pix_fmt=info["pix_fmt"],
+            width=info["width"],
+            height=info["height"],
+            duration=duration,
+            nb_frames=info["nb_frames"],
+            bit_rate=bit_rate,
+            audio_streams=info["audio_streams"],
+        )
+    return _ffprobe(video_path)
+
+_TRANSIENT_ERRORS = ("Input/output error", "temporarily unavailable", "Stale file handle", "Connection timed out")
+
+@metrics.timed("ffprobe")
+def _ffprobe(video_path) -> MediaInfo:
+    """
+    Runs a single `ffprobe -show_streams -show_format` and builds a MediaInfo.
+    The record is marked invalid if ffprobe fails or finds no video stream, and
+    also inconclusive if ffprobe could not finish reading the file.
+    """
     command = [
-        "ffprobe",
+        require_executable("ffprobe"),
         "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=pix_fmt",
-        "-of", "default=noprint_wrappers=1:nokey=1",
+        "-show_streams", "-show_format",
+        "-of", "json",
         str(video_path)
     ]
-    
+
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        pix_fmt = result.stdout.strip()
-        # Pixel formats with alpha usually contain 'a' (e.g., yuva, rgba)
-        return 'a' in pix_fmt
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+        result = processes.run(processes.PROBE, command, capture_output=True, text=True, check=True, timeout=30)
+        data = json.loads(result.stdout or "{}")
+    except subprocess.CalledProcessError as e:
+        # ffprobe also exits non-zero when the share fails mid-read; only a clean rejection is final.
+        transient = any(marker in (e.stderr or "") for marker in _TRANSIENT_ERRORS)
+        return MediaInfo(valid=False, conclusive=not transient)
+    except (subprocess.TimeoutExpired, OSError, ValueError):
+        return MediaInfo(valid=False, conclusive=False)
+
+    streams = data.get("streams", [])
+    video = next((st for st in streams if st.get("codec_type") == "video"), None)
+    if video is None:
+        return MediaInfo(valid=False)
+    fmt = data.get("format", {})
+    return MediaInfo(
+        valid=True,
+        codec_name=video.get("codec_name"),
+        profile=video.get("profile"),
+        pix_fmt=video.get("pix_fmt"),
+        width=video.get("width"),
+        height=video.get("height"),
+        duration=_to_number(video.get("duration"), float) or _to_number(fmt.get("duration"), float),
+        nb_frames=_to_number(video.get("nb_frames"), int),
+        bit_rate=_to_number(fmt.get("bit_rate"), int),
+        audio_streams=sum(1 for st in streams if st.get("codec_type") == "audio"),
+    )
+
+def is_prores(video_path: str) -> bool:
+    """Check if a video file is encoded with ProRes."""
+    return probe(video_path).is_prores
+
+def has_alpha_channel(video_path: str) -> bool:
+    """Check if a video file's pixel format has an alpha channel."""
+    return probe(video_path, need_pix_fmt=True).has_alpha
 
-def find_prores_files_fast(scan_dir: Path, folders_to_ignore: list[str] | None = None):
+DEFAULT_PROBE_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+def _prores_entry(path: Path, st: os.stat_result, info: MediaInfo) -> FileRecord:
+    return FileRecord(path, st.st_size, st.st_mtime_ns, alpha=info.has_alpha, info=info)
+
+def iter_prores_files(scan_dir: Path, folders_to_ignore: list[str] | None = None, cache=None, scan_threads: int = 1, probe_workers: int = DEFAULT_PROBE_WORKERS, dir_filter=None):
     """
-    Scans a directory tree in parallel to quickly find all ProRes files,
-    optionally skipping special folders.
+    Lazily yields a FileRecord for each ProRes file under `scan_dir` as soon as it has
+    been found and probed, so callers can start working before the scan ends.
+
+    Probes run in a pool of `probe_workers` threads, and at most a few probes per
+    worker are in flight at once, so the walk pauses if the consumer falls behind.
+    If a `ProbeCache` is given, files whose device/inode/size/mtime are unchanged
+    since the last scan are not reprobed. The cache is only touched from the
+    thread iterating this generator. `dir_filter` restricts which directories
+    files are taken from (see `walk_files`).
     """
-    if folders_to_ignore is None:
-        folders_to_ignore = []
+    max_in_flight = probe_workers * 4
+    pending = {}
 
-    all_mov_files = [
-        p for p in scan_dir.rglob("*.mov") 
-        if p.is_file() and not any(part in p.parts for part in folders_to_ignore)
-    ]
-    
-    prores_files = []
-
-    def _check_file(path):
-        if is_prores(path):
-            has_alpha = has_alpha_channel(path)
-            size = path.stat().st_size
-            return {"path": path, "alpha": has_alpha, "size": size, "type": "prores"}
-        return None
+    def _collect(futures):
+        for future in futures:
+            path, st = pending.pop(future)
+            info = future.result()
+            if cache is not None:
+                cache.put(path, st, info)
+            if info.is_prores:
+                yield _prores_entry(path, st, info)
 
-    with ThreadPoolExecutor() as executor:
-        results = executor.map(_check_file, all_mov_files)
-        for result in results:
-            if result:
-                prores_files.append(result)
+    with ThreadPoolExecutor(max_workers=probe_workers) as executor:
+        for path, st in walk_files(scan_dir, (".mov",), folders_to_ignore, scan_threads, dir_filter):
+            info = cache.get(st) if cache is not None else None
+            if info is not None:
+                if info.is_prores:
+                    yield _prores_entry(path, st, info)
+                continue
+            pending[executor.submit(probe, path)] = (path, st)
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from _collect(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from _collect(done)
 
-    return prores_files 
+def find_prores_files_fast(scan_dir: Path, folders_to_ignore: list[str] | None = None, cache=None, scan_threads: int = 1):
+    """
+    Scans a directory tree in parallel to quickly find all ProRes files,
+    optionally skipping special folders. If a `ProbeCache` is given, files whose
+    device/inode/size/mtime are unchanged since the last scan are not reprobed.
+    Each FileRecord carries the file's MediaInfo as `info` so later stages do not
+    need to probe it again.
+    """
+    return list(iter_prores_files(scan_dir, folders_to_ignore, cache, scan_threads))
 
 def validate_video_file(file_path: str) -> bool:
     """
-    Uses ffprobe to check if a video file is valid and playable.
+    Probes a video file to check that it is valid and has a video stream.
     Returns True if the file is valid, False otherwise.
     """
-    if not shutil.which("ffprobe"):
-        raise FileNotFoundError("ffprobe not found. Please install ffmpeg.")
-    command = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=codec_type",
-        "-of", "csv=p=0",
-        str(file_path)
-    ]
-    try:
-        result = subprocess.run(command, capture_output=True, text=True, timeout=30)
-        return result.returncode == 0 and "video" in result.stdout
-    except (subprocess.TimeoutExpired, subprocess.CalledProcessError, Exception):
-        return False 
+    return probe(file_path).valid
 
-def compute_sha256(file_path: str, chunk_size: int = 8192) -> str:
+def compute_sha256(file_path: str, chunk_size: int = DEFAULT_BUFFER_SIZE) -> str:
     """
     Computes the SHA256 checksum of a file.
     """
-    import hashlib
-    sha256 = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        while True:
-            data = f.read(chunk_size)
-            if not data:
-                break
-            sha256.update(data)
-    return sha256.hexdigest() 
\ No newline at end of file
+    return hash_file(file_path, "sha256", buffer_size=chunk_size)
@@ -0,0 +1,88 @@
+"""
+Checks that an H.264 output is a complete conversion of its ProRes source.
+
+A single probe of each file (usually the parsed `moov` box, see mov.py) is
+enough to compare codec, resolution, duration, frame count and audio
+streams. A truncated or aborted encode fails this. Corruption inside a
+complete file does not, so a deep verification also decodes a few short
+windows spread over the output, in parallel. Each window is seeked to with
+`-ss` before the input, so ffmpeg starts decoding at the keyframe before it.
+That costs a small fraction of a full decode.
+"""
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import metrics, processes
+from .utils import MediaInfo, probe, require_executable, segment_offsets
+
+DEFAULT_SAMPLES = 4
+DEFAULT_WINDOW_SECONDS = 2.0
+# Output durations may differ from the source's by container rounding and audio priming.
+DURATION_TOLERANCE = 0.1
+FRAME_TOLERANCE = 1
+
+
+def compare(source: MediaInfo, output: MediaInfo) -> list[str]:
+    """Returns the ways `output` does not match `source`; empty if it does."""
+    if not output.valid:
+        return ["output has no readable video stream"]
+    problems = []
+    if output.codec_name != "h264":
+        problems.append(f"output codec is {output.codec_name}, expected h264")
+    if source.width and source.height and (output.width, output.height) != (source.width, source.height):
+        problems.append(f"resolution {output.width}x{output.height}, source is {source.width}x{source.height}")
+    if source.duration:
+        frame = source.duration / source.nb_frames if source.nb_frames else 0.0
+        if output.duration is None or abs(output.duration - source.duration) > max(DURATION_TOLERANCE, frame):
+            problems.append(f"duration {output.duration or 0:.3f}s, source is {source.duration:.3f}s")
+    if source.nb_frames and output.nb_frames is not None and abs(output.nb_frames - source.nb_frames) > FRAME_TOLERANCE:
+        problems.append(f"{output.nb_frames} frames, source has {source.nb_frames}")
+    # ffmpeg maps only the first audio stream unless told otherwise.
+    expected_audio = min(source.audio_streams, 1)
+    if output.audio_streams < expected_audio:
+        problems.append(f"{output.audio_streams} audio stream(s), expected {expected_audio}")
+    return problems
+
+
+@metrics.timed("decode")
+def decode_window(path: Path, offset: float, length: float) -> str | None:
+    """Decodes `length` seconds of the video from `offset`; returns ffmpeg's errors, or None if it decoded cleanly."""
+    command = [
+        require_executable("ffmpeg"), "-nostdin", "-v", "error",
+        "-ss", f"{offset:.3f}", "-t", f"{length:.3f}", "-i", str(path),
+        "-map", "0:v:0", "-f", "null", "-",
+    ]
+    try:
+        result = processes.run(processes.ENCODE, command, capture_output=True, text=True, timeout=max(60.0, length * 30))
+    except subprocess.TimeoutExpired:
+        return "decode timed out"
+    errors = (result.stderr or "").strip()
+    if result.returncode != 0 or errors:
+        return errors.splitlines()[-1].strip() if errors else f"ffmpeg exited with status {result.returncode}"
+    return None
+
+
+def decode_samples(path: Path, duration: float, samples: int = DEFAULT_SAMPLES,
+                   window_seconds: float = DEFAULT_WINDOW_SECONDS) -> list[str]:
+    """Decodes `samples` windows spread over the file in parallel; returns one message per window that failed."""
+    offsets = segment_offsets(duration, samples, window_seconds)
+    with ThreadPoolExecutor(max_workers=len(offsets), thread_name_prefix="prores-verify") as executor:
+        errors = list(executor.map(lambda offset: decode_window(path, offset, window_seconds), offsets))
+    return [f"decode error at {offset:.1f}s: {error}" for offset, error in zip(offsets, errors) if error]
+
+
+def verify_output(output_path: Path, source: MediaInfo, samples: int = 0,
+                  window_seconds: float = DEFAULT_WINDOW_SECONDS, output: MediaInfo | None = None) -> list[str]:
+    """
+    Compares an output with its source's MediaInfo and, if `samples` is set,
+    decodes that many windows of it. Pass `output` if it was already probed.
+    Returns the problems found; empty if the output is good.
+    """
+    with metrics.stage("validate"):
+        if output is None:
+            output = probe(output_path)
+        problems = compare(source, output)
+    if samples and not problems and output.duration:
+        problems = decode_samples(output_path, output.duration, samples, window_seconds)
+    return problems
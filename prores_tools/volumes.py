@@ -0,0 +1,139 @@
+"""
+Per-volume I/O limits and page-cache hints for bulk reads and copies.
+
+Hashing and cross-device copies take a slot on every volume (`st_dev`) they
+touch before reading, so at most `concurrency` bulk streams run on a volume
+at once, whatever the CPU worker count is. Spinning disks and NAS volumes
+stream far faster sequentially than with many interleaved readers. An
+optional `bandwidth` (bytes per second per volume) is enforced with a token
+bucket.
+
+On Linux, files are read with POSIX_FADV_SEQUENTIAL, each next chunk is
+prefetched with POSIX_FADV_WILLNEED, and the pages are dropped with
+POSIX_FADV_DONTNEED afterwards, so multi-GB sources and outputs do not evict
+the page cache other workers rely on. Elsewhere the hints are no-ops.
+
+Encodes are not throttled here: ffmpeg reads at the pace of the encoder, and
+its process count is bounded by the encode budget in processes.py.
+"""
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from . import metrics
+
+_HAVE_FADVISE = hasattr(os, "posix_fadvise")
+
+_limits = {"concurrency": 0, "bandwidth": 0}
+_volumes = {}
+_lock = threading.Lock()
+
+
+class Volume:
+    """Concurrency slots and a bandwidth token bucket for one device."""
+
+    def __init__(self, concurrency: int, bandwidth: int):
+        self._semaphore = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self.rate = bandwidth
+        self._tokens = float(bandwidth)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self._semaphore is not None and not self._semaphore.acquire(blocking=False):
+            with metrics.stage("wait_io"):
+                self._semaphore.acquire()
+
+    def release(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def consume(self, n: int):
+        """Accounts for `n` bytes of I/O, sleeping as long as needed to stay within the bandwidth."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            with metrics.stage("wait_io"):
+                time.sleep(wait)
+
+
+def set_limits(concurrency: int = 0, bandwidth: int = 0):
+    """Sets bulk I/O streams and bytes per second allowed per volume (0 = unlimited)."""
+    if concurrency < 0 or bandwidth < 0:
+        raise ValueError("I/O limits must not be negative")
+    with _lock:
+        _limits.update(concurrency=concurrency, bandwidth=bandwidth)
+        _volumes.clear()
+
+
+def volume(dev: int) -> Volume:
+    with _lock:
+        found = _volumes.get(dev)
+        if found is None:
+            found = _volumes[dev] = Volume(_limits["concurrency"], _limits["bandwidth"])
+        return found
+
+
+@contextmanager
+def io_slots(*devs: int):
+    """
+    Holds an I/O slot on each distinct device and yields a function that
+    accounts bytes against all of them. Devices are always locked in the same
+    order, so copies in opposite directions cannot deadlock.
+    """
+    held = [volume(dev) for dev in sorted(set(devs))]
+    with ExitStack() as stack:
+        for vol in held:
+            vol.acquire()
+            stack.callback(vol.release)
+
+        def consume(n: int):
+            for vol in held:
+                vol.consume(n)
+
+        yield consume
+
+
+def advise_sequential(fd: int):
+    if _HAVE_FADVISE:
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def advise_willneed(fd: int, offset: int, length: int):
+    if _HAVE_FADVISE:
+        try:
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+
+
+def drop_cached(fd: int):
+    """Asks the kernel to drop the file's clean cached pages; dirty pages stay until written."""
+    if _HAVE_FADVISE:
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def drop_cached_path(path):
+    """`drop_cached` for a file read by another process, such as an encode's source."""
+    if _HAVE_FADVISE:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            drop_cached(fd)
+        finally:
+            os.close(fd)
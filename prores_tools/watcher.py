@@ -0,0 +1,240 @@
+"""
+Detects `.mov` files dropped into a tree once they have been completely written.
+
+On Linux, inotify reports files as they are closed after writing or moved into
+the tree, so an idle tree costs nothing. Elsewhere, or on network shares where
+inotify does not see writes made by other machines, the tree is polled: each
+poll stats every folder but only lists the folders whose mtime changed, and
+walks into the others through the subfolders remembered from their last listing.
+
+Either way, a file is only reported once its size and mtime have not changed
+for `settle` seconds, so exports that are still being written (or are closed
+and reopened by the exporting application) are not picked up early.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+DEFAULT_SETTLE = 10.0
+DEFAULT_POLL_INTERVAL = 30.0
+
+# From <sys/inotify.h>.
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal inotify binding through libc, for Linux without extra dependencies."""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def read(self, timeout: float) -> list[tuple[int, int, str]]:
+        """Returns (wd, mask, name) for the events available within `timeout` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DropWatcher:
+    """
+    Watches `root` (except folders named in `folders_to_ignore`) and returns
+    `.mov` files from `poll()` once they have settled. Uses inotify when
+    available unless `use_inotify` is False; falls back to polling every
+    `poll_interval` seconds.
+    """
+
+    def __init__(self, root: Path, folders_to_ignore=(), settle: float = DEFAULT_SETTLE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, use_inotify: bool = True):
+        self.root = Path(root)
+        self.folders_to_ignore = frozenset(folders_to_ignore)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._candidates = {}  # path -> (size, mtime_ns, last change)
+        self._seen = {}  # path -> (size, mtime_ns) when it was last reported
+        self._dir_mtimes = {}
+        self._subdirs = {}  # folder -> its subfolders when it had the mtime in _dir_mtimes
+        self._watches = {}
+        self._next_poll = 0.0
+        self._inotify = None
+        self.mode = "polling"
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+                self.mode = "inotify"
+            except OSError:
+                self._inotify = None
+        self._add_tree(self.root)
+
+    def _is_movie(self, name: str) -> bool:
+        return name.lower().endswith(".mov")
+
+    def _add_tree(self, top: Path):
+        """Starts watching `top` and everything below it, adding existing movies as candidates."""
+        stack = [str(top)]
+        while stack:
+            directory = stack.pop()
+            if self._inotify is not None:
+                try:
+                    self._watches[self._inotify.add_watch(directory)] = directory
+                except OSError:
+                    # Out of watches (fs.inotify.max_user_watches): poll instead.
+                    self._inotify.close()
+                    self._inotify = None
+                    self._watches = {}
+                    self.mode = "polling"
+            try:
+                self._dir_mtimes[directory] = os.stat(directory).st_mtime_ns
+                subdirs = []
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.folders_to_ignore:
+                                subdirs.append(entry.path)
+                        elif self._is_movie(entry.name):
+                            self.add_candidate(Path(entry.path))
+                self._subdirs[directory] = subdirs
+                stack.extend(subdirs)
+            except OSError:
+                continue
+
+    def add_candidate(self, path: Path):
+        """Reports `path` once it has settled, unless it is unchanged since it was last reported."""
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        if self._seen.get(path) == (st.st_size, st.st_mtime_ns):
+            return
+        previous = self._candidates.get(path)
+        if previous is None or previous[:2] != (st.st_size, st.st_mtime_ns):
+            # A file last written long ago has already settled.
+            age = max(0.0, time.time() - st.st_mtime_ns / 1e9)
+            self._candidates[path] = (st.st_size, st.st_mtime_ns, time.monotonic() - age)
+
+    def mark_seen(self, path: Path, size: int, mtime_ns: int):
+        """Records that `path` was handled elsewhere, in this state."""
+        self._seen[path] = (size, mtime_ns)
+        self._candidates.pop(path, None)
+
+    def _poll_tree(self):
+        """Lists the folders whose mtime changed since the last poll."""
+        stack = [str(self.root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._dir_mtimes.pop(directory, None)
+                self._subdirs.pop(directory, None)
+                continue
+            if self._dir_mtimes.get(directory) == mtime and directory in self._subdirs:
+                # Nothing was added, removed or renamed in it since it was last listed.
+                stack.extend(self._subdirs[directory])
+                continue
+            subdirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.folders_to_ignore:
+                                subdirs.append(entry.path)
+                        elif self._is_movie(entry.name):
+                            self.add_candidate(Path(entry.path))
+            except OSError:
+                continue
+            self._dir_mtimes[directory] = mtime
+            self._subdirs[directory] = subdirs
+            stack.extend(subdirs)
+
+    def _handle_events(self, timeout: float):
+        for wd, mask, name in self._inotify.read(timeout):
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped; fall back to one full look at the tree.
+                self._dir_mtimes.clear()
+                self._poll_tree()
+                continue
+            if mask & _IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = Path(directory) / name
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and name not in self.folders_to_ignore:
+                    self._add_tree(path)
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO) and self._is_movie(name):
+                self.add_candidate(path)
+            if self._inotify is None:
+                return
+
+    def poll(self, timeout: float = 1.0) -> list[Path]:
+        """Waits up to `timeout` seconds for changes and returns the files that have settled."""
+        if self._inotify is not None:
+            self._handle_events(timeout)
+        else:
+            now = time.monotonic()
+            if now >= self._next_poll:
+                self._next_poll = now + self.poll_interval
+                self._poll_tree()
+            else:
+                time.sleep(min(timeout, self._next_poll - now))
+
+        ready = []
+        now = time.monotonic()
+        for path, (size, mtime_ns, changed_at) in list(self._candidates.items()):
+            try:
+                st = path.stat()
+            except OSError:
+                del self._candidates[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self._candidates[path] = (st.st_size, st.st_mtime_ns, now)
+            elif now - changed_at >= self.settle:
+                del self._candidates[path]
+                self._seen[path] = (size, mtime_ns)
+                ready.append(path)
+        return ready
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,67 @@
+"""
+Streaming writers for report output.
+
+Each writer takes an iterable of rows or lines and writes them as they are
+produced, so JSON, CSV and HTML reports of very large trees are never built
+up as one document in memory.
+"""
+import csv
+import html
+import json
+from pathlib import Path
+
+REPORT_FORMATS = ("pdf", "html", "json", "csv")
+
+
+def write_csv(path: Path, columns: list[str], rows) -> Path:
+    """Writes dict rows as CSV with a header of `columns`."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+    return path
+
+
+def write_json(path: Path, rows, summary) -> Path:
+    """
+    Writes `{"files": [...], "summary": {...}}`, one row per line. `summary`
+    may be a callable, evaluated after all rows are written, so totals can be
+    accumulated while streaming.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"files": [')
+        for i, row in enumerate(rows):
+            f.write(",\n" if i else "\n")
+            f.write(json.dumps(row))
+        f.write('\n],\n"summary": ')
+        json.dump(summary() if callable(summary) else summary, f)
+        f.write("}\n")
+    return path
+
+
+def write_html(path: Path, parts, stylesheet: Path | None = None) -> Path:
+    """Writes an HTML document from an iterable of fragments, inlining `stylesheet`."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<html>\n<head>\n<meta charset=\"utf-8\">\n")
+        if stylesheet is not None:
+            f.write(f"<style>\n{Path(stylesheet).read_text(encoding='utf-8')}</style>\n")
+        f.write("</head>\n<body>\n")
+        for part in parts:
+            f.write(part)
+        f.write("</body>\n</html>\n")
+    return path
+
+
+def pre_block(lines, empty: str = "None"):
+    """Yields the fragments of a <pre> block with one escaped line per entry."""
+    yield "<pre>"
+    wrote = False
+    for line in lines:
+        if wrote:
+            yield "\n"
+        yield html.escape(line)
+        wrote = True
+    if not wrote:
+        yield empty
+    yield "</pre>\n"